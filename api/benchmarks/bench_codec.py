@@ -0,0 +1,98 @@
+# bench_codec.py
+# Description: Benchmarks of the numeric codec and the previous str() based serialization.
+# Author: Joshua Stiller
+# Date: 18.10.26
+
+import sys
+
+import numpy as np
+from harness import benchmark
+
+from src.model.codec import encode, decode
+from src.model.utils import serialize_volume, deserialize_volume
+
+SERIES_SIZES = [100, 1_000, 10_000]
+
+
+def legacy_serialize(volumes, dec_sep=' ', num_sep=','):
+    """ The former serialize_volume, kept here as reference. """
+
+    volumes = str(volumes).replace(' ', num_sep)
+    return dec_sep.join(volumes)
+
+
+def legacy_deserialize(volumes, dec_sep=' ', num_sep=','):
+    """ The former deserialize_volume, kept here as reference. """
+
+    volumes = volumes.replace(dec_sep, '')
+    volumes = volumes.split(num_sep)
+    return np.array([float(''.join(volume.split(dec_sep))) for volume in volumes if volume])
+
+
+def _series(size):
+    return np.random.default_rng(0).poisson(40, size).astype(float)
+
+
+@benchmark(SERIES_SIZES)
+def encode_integers(size):
+    series = _series(size)
+    return lambda: encode(series)
+
+
+@benchmark(SERIES_SIZES)
+def encode_scaled(size):
+    series = _series(size)
+    scaled = series / np.quantile(series, 0.95)
+    return lambda: encode(scaled, precision=3)
+
+
+@benchmark(SERIES_SIZES)
+def encode_batch(size):
+    batch = np.random.default_rng(0).poisson(40, (100, size // 100)).astype(float)
+    return lambda: encode(batch)
+
+
+@benchmark(SERIES_SIZES)
+def decode_all(size):
+    text = encode(_series(size))
+    return lambda: decode(text)
+
+
+@benchmark(SERIES_SIZES)
+def decode_first_100(size):
+    text = encode(_series(size))
+    return lambda: decode(text, n=100)
+
+
+@benchmark(SERIES_SIZES)
+def serialize_volume_roundtrip(size):
+    series = _series(size)
+    return lambda: deserialize_volume(serialize_volume(series))
+
+
+@benchmark(SERIES_SIZES)
+def legacy_serialize_untruncated(size):
+    series = _series(size)
+
+    def run():
+        with np.printoptions(threshold=sys.maxsize):
+            return legacy_serialize(series)
+
+    return run
+
+
+@benchmark(SERIES_SIZES)
+def legacy_deserialize_untruncated(size):
+    with np.printoptions(threshold=sys.maxsize):
+        text = legacy_serialize(_series(size)).strip('[ ]')
+    return lambda: legacy_deserialize(text)
+
+
+def check(size=10_000):
+    """ Checks the round trip on a long series, which the legacy version truncated. """
+
+    series = _series(size)
+    scaled = series / np.quantile(series, 0.95)
+    assert np.array_equal(decode(encode(series)), series)
+    assert np.allclose(decode(encode(scaled, precision=3)), scaled, atol=5e-4)
+    assert '. . .' in legacy_serialize(series)
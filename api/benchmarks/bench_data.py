@@ -0,0 +1,117 @@
+# bench_data.py
+# Description: Benchmarks of loading and querying BaseData.
+# Author: Joshua Stiller
+# Date: 18.10.26
+
+import sqlite3
+import tempfile
+
+import numpy as np
+from harness import benchmark, sales_frame
+
+from src.data.base_data import BaseData
+from src.data.database import SalesReader, sqlite_pool
+from src.data.database_data import DatabaseData
+from src.data.embeddings import EmbeddingStore
+
+
+@benchmark()
+def build(size):
+    data = sales_frame(size)
+    return lambda: BaseData(data)
+
+
+@benchmark()
+def get_data_series(size):
+    data = BaseData(sales_frame(size))
+    product_id, customer_id = data.series_index.keys[len(data.series_index) // 2]
+    return lambda: data.get_data(product_ids=product_id, customer_ids=customer_id)
+
+
+@benchmark()
+def get_data_product(size):
+    data = BaseData(sales_frame(size))
+    product_id = data.product_ids[len(data.product_ids) // 2]
+    return lambda: data.get_data(product_ids=int(product_id))
+
+
+@benchmark()
+def get_serialized_data(size):
+    data = BaseData(sales_frame(size))
+    product_id, customer_id = data.series_index.keys[len(data.series_index) // 2]
+    return lambda: data.get_serialized_data(product_id, customer_id)
+
+
+@benchmark()
+def append_week(size):
+    frame = sales_frame(size)
+    last = frame['week'].max()
+    data = BaseData(frame[frame['week'] < last])
+    data.get_data(product_ids=int(data.product_ids[0]))
+    data.get_data(customer_ids=int(data.customer_ids[0]))
+
+    # Appends the last week again and again, so the time includes the occasional compaction of the aggregates
+    week = frame[frame['week'] == last]
+    return lambda: data.append(week)
+
+
+@benchmark()
+def iter_series(size):
+    data = BaseData(sales_frame(size))
+    return lambda: sum(1 for _ in data.iter_series())
+
+
+@benchmark()
+def to_cube(size):
+    data = BaseData(sales_frame(size))
+    return lambda: data.to_cube()
+
+
+@benchmark([10_000, 100_000, 300_000])
+def embedding_nearest(size):
+    # Series of a large catalog with embeddings reduced to 256 dimensions
+    vectors = np.random.default_rng(0).normal(size=(size, 256)).astype(np.float32)
+    store = EmbeddingStore(vectors, np.arange(size), np.zeros(size, dtype=np.int64))
+    return lambda: store.nearest(size // 2, 0, k=10)
+
+
+@benchmark()
+def profile(size):
+    data = BaseData(sales_frame(size))
+
+    def run():
+        data._profile = None
+        return data.profile()
+
+    return run
+
+
+@benchmark()
+def routes_after_append(size):
+    # A new week for one percent of the series, only their profiles are recomputed
+    frame = sales_frame(size)
+    last = frame['week'].max()
+    new_week = frame[frame['week'] == last].iloc[::100]
+    data = BaseData(frame[frame['week'] < last])
+    data.routes()
+
+    def run():
+        data.append(new_week)
+        return data.routes()
+
+    return run
+
+
+@benchmark()
+def load_database(size):
+    # The sales table of one tenant in a SQLite file, with the names and text weeks of the app
+    frame = sales_frame(size)
+    location = f'{tempfile.mkdtemp()}/sales.db'
+    with sqlite3.connect(location) as connection:
+        connection.execute('CREATE TABLE sales (user_id TEXT, kunde_name TEXT, teil_name TEXT, woche TEXT, '
+                           'menge INTEGER)')
+        rows = zip(['user'] * len(frame), frame['customer'].astype(str), frame['product'].astype(str),
+                   frame['week'].dt.strftime('%Y-%m-%d'), frame['units_sold'].astype(int).tolist())
+        connection.executemany('INSERT INTO sales VALUES (?, ?, ?, ?, ?)', rows)
+    reader = SalesReader(sqlite_pool(location))
+    return lambda: DatabaseData(reader, 'user')
@@ -0,0 +1,55 @@
+# bench_import.py
+# Description: Benchmarks of the import time of the modules loaded on a cold start of the backend.
+# Author: Joshua Stiller
+# Date: 18.10.26
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from harness import benchmark
+
+API = Path(__file__).resolve().parents[1]
+
+# Packages that are only needed for plotting or requests and must not be imported with the modules
+LAZY_PACKAGES = ['matplotlib', 'seaborn', 'openai', 'dotenv']
+
+
+def _import(statement):
+    """ Returns a callable running the import statement in a fresh interpreter. """
+
+    env = dict(os.environ, PYTHONPATH=str(API))
+    command = [sys.executable, '-c', statement]
+    return lambda: subprocess.run(command, cwd=API, env=env, check=True)
+
+
+@benchmark(None)
+def interpreter():
+    return _import('pass')
+
+
+@benchmark(None)
+def base_data():
+    return _import('import src.data.base_data')
+
+
+@benchmark(None)
+def gpt3_model():
+    return _import('import src.model.gpt3_model')
+
+
+@benchmark(None)
+def backend():
+    return _import('import index')
+
+
+def check():
+    """ Checks that importing the data and model modules does not load plotting or API packages. """
+
+    statement = ('import sys, src.data.base_data, src.data.store_data, src.model.gpt3_model, src.simulation; '
+                 f'print(",".join(p for p in {LAZY_PACKAGES!r} if p in sys.modules))')
+    env = dict(os.environ, PYTHONPATH=str(API))
+    loaded = subprocess.run([sys.executable, '-c', statement], cwd=API, env=env, check=True, capture_output=True,
+                            text=True).stdout.strip()
+    assert not loaded, f"Imported eagerly: {loaded}"
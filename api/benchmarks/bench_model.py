@@ -0,0 +1,92 @@
+# bench_model.py
+# Description: Benchmarks of the model wrappers against a fake OpenAI client.
+# Author: Joshua Stiller
+# Date: 18.10.26
+
+import asyncio
+
+import numpy as np
+from harness import benchmark
+
+from src.model.gpt3_model import GPT3Model
+from src.model.statistical_model import StatisticalModel
+from src.preprocessing.scaler import QuantileScaler
+from tests.fake_openai import FakeAsyncOpenAI, FakeOpenAI
+
+HISTORY_SIZES = [100, 1_000, 10_000]
+
+
+@benchmark(HISTORY_SIZES)
+def gpt3_predict(size):
+    model = GPT3Model(scaler=QuantileScaler(), client=FakeOpenAI())
+    history = np.random.default_rng(0).poisson(20, size).astype(float)
+    return lambda: model.predict(history, predict_frame=10)
+
+
+@benchmark(HISTORY_SIZES)
+def gpt3_embed(size):
+    model = GPT3Model(client=FakeOpenAI())
+    history = np.random.default_rng(0).poisson(20, size).astype(float)
+    return lambda: model.embed(history)
+
+
+@benchmark([100, 1_000])
+def gpt3_predict_many(size):
+    model = GPT3Model(client=FakeOpenAI(), async_client=FakeAsyncOpenAI())
+    histories = list(np.random.default_rng(0).poisson(20, (size, 100)).astype(float))
+    return lambda: model.predict_many(histories, predict_frame=10, max_concurrency=64)
+
+
+@benchmark([1_000, 100_000, 1_000_000])
+def statistical_predict(size):
+    model = StatisticalModel('ses')
+    histories = np.random.default_rng(0).poisson(20, (size // 100, 100)).astype(float)
+    return lambda: model.predict(histories, predict_frame=10)
+
+
+@benchmark([10, 100])
+def gpt3_apredict_duplicates(size):
+    # Identical concurrent requests, e.g. several users opening the same series, share one call of 10 ms
+    model = GPT3Model(client=FakeOpenAI(), async_client=FakeAsyncOpenAI(latency=0.01))
+    history = np.random.default_rng(0).poisson(20, 100).astype(float)
+
+    async def run():
+        await asyncio.gather(*[model.apredict(history, predict_frame=10) for _ in range(size)])
+
+    return lambda: asyncio.run(run())
+
+
+@benchmark(HISTORY_SIZES)
+def gpt3_predict_stream(size):
+    model = GPT3Model(scaler=QuantileScaler(), client=FakeOpenAI(), stream=True)
+    history = np.random.default_rng(0).poisson(20, size).astype(float)
+    return lambda: model.predict(history, predict_frame=5)
+
+
+@benchmark([100, 1_000])
+def gpt3_predict_many_packed(size):
+    # Compare with gpt3_predict_many, the calls of the client show the number of requests
+    model = GPT3Model(client=FakeOpenAI(), async_client=FakeAsyncOpenAI())
+    histories = list(np.random.default_rng(0).poisson(20, (size, 100)).astype(float))
+    return lambda: model.predict_many(histories, predict_frame=10, max_concurrency=64, pack_budget=4_000)
+
+
+@benchmark([10, 100])
+def gpt3_predict_samples(size):
+    # One request with size choices instead of size requests, including the decoding and the quantiles
+    model = GPT3Model(scaler=QuantileScaler(), client=FakeOpenAI())
+    history = np.random.default_rng(0).poisson(20, 100).astype(float)
+
+    def run():
+        forecast, _ = model.predict_samples(history, predict_frame=10, n_samples=size)
+        return forecast.interval(0.8)
+
+    return run
+
+
+@benchmark([1_000, 10_000])
+def gpt3_embed_many(size):
+    # Batched requests instead of one request per series
+    model = GPT3Model(client=FakeOpenAI(dimensions=256))
+    histories = np.random.default_rng(0).poisson(20, (size, 100)).astype(float)
+    return lambda: model.embed_many(histories)
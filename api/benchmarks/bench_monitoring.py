@@ -0,0 +1,47 @@
+# bench_monitoring.py
+# Description: Benchmarks of the overhead of the instrumentation hooks.
+# Author: Joshua Stiller
+# Date: 18.10.26
+
+from harness import benchmark
+
+from src.monitoring import metrics
+
+
+@metrics.timed('noop')
+def _noop():
+    return None
+
+
+def _calls(enabled):
+    def run():
+        if enabled:
+            metrics.enable()
+        else:
+            metrics.disable()
+        try:
+            for _ in range(10_000):
+                _noop()
+        finally:
+            metrics.disable()
+
+    return run
+
+
+@benchmark(None)
+def timed_10k_disabled():
+    return _calls(enabled=False)
+
+
+@benchmark(None)
+def timed_10k_enabled():
+    return _calls(enabled=True)
+
+
+@benchmark(None)
+def plain_10k():
+    def run():
+        for _ in range(10_000):
+            _noop.__wrapped__()
+
+    return run
@@ -0,0 +1,24 @@
+# bench_preprocessing.py
+# Description: Benchmarks of the scalers.
+# Author: Joshua Stiller
+# Date: 18.10.26
+
+import numpy as np
+from harness import benchmark
+
+from src.preprocessing.scaler import QuantileScaler
+
+
+@benchmark()
+def quantile_scaler_fit_transform(size):
+    scaler = QuantileScaler()
+    data = np.random.default_rng(0).poisson(20, size).astype(float).reshape(-1, 1)
+    return lambda: scaler.fit_transform(data)
+
+
+@benchmark()
+def quantile_scaler_inverse_transform(size):
+    scaler = QuantileScaler()
+    data = np.random.default_rng(0).poisson(20, size).astype(float).reshape(-1, 1)
+    scaled = scaler.fit_transform(data)
+    return lambda: scaler.inverse_transform(scaled)
@@ -0,0 +1,100 @@
+# bench_prompt.py
+# Description: Benchmarks of the day by day prompt rendering and parsing and their previous versions.
+# Author: Joshua Stiller
+# Date: 18.10.26
+
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+from harness import benchmark
+
+from src.model.utils import historic_data_as_text, get_forecast_from_completion
+
+# Number of product days, i.e. up to about five years of 50 products
+CELL_SIZES = [1_000, 10_000, 100_000]
+PRODUCTS = 50
+
+
+def legacy_historic_data_as_text(data, product_ids=None):
+    """ The former historic_data_as_text, kept here as reference. """
+
+    if product_ids is None:
+        product_ids = data.columns
+
+    str = ''
+    for index, row in data.iterrows():
+        str += f"day {index.strftime('%Y-%m-%d')}: "
+        for product_id in product_ids:
+            str += f"Product {product_id} was sold {row[product_id]} times. "
+        str += '\n'
+    return str
+
+
+def legacy_get_forecast_from_completion(completion):
+    """ The former get_forecast_from_completion, kept here as reference. It only parses a single Product 0. """
+
+    forecast = completion.choices[0].message.content
+    forecast = forecast.split('\n')
+    forecast = [x.split(':') for x in forecast]
+    forecast = pd.DataFrame(forecast, columns=['day', 'sales'])
+    forecast['day'] = forecast['day'].str.replace('day ', '')
+    forecast['sales'] = forecast['sales'].str.replace('Product 0 was sold ', '')
+    forecast['sales'] = forecast['sales'].str.replace(' times.', '')
+    forecast['day'] = pd.to_datetime(forecast['day'])
+    forecast['sales'] = forecast['sales'].astype(int)
+    return forecast
+
+
+def _daily(size, products=PRODUCTS):
+    days = max(size // products, 1)
+    values = np.random.default_rng(0).poisson(20, (days, products))
+    return pd.DataFrame(values, index=pd.date_range('2019-01-01', periods=days), columns=range(products))
+
+
+def _completion(content):
+    message = SimpleNamespace(role='assistant', content=content)
+    return SimpleNamespace(choices=[SimpleNamespace(index=0, message=message)])
+
+
+@benchmark(CELL_SIZES)
+def render_prompt(size):
+    data = _daily(size)
+    return lambda: historic_data_as_text(data)
+
+
+@benchmark(CELL_SIZES)
+def legacy_render_prompt(size):
+    data = _daily(size)
+    return lambda: legacy_historic_data_as_text(data)
+
+
+@benchmark(CELL_SIZES)
+def parse_completion(size):
+    completion = _completion(historic_data_as_text(_daily(size)))
+    return lambda: get_forecast_from_completion(completion)
+
+
+@benchmark(CELL_SIZES)
+def parse_completion_single_product(size):
+    completion = _completion(historic_data_as_text(_daily(size, products=1)).strip())
+    return lambda: get_forecast_from_completion(completion)
+
+
+@benchmark(CELL_SIZES)
+def legacy_parse_completion_single_product(size):
+    # The only input the legacy parser supports: one line per day without trailing text
+    completion = _completion(historic_data_as_text(_daily(size, products=1)).strip().replace('times. ', 'times.'))
+    return lambda: legacy_get_forecast_from_completion(completion)
+
+
+def check(size=1_000):
+    """ Checks that rendering matches the legacy version and parsing recovers all values. """
+
+    data = _daily(size)
+    text = historic_data_as_text(data)
+    assert text == legacy_historic_data_as_text(data)
+
+    forecast = get_forecast_from_completion(_completion(text + "malformed line\nday 2019-13-01: Product 1"))
+    assert len(forecast) == data.size
+    assert np.array_equal(forecast['sales'].to_numpy(), data.to_numpy().ravel())
@@ -0,0 +1,21 @@
+# bench_simulation.py
+# Description: Benchmarks of the data simulations.
+# Author: Joshua Stiller
+# Date: 18.10.26
+
+from harness import benchmark
+
+from src.simulation.generator import DemandGenerator
+from src.simulation.simulation import SimulatedData
+
+
+@benchmark([1_000, 10_000, 100_000])
+def simulated_data(size):
+    return lambda: SimulatedData(num_products=size // 100, num_days=100)
+
+
+@benchmark()
+def demand_generator_blocks(size):
+    generator = DemandGenerator(num_products=max(size // 10_000, 1), num_customers=max(min(size // 100, 100), 1),
+                                num_weeks=100)
+    return lambda: sum(values.size for _, values in generator.blocks())
@@ -0,0 +1,142 @@
+# harness.py
+# Description: Registry, timing and baseline comparison of the benchmarks.
+# Author: Joshua Stiller
+# Date: 18.10.26
+
+import json
+import os
+import platform
+import sys
+import timeit
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+# Dataset sizes in rows of the long sales frame
+SIZES = [1_000, 10_000, 100_000, 1_000_000, 10_000_000]
+
+BENCHMARKS = {}
+
+
+def benchmark(sizes=SIZES):
+    """
+    Registers a benchmark. The decorated function gets the size, does its setup and returns the callable to time.
+
+    Parameters
+    ----------
+    sizes: list of int or None,
+        The sizes the benchmark runs with. None runs it once without size.
+    """
+
+    def decorator(func):
+        name = f"{func.__module__.split('.')[-1]}.{func.__name__}"
+        BENCHMARKS[name] = (func, sizes)
+        return func
+
+    return decorator
+
+
+@lru_cache(maxsize=4)
+def sales_frame(rows, weeks=100, seed=0):
+    """ Returns a synthetic long sales frame with about the given number of rows. """
+
+    import pandas as pd
+    from src.simulation.generator import DemandGenerator
+
+    n_series = max(rows // weeks, 1)
+    customers = int(np.ceil(np.sqrt(n_series)))
+    products = -(-n_series // customers)
+    generator = DemandGenerator(products, customers, min(weeks, rows), seed=seed)
+    data = pd.concat(generator.frames(chunk_series=100_000), ignore_index=True)
+    return data.iloc[:rows]
+
+
+def time_callable(func, repeat=5, min_time=0.2):
+    """ Returns the fastest time of one call in seconds. """
+
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange() if min_time else (1, None)
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def run(pattern=None, max_size=None, repeat=5):
+    """
+    Runs the registered benchmarks.
+
+    Parameters
+    ----------
+    pattern: str or None,
+        Only benchmarks whose name contains the pattern are run.
+    max_size: int or None,
+        Sizes above are skipped.
+    repeat: int,
+        The number of timing repetitions, the fastest counts.
+
+    Returns
+    -------
+    results: dict,
+        The seconds per call by benchmark name and size.
+    """
+
+    results = {}
+    for name, (func, sizes) in sorted(BENCHMARKS.items()):
+        if pattern is not None and pattern not in name:
+            continue
+        for size in (sizes or [None]):
+            if size is not None and max_size is not None and size > max_size:
+                continue
+            key = name if size is None else f'{name}[{size}]'
+            seconds = time_callable(func() if size is None else func(size), repeat=repeat)
+            results[key] = seconds
+            print(f"{key:<55} {seconds * 1e3:12.4f} ms", flush=True)
+    return results
+
+
+def environment():
+    """ Returns what identifies the machine and library versions of a run. """
+
+    import pandas as pd
+    return {'python': platform.python_version(), 'numpy': np.__version__, 'pandas': pd.__version__,
+            'machine': platform.machine(), 'processor': platform.processor(), 'cpus': os.cpu_count()}
+
+
+def save(results, path):
+    with open(path, 'w') as file:
+        json.dump({'environment': environment(), 'results': results}, file, indent=2, sort_keys=True)
+
+
+def compare(results, path, threshold=1.2):
+    """
+    Compares results with a saved baseline.
+
+    Parameters
+    ----------
+    results: dict,
+        The results of run.
+    path: str,
+        The location of the baseline JSON.
+    threshold: float,
+        The ratio of new and baseline time above which a benchmark counts as slower.
+
+    Returns
+    -------
+    slower: dict,
+        The ratio of every benchmark that got slower than the threshold.
+    """
+
+    with open(path) as file:
+        baseline = json.load(file)['results']
+
+    slower = {}
+    for key, seconds in results.items():
+        if key not in baseline:
+            continue
+        ratio = seconds / baseline[key]
+        flag = 'SLOWER' if ratio > threshold else ''
+        print(f"{key:<55} {ratio:8.2f}x {flag}")
+        if ratio > threshold:
+            slower[key] = ratio
+    return slower
@@ -0,0 +1,57 @@
+# run.py
+# Description: Runs the benchmarks and compares them with a stored baseline.
+# Author: Joshua Stiller
+# Date: 18.10.26
+
+import argparse
+import sys
+from pathlib import Path
+
+import harness
+
+import bench_codec
+import bench_data
+import bench_import
+import bench_model
+import bench_monitoring
+import bench_preprocessing
+import bench_prompt
+import bench_simulation
+
+# Timings of the machine in its environment entry, CI runners on other hardware store their own with --save
+# before the first comparison, e.g. from the main branch
+BASELINE = Path(__file__).resolve().parent / 'baseline.json'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Runs the benchmarks of the data, serialization and model hot paths.")
+    parser.add_argument('pattern', nargs='?', help="Only run benchmarks whose name contains this text.")
+    parser.add_argument('--max-size', type=int, default=1_000_000, help="Skip dataset sizes above this.")
+    parser.add_argument('--repeat', type=int, default=5, help="Timing repetitions, the fastest counts.")
+    parser.add_argument('--baseline', default=str(BASELINE), help="The baseline JSON file.")
+    parser.add_argument('--save', action='store_true', help="Store the results as new baseline.")
+    parser.add_argument('--threshold', type=float, default=1.2,
+                        help="Slowdown ratio against the baseline that fails the run.")
+    args = parser.parse_args(argv)
+
+    bench_codec.check()
+    bench_import.check()
+    bench_prompt.check()
+    results = harness.run(args.pattern, max_size=args.max_size, repeat=args.repeat)
+
+    if args.save:
+        harness.save(results, args.baseline)
+        return 0
+    if not Path(args.baseline).exists():
+        print(f"No baseline at {args.baseline}, run with --save to create one.")
+        return 0
+
+    slower = harness.compare(results, args.baseline, args.threshold)
+    if slower:
+        print(f"{len(slower)} benchmarks are more than {args.threshold}x slower than the baseline.")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
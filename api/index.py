@@ -1,7 +1,204 @@
-from fastapi import FastAPI
+import asyncio
+import json
+import os
+from functools import lru_cache
+from typing import List, Tuple
+
+import numpy as np
+from fastapi import Depends, FastAPI, HTTPException, Query
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field
+
+from src.data.base_data import BaseData
+from src.monitoring import metrics
+
+# The sales data loaded by every worker process, a Parquet or CSV file in the column schema of BaseData
+SALES_DATA = os.environ.get('SALES_DATA', 'data/sales.parquet')
+
+# A directory written by EmbeddingStore.save. If set, neighbours are searched by embedding instead of by history.
+EMBEDDINGS = os.environ.get('EMBEDDINGS')
+
+# A directory written by ForecastJob. If set, its forecasts are served without computing them per request.
+FORECASTS = os.environ.get('FORECASTS')
+
+# The maximal number of forecasts computed at once per request
+MAX_CONCURRENCY = int(os.environ.get('FORECAST_CONCURRENCY', 8))
+
+# Measurements of the process, rendered by the metrics route. Only with METRICS=1, since the sink is global to the
+# process and every instrumented call then records its timings, also in code that merely imports the app.
+registry = metrics.enable() if os.environ.get('METRICS') == '1' else None
 
 app = FastAPI()
 
+
+class ForecastRequest(BaseModel):
+    keys: List[Tuple[int, int]] = Field(..., min_length=1, description="The (product_id, customer_id) keys.")
+    horizon: int = Field(10, gt=0, le=104, description="The number of weeks to forecast.")
+
+
+@lru_cache(maxsize=None)
+def get_data():
+    """ Returns the sales data, loaded once per process. """
+
+    import pandas as pd
+    from src.data.ingestion import read_sales_csv
+
+    if not os.path.exists(SALES_DATA):
+        raise HTTPException(status_code=503, detail=f"No sales data at {SALES_DATA}.")
+    if SALES_DATA.endswith('.parquet'):
+        data = pd.read_parquet(SALES_DATA)
+    else:
+        data = read_sales_csv(SALES_DATA, {}, sidecar=os.access(os.path.dirname(SALES_DATA) or '.', os.W_OK))
+    return BaseData(data, compact=True)
+
+
+@lru_cache(maxsize=None)
+def get_model():
+    """ Returns the forecasting model shared by all requests of the process. """
+
+    from src.model.cache import MemoryCache
+    from src.model.gpt3_model import GPT3Model
+    from src.model.statistical_model import StatisticalModel
+    from src.preprocessing.scaler import QuantileScaler
+
+    return GPT3Model(scaler=QuantileScaler(), cache=MemoryCache(max_items=10_000), fallback=StatisticalModel(),
+                     stream=True)
+
+
+@lru_cache(maxsize=None)
+def _similarity(data):
+    if EMBEDDINGS:
+        from src.data.embeddings import EmbeddingStore
+        return EmbeddingStore.load(EMBEDDINGS)
+
+    from src.data.similarity import SeriesSimilarity
+    return SeriesSimilarity.from_data(data)
+
+
+def get_similarity(data: BaseData = Depends(get_data)):
+    """ Returns the nearest neighbour search over the sales data, built on first use. """
+
+    return _similarity(data)
+
+
+def get_precomputed():
+    """ Returns the forecasts of the last ForecastJob by series, loaded again whenever a job wrote results. """
+
+    from src.jobs.forecast_job import forecasts_version
+
+    if not FORECASTS:
+        raise HTTPException(status_code=404, detail="No precomputed forecasts.")
+    return _precomputed(forecasts_version(FORECASTS))
+
+
+@lru_cache(maxsize=1)
+def _precomputed(version):
+    from src.jobs.forecast_job import read_forecasts
+
+    forecasts = read_forecasts(FORECASTS)
+    keys = zip(forecasts['product_id'].tolist(), forecasts['customer_id'].tolist())
+    return dict(zip(keys, forecasts.to_dict('records')))
+
+
+async def _forecast(model, data, key, horizon, semaphore):
+    """ Forecasts one series and returns its result line. """
+
+    product_id, customer_id = key
+    result = {'product_id': product_id, 'customer_id': customer_id}
+    history = data.get_data(product_ids=product_id, customer_ids=customer_id)['units_sold'].to_numpy()
+    if history.shape[0] == 0:
+        result['error'] = 'Unknown series.'
+        return result
+
+    try:
+        async with semaphore:
+            if hasattr(model, 'apredict'):
+                forecast, extra = await model.apredict(history, horizon)
+            else:
+                forecast, extra = await asyncio.to_thread(model.predict, history, horizon)
+    except Exception as error:
+        result['error'] = repr(error)
+        return result
+
+    # NaN is not valid JSON, missing values are sent as null
+    forecast = np.asarray(forecast, dtype=float).ravel()[:horizon]
+    result['forecast'] = [value if np.isfinite(value) else None for value in forecast.tolist()]
+
+    # Streamed completions report how long the first value took
+    time_to_first_value = getattr(extra, 'time_to_first_value', None)
+    if time_to_first_value is not None:
+        result['time_to_first_value'] = time_to_first_value
+    return result
+
+
 @app.get("/api/python")
 def hello_world():
-    return {"message": "Hello World"}
\ No newline at end of file
+    return {"message": "Hello World"}
+
+
+@app.post("/api/forecast")
+async def forecast(request: ForecastRequest, data: BaseData = Depends(get_data), model=Depends(get_model)):
+    """ Forecasts the given series and streams one JSON line per series in the order they finish. """
+
+    semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
+
+    async def lines():
+        tasks = [asyncio.create_task(_forecast(model, data, tuple(key), request.horizon, semaphore))
+                 for key in dict.fromkeys(request.keys)]
+        try:
+            for task in asyncio.as_completed(tasks):
+                yield json.dumps(await task) + '\n'
+        finally:
+            # Stop the remaining forecasts if the client disconnects
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(lines(), media_type='application/x-ndjson')
+
+
+@app.get("/api/forecast/{product_id}/{customer_id}")
+def precomputed_forecast(product_id: int, customer_id: int, precomputed=Depends(get_precomputed)):
+    """ Returns the forecast of a series computed ahead of time by a ForecastJob. """
+
+    row = precomputed.get((product_id, customer_id))
+    if row is None:
+        raise HTTPException(status_code=404, detail="No forecast for this series.")
+
+    forecast = row['forecast'] if row['forecast'] is not None else []
+    result = {'product_id': product_id, 'customer_id': customer_id,
+              'forecast': [value if np.isfinite(value) else None for value in np.asarray(forecast, float).tolist()],
+              'fallback': bool(row['fallback'])}
+    last_week = row['last_week']
+    result['last_week'] = last_week.isoformat() if hasattr(last_week, 'isoformat') else last_week
+    if row['route'] is not None:
+        result['route'] = row['route']
+    if row['error'] is not None:
+        result['error'] = row['error']
+    return result
+
+
+@app.get("/api/neighbours/{product_id}/{customer_id}")
+async def neighbours(product_id: int, customer_id: int, k: int = Query(5, gt=0, le=100),
+                     similarity=Depends(get_similarity)):
+    """ Returns the series with the most similar sales pattern. """
+
+    try:
+        nearest = await asyncio.to_thread(similarity.nearest, product_id, customer_id, k)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Unknown series.")
+
+    return {
+        'product_id': product_id,
+        'customer_id': customer_id,
+        'neighbours': [{'product_id': p, 'customer_id': c, 'similarity': s} for p, c, s in nearest],
+    }
+
+
+@app.get("/metrics")
+@app.get("/api/metrics")
+def prometheus_metrics():
+    """ Returns the latency, token, cache and error metrics of the process in the Prometheus text format. """
+
+    if registry is None:
+        raise HTTPException(status_code=404, detail="Metrics are disabled.")
+    return PlainTextResponse(registry.render(), media_type='text/plain; version=0.0.4')
@@ -0,0 +1,243 @@
+# aggregates.py
+# Description: Weekly sales sums per key that are kept up to date as new rows are appended.
+# Author: Joshua Stiller
+# Date: 18.10.26
+
+import numpy as np
+import pandas as pd
+
+from src.data.series_index import SeriesIndex
+
+
+# The maximal number of appends kept apart before they are merged into the sums
+MAX_LOGS = 64
+
+
+class WeeklyAggregate:
+    """ Materialized weekly sums of units_sold per key, e.g. per product, updated with the appended rows only. """
+
+    def __init__(self, columns, keys, offsets, weeks, sums):
+        """
+        Parameters
+        ----------
+        columns: list of str,
+            The key columns. No columns aggregate over all rows with the single key ().
+        keys: list,
+            The keys in storage order, tuples if more than one column is given.
+        offsets: np.ndarray,
+            The start of every key in weeks and sums, followed by the total length.
+        weeks: np.ndarray,
+            The sorted weeks of every key.
+        sums: np.ndarray,
+            The sums of every key and week.
+        """
+
+        self.columns = list(columns)
+        self.keys = list(keys)
+        self._lookup = {key: i for i, key in enumerate(self.keys)}
+        self._offsets = offsets
+        self._weeks = weeks
+        self._sums = sums
+
+        # The sums of every append are kept as separate log with its own index until the logs are compacted
+        self._logs = []
+        self._log_rows = 0
+
+    @classmethod
+    def from_index(cls, index, weeks, sums):
+        """ Creates the aggregate from sorted rows without repeated weeks, sharing their arrays. """
+
+        return cls(index.columns, index.keys, index.offsets, weeks, sums)
+
+    @classmethod
+    def from_frame(cls, data, columns, dtype):
+        """
+        Aggregates a frame.
+
+        Parameters
+        ----------
+        data: pd.DataFrame,
+            The sales with the key columns, week and units_sold.
+        columns: list of str,
+            The key columns.
+        dtype: np.dtype,
+            The dtype of the sums.
+
+        Returns
+        -------
+        aggregate: WeeklyAggregate,
+            The weekly sums per key.
+        """
+
+        index, weeks, sums = _index(_sum(data, columns, dtype), columns)
+        return cls(columns, index.keys, index.offsets, weeks, sums)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, key):
+        return key in self._lookup
+
+    def get(self, key):
+        """
+        Returns the weekly sums of a key.
+
+        Parameters
+        ----------
+        key: object or tuple,
+            The key.
+
+        Returns
+        -------
+        weeks: np.ndarray,
+            The sorted weeks with sales. Empty for unknown keys.
+        sums: np.ndarray,
+            The sums of these weeks.
+        """
+
+        i = self._lookup.get(key)
+        if i is None:
+            return self._weeks[:0], self._sums[:0]
+
+        parts = []
+        if i < len(self._offsets) - 1:
+            start, end = self._offsets[i], self._offsets[i + 1]
+            parts.append((self._weeks[start:end], self._sums[start:end]))
+        for index, weeks, sums in self._logs:
+            rows = index.positions(key)
+            if rows.stop > rows.start:
+                parts.append((weeks[rows], sums[rows]))
+
+        if len(parts) == 1:
+            return parts[0]
+        if not parts:
+            return self._weeks[:0], self._sums[:0]
+
+        weeks = np.concatenate([weeks for weeks, _ in parts])
+        sums = np.concatenate([sums for _, sums in parts])
+        if np.all(weeks[1:] > weeks[:-1]):
+            return weeks, sums
+
+        # Weeks that arrived after later weeks, or again, are merged
+        weeks, inverse = np.unique(weeks, return_inverse=True)
+        merged = np.zeros(weeks.shape[0], dtype=sums.dtype)
+        np.add.at(merged, inverse, sums)
+        return weeks, merged
+
+    def update(self, data):
+        """
+        Adds new sales to the sums. The cost depends on the new rows only, until the appended rows outgrow the
+        compacted sums and are merged into them.
+
+        Parameters
+        ----------
+        data: pd.DataFrame,
+            The new sales with the key columns, week and units_sold.
+        """
+
+        if data.shape[0] == 0:
+            return
+
+        dtype = np.result_type(self._sums.dtype, data['units_sold'].dtype)
+        index, weeks, sums = _index(_sum(data, self.columns, dtype), self.columns)
+        for key in index.keys:
+            if key not in self._lookup:
+                self._lookup[key] = len(self.keys)
+                self.keys.append(key)
+        self._logs.append((index, weeks, sums))
+        self._log_rows += weeks.shape[0]
+
+        # Compact once the logs hold as many rows as the sums or lookups go through too many logs
+        if self._log_rows > self._weeks.shape[0] or len(self._logs) > MAX_LOGS:
+            self.compact()
+
+    def compact(self):
+        """ Merges the logs of the appends into the sums. """
+
+        if not self._logs:
+            return
+        data = pd.concat([self._frame(self.keys[:len(self._offsets) - 1], self._offsets, self._weeks, self._sums)]
+                         + [self._frame(index.keys, index.offsets, weeks, sums) for index, weeks, sums in self._logs],
+                         ignore_index=True)
+        dtype = np.result_type(*[sums.dtype for _, _, sums in self._logs], self._sums.dtype)
+        index, weeks, sums = _index(_sum(data, self.columns, dtype), self.columns)
+        self.__init__(self.columns, index.keys, index.offsets, weeks, sums)
+
+    def _frame(self, keys, offsets, weeks, sums):
+        """ Returns stored sums as long frame with one row per key and week. """
+
+        lengths = np.diff(offsets)
+        columns = {}
+        for position, column in enumerate(self.columns):
+            values = [key[position] for key in keys] if len(self.columns) > 1 else keys
+            columns[column] = np.repeat(np.array(values), lengths)
+        columns['week'] = weeks
+        columns['units_sold'] = sums
+        return pd.DataFrame(columns)
+
+    def frame(self, keys, dtypes=None):
+        """
+        Returns the weekly sums of keys in the layout of a groupby over week and the key columns.
+
+        Parameters
+        ----------
+        keys: list,
+            The keys. Unknown keys are skipped.
+        dtypes: dict or None,
+            The dtypes of the key columns and units_sold in the result.
+
+        Returns
+        -------
+        data: pd.DataFrame,
+            The columns week, the key columns and units_sold, sorted by week and key.
+        """
+
+        parts = [(key, *self.get(key)) for key in keys if key in self._lookup]
+        if parts:
+            weeks = np.concatenate([weeks for _, weeks, _ in parts])
+            sums = np.concatenate([sums for _, _, sums in parts])
+        else:
+            weeks, sums = self._weeks[:0], self._sums[:0]
+        lengths = [weeks.shape[0] for _, weeks, _ in parts]
+
+        columns = {'week': weeks}
+        for position, column in enumerate(self.columns):
+            values = [key[position] if len(self.columns) > 1 else key for key, _, _ in parts]
+            columns[column] = np.repeat(np.array(values), lengths) if values else np.array([])
+        columns['units_sold'] = sums
+        data = pd.DataFrame(columns)
+
+        if dtypes:
+            data = data.astype({column: dtype for column, dtype in dtypes.items() if column in data})
+        if len(parts) > 1:
+            data = data.sort_values(['week', *self.columns], kind='stable').reset_index(drop=True)
+        return data
+
+
+def _sum(data, columns, dtype):
+    """ Returns the sums per key and week, sorted by key and week. """
+
+    data = data[[*columns, 'week', 'units_sold']].astype({'units_sold': dtype})
+    return data.groupby([*columns, 'week'], observed=True).sum().reset_index()
+
+
+def _index(sums, columns):
+    """ Returns an index of the keys of sorted sums together with their weeks and values. """
+
+    weeks, values = sums['week'].to_numpy(), sums['units_sold'].to_numpy()
+    if columns:
+        return SeriesIndex(sums, columns), weeks, values
+    return _TotalIndex(sums.shape[0]), weeks, values
+
+
+class _TotalIndex:
+    """ Index of the single key () of sums over all rows. """
+
+    columns = []
+    keys = [()]
+
+    def __init__(self, n_rows):
+        self.offsets = np.array([0, n_rows])
+
+    def positions(self, key):
+        return slice(0, self.offsets[1]) if key == () else slice(0, 0)
@@ -5,45 +5,158 @@
 
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
+from src.data import plotting
+from src.data.aggregates import WeeklyAggregate
+from src.data.compaction import compact_frame, memory_usage, memory_usage_report, normalize_ids
+from src.data.embeddings import EmbeddingStore
+from src.data.profiling import profile_frame
+from src.data.series_cube import SeriesCube, week_grid
+from src.data.series_index import SeriesIndex
 from src.model.utils import serialize_volume
+from src.monitoring import metrics
+
+
+# Key columns of the weekly aggregates returned by get_data
+AGGREGATE_COLUMNS = {
+    'series': ['product_id', 'customer_id'],
+    'product': ['product_id'],
+    'customer': ['customer_id'],
+    'total': [],
+}
 
 
 class BaseData:
     
     """ Class for storing and manipulating the customer dataset."""
 
-    def __init__(self, data):
+    def __init__(self, data, compact=False):
         """
         Parameters
         ----------
         data: pd.DataFrame,
             The location of the data file.
+        compact: bool,
+            Whether to convert the data to compact dtypes, see compaction.compact_frame.
         """
 
-        self._data = data
-        self.products = data['product'].unique()
-        self.product_ids = data['product_id'].unique()
-        self.customers = data['customer'].unique()
-        self.customer_ids = data['customer_id'].unique()
+        self.compact = compact
+        self._memory_before = None
+        self.data = data
         self.dec_sep = ' '
         self.embeddings_2D = pd.DataFrame(columns=['customer_id', 'product', 'embedding_1', 'embedding_2'])
-        self.embeddings = pd.DataFrame(columns=['customer_id', 'product', 'embedding'])
+        self.embeddings = None
 
 
     @property
     def data(self):
+        if self._pending:
+            self._merge_pending()
         return self._data
 
     @data.setter
     def data(self, data):
-        self._data = data
+        if self.compact:
+            self._memory_before = memory_usage(data)
+        data = self._prepare(data)
+
         self.products = data['product'].unique()
-        self.product_ids = data['product_ids'].unique()
+        self.product_ids = data['product_id'].unique()
         self.customers = data['customer'].unique()
         self.customer_ids = data['customer_id'].unique()
 
+        self._data = data
+        self._pending = []
+        self._aggregates = {}
+        self._profile = None
+        self._routes = None
+        self._stale_series = set()
+        self._build_index()
+
+    def _prepare(self, data):
+        """ Converts the dtypes of new rows and sorts them by series and week. """
+
+        if self.compact:
+            data = compact_frame(data)
+        else:
+            # Ids read as text are converted to integers, so they can be looked up with ints
+            data = normalize_ids(data)
+
+        # Sort once by series and week, so every series is a contiguous block of rows
+        return data.sort_values(['product_id', 'customer_id', 'week'], kind='stable').reset_index(drop=True)
+
+    def append(self, new_rows):
+        """
+        Adds new sales, e.g. the latest weeks.
+
+        The weekly sums returned by get_data are updated with the new rows only. The rows are merged into the
+        sorted data the next time it is accessed, so several appends are merged at once.
+
+        Parameters
+        ----------
+        new_rows: pd.DataFrame,
+            The new sales with the same columns as the data. Weeks that already exist are added up.
+        """
+
+        new_rows = self._prepare(new_rows)
+        if new_rows.shape[0] == 0:
+            return
+
+        self.products = _append_unique(self.products, new_rows['product'])
+        self.product_ids = _append_unique(self.product_ids, new_rows['product_id'])
+        self.customers = _append_unique(self.customers, new_rows['customer'])
+        self.customer_ids = _append_unique(self.customer_ids, new_rows['customer_id'])
+
+        if new_rows['units_sold'].dtype.kind not in 'iub':
+            self._sum_dtype = np.float64
+        for aggregate in self._aggregates.values():
+            aggregate.update(new_rows)
+        self._pending.append(new_rows)
+
+        # Only the profiles of series with new rows are recomputed
+        if self._profile is not None:
+            keys = new_rows[['product_id', 'customer_id']].drop_duplicates()
+            self._stale_series.update(zip(keys['product_id'].tolist(), keys['customer_id'].tolist()))
+        self._routes = None
+
+    def _merge_pending(self):
+        """ Merges the appended rows into the sorted data and rebuilds the indexes. """
+
+        data = pd.concat([self._data, *self._pending], ignore_index=True)
+        if self.compact:
+            # Categories and integer types of the parts may differ
+            data = compact_frame(data)
+        self._data = data.sort_values(['product_id', 'customer_id', 'week'], kind='stable').reset_index(drop=True)
+        self._pending = []
+        self._build_index()
+
+    def _aggregate(self, level):
+        """ Returns the weekly sums per series, product, customer or in total, built on first use. """
+
+        if level not in self._aggregates:
+            data = self.data
+            if level == 'series' and self._unique_weeks:
+                # Sorted series without repeated weeks already are their weekly sums
+                units = data['units_sold'].to_numpy().astype(self._sum_dtype, copy=False)
+                aggregate = WeeklyAggregate.from_index(self.series_index, data['week'].to_numpy(), units)
+            else:
+                aggregate = WeeklyAggregate.from_frame(data, AGGREGATE_COLUMNS[level], self._sum_dtype)
+            self._aggregates[level] = aggregate
+        return self._aggregates[level]
+
+    def _build_index(self):
+        """ Builds the lookup from series to their rows. Products and customers are read from the aggregates. """
+
+        data = self._data
+        self.series_index = SeriesIndex(data, ['product_id', 'customer_id'])
+
+        # Sums are computed in 64 bit, since compacted quantities may use small integer types
+        self._sum_dtype = np.int64 if data['units_sold'].dtype.kind in 'iub' else np.float64
+
+        # Series without repeated weeks can be returned without aggregation
+        keys = data[['product_id', 'customer_id', 'week']]
+        self._unique_weeks = not keys.duplicated().any()
+
+    @metrics.timed('get_data')
     def get_data(self, product_ids=None, customer_ids=None):
         """
         Returns the data for given products and customers.
@@ -67,29 +180,201 @@ class BaseData:
         if isinstance(customer_ids, int):
             customer_ids = [customer_ids]
 
-        # Convert to string if dtype is object
-        # Todo: This is a workaround. Find a better solution
-        if self.data['product_id'].dtype == 'O' and product_ids is not None:
-            product_ids = [str(x) for x in product_ids]
-        if self.data['customer_id'].dtype == 'O' and customer_ids is not None:
-            customer_ids = [str(x) for x in customer_ids]
+        # Read the weekly sums of the given products and customers from the maintained aggregates
+        if product_ids is not None and customer_ids is not None:
+            level, keys = 'series', [(p, c) for p in product_ids for c in customer_ids]
+        elif product_ids is not None:
+            level, keys = 'product', product_ids
+        elif customer_ids is not None:
+            level, keys = 'customer', customer_ids
+        else:
+            level, keys = 'total', [()]
+
+        dtypes = {column: _key_dtype(self._data[column].dtype) for column in AGGREGATE_COLUMNS[level]}
+        dtypes['units_sold'] = self._sum_dtype
+        return self._aggregate(level).frame(keys, dtypes)
+
+    def iter_series(self):
+        """
+        Iterates over all product and customer combinations without filtering the data.
+
+        Yields
+        ------
+        key: tuple,
+            The product_id and customer_id of the series.
+        data: pd.DataFrame,
+            The weekly sales of the series.
+        """
+
+        # Slicing the column arrays is much cheaper than slicing the frame per series
+        weeks = self.data['week'].to_numpy()
+        units = self.data['units_sold'].to_numpy().astype(self._sum_dtype, copy=False)
+        for key, rows in self.series_index:
+            data = pd.DataFrame({'week': weeks[rows], 'units_sold': units[rows]})
+            if not self._unique_weeks:
+                data = data.groupby('week', observed=True).sum().reset_index()
+            yield key, data
+
+    def iter_weekly(self):
+        """
+        Iterates over all series on the week grid of the data, see to_cube.
+
+        Every series starts with its first week and ends with the last week of the data, so weeks without sales,
+        also after the last sale of a series, are zeros.
+
+        Yields
+        ------
+        key: tuple,
+            The product_id and customer_id of the series.
+        weeks: np.ndarray,
+            The weeks of the series.
+        values: np.ndarray,
+            The weekly sales of the series as view into the cube.
+        """
+
+        cube = self.to_cube(dtype=self._sum_dtype)
+        first_weeks = self.data['week'].to_numpy()[self.series_index.offsets[:-1]]
+        starts = np.searchsorted(cube.weeks, first_weeks)
+        for row, (key, start) in enumerate(zip(self.series_index.keys, starts)):
+            yield key, cube.weeks[start:], cube.values[row, start:]
+
+    def memory_usage_report(self):
+        """
+        Returns the memory usage per column before and after compaction.
+
+        Returns
+        -------
+        report: pd.DataFrame,
+            Dtypes and bytes per column before and after, their ratio and a total row. Without compaction
+            both sides show the current usage.
+        """
+
+        after = memory_usage(self.data)
+        before = self._memory_before if self._memory_before is not None else after
+        return memory_usage_report(before, after)
+
+    def to_cube(self, dtype=None, directory=None):
+        """
+        Returns all series as dense series x week matrix with zeros for weeks without sales.
+
+        Parameters
+        ----------
+        dtype: np.dtype or None,
+            The dtype of the values. None uses int32 for integer and float32 for other volumes.
+        directory: str or None,
+            If given, the cube is saved there and returned memory-mapped, so other processes can share it.
+
+        Returns
+        -------
+        cube: SeriesCube,
+            The dense sales history.
+        """
+
+        cube = SeriesCube.from_data(self, dtype=dtype)
+        if directory is not None:
+            cube.save(directory)
+            cube = SeriesCube.load(directory)
+        return cube
+
+    def profile(self, season_length=52, trend_window=13):
+        """
+        Returns the demand profile of all series, see profiling.profile_values.
+
+        The profile is kept with the data. After an append of later weeks only the series with new rows are
+        profiled again. All series are profiled again if the appended weeks change the positions of earlier weeks
+        or the data grows to two seasons, which changes the trend window of all series.
+
+        Parameters
+        ----------
+        season_length: int,
+            The number of weeks per season.
+        trend_window: int,
+            The number of weeks of the moving average of series shorter than two seasons.
+
+        Returns
+        -------
+        profile: pd.DataFrame,
+            The columns of profiling.PROFILE_COLUMNS indexed by product_id and customer_id. last_week is the
+            position of the last week with sales in the weeks of the cube, see series_cube.week_grid.
+        """
+
+        # The columns of the cube, so the profiles of few series line up with the full profile
+        weeks = week_grid(self._aggregate('total').get(())[0])
+        params = (season_length, trend_window, len(weeks) >= 2 * season_length)
+        # Once many series changed, profiling all of them from the cube is cheaper than reading them one by one
+        if (self._profile is None or self._profile[0] != params or not _extends(weeks, self._profile[2])
+                or 4 * len(self._stale_series) > len(self._profile[1])):
+            cube = self.to_cube(dtype=np.float64)
+            profile = profile_frame(cube.values, cube.product_ids, cube.customer_ids, season_length, trend_window)
+            self._profile = params, profile, np.array(weeks)
+            self._stale_series = set()
+
+        elif self._stale_series:
+            # The stale series on the week grid of all series, so positions and seasons line up with the rest
+            keys = sorted(self._stale_series)
+            aggregate = self._aggregate('series')
+            values = np.zeros((len(keys), len(weeks)))
+            for row, key in zip(values, keys):
+                series_weeks, sums = aggregate.get(key)
+                row[np.searchsorted(weeks, series_weeks)] = sums
+            update = profile_frame(values, [key[0] for key in keys], [key[1] for key in keys], season_length,
+                                   trend_window)
+            profile = self._profile[1]
+            profile = pd.concat([profile[~profile.index.isin(update.index)], update]).sort_index()
+            self._profile = params, profile, np.array(weeks)
+            self._stale_series = set()
+
+        return self._profile[1]
+
+    def routes(self, policy=None):
+        """
+        Returns the forecasting route of every series, kept with the data until it changes.
 
-        # Select data for the given products and customers
-        data = self.data
+        Parameters
+        ----------
+        policy: RoutingPolicy or None,
+            The routing policy. The defaults are used if not given.
 
-        groupby_columns = ['week']
-        return_columns = ['week', 'units_sold']
+        Returns
+        -------
+        routes: pd.DataFrame,
+            The columns class, route, method and level indexed by product_id and customer_id, see
+            RoutingPolicy.route.
+        """
+
+        from src.model.routing import RoutingPolicy
 
-        if product_ids is not None:
-            data = data[self.data['product_id'].isin(product_ids)]
-            groupby_columns.append('product_id')
-            return_columns.append('product_id')
-        if customer_ids is not None:
-            data = data[data['customer_id'].isin(customer_ids)]
-            groupby_columns.append('customer_id')
-            return_columns.append('customer_id')
+        if self._routes is None or self._routes[0] is not policy:
+            routing = policy if policy is not None else RoutingPolicy()
+            profile = self.profile(routing.season_length, routing.trend_window)
+            n_weeks = len(week_grid(self._aggregate('total').get(())[0]))
+            self._routes = policy, routing.route(profile, n_weeks)
+        return self._routes[1]
 
-        return data[return_columns].groupby(groupby_columns).sum().reset_index()
+    def embed(self, model, directory=None, **kwargs):
+        """
+        Embeds all series and keeps them as embedding store for similarity search.
+
+        Parameters
+        ----------
+        model: GPT3Model,
+            The model whose embed_many is used. Further keyword arguments are passed to it.
+        directory: str or None,
+            If given, the store is saved there and returned memory-mapped, so other processes can share it.
+
+        Returns
+        -------
+        embeddings: EmbeddingStore,
+            The normalized embeddings of all series, also kept in the embeddings attribute.
+        """
+
+        cube = self.to_cube()
+        store = EmbeddingStore(model.embed_many(cube.values, **kwargs), cube.product_ids, cube.customer_ids)
+        if directory is not None:
+            store.save(directory)
+            store = EmbeddingStore.load(directory)
+        self.embeddings = store
+        return store
 
     def add_embeddings(self, embeddings, customer_ids, product_ids):
         """
@@ -130,14 +415,11 @@ class BaseData:
 
         """
 
-        if ax is None:
-            ax = plt.gca()
-
         data = self.get_data(product_ids=product_id, customer_ids=customer_id)
+        plotting.plot_sales(data, x='week', ax=ax)
 
-        ax.plot(data['week'], data['units_sold'])
-
-    def plot_forecast(self, forecast, product_id=None, customer_id=None, start_date=None, show_from=0, ax=None):
+    def plot_forecast(self, forecast, product_id=None, customer_id=None, start_date=None, show_from=0, ax=None,
+                      level=0.8):
         """
 
         Plots the sales of a product and its forecast as a line plot.
@@ -148,36 +430,22 @@ class BaseData:
             The product_id
         customer_id: int,
             The customer_id
-        forecast: array-like,
-            The forecasted values.
+        forecast: array-like or SampledForecast,
+            The forecasted values. Sampled forecasts are drawn with their prediction interval.
         start_date: int,
             The date from which the forecast should be plotted.
         show_from: int,
             The date from which the sales should be plotted.
+        level: float,
+            The coverage of the prediction interval of a sampled forecast.
 
         Returns
         -------
 
         """
 
-        if ax is None:
-            ax = plt.gca()
-
-        # Get the data and initialize the forecast column
         data = self.get_data(product_ids=product_id, customer_ids=customer_id)
-        data['forecast'] = np.nan
-
-        # If no start date is given, start the forecast at the end of the data
-        if start_date is None:
-            start_date = data.shape[0] - len(forecast)
-
-        # Plot the data and the forecast
-        data.iloc[start_date:start_date+len(forecast), -1] = forecast
-        data = data.iloc[show_from: start_date + len(forecast)]
-        data = data.reset_index()
-        data = data.melt(id_vars='index', value_vars=['units_sold', 'forecast'], var_name='type', value_name='volume')
-
-        sns.lineplot(data=data, x='index', y='volume', hue='type', ax=ax)
+        plotting.plot_forecast(data, forecast, start_date=start_date, show_from=show_from, ax=ax, level=level)
 
     def get_serialized_data(self, product_id, customer_id, from_point=0, to_point=None):
         """
@@ -200,9 +468,28 @@ class BaseData:
             The serialized data.
         """
 
-        data = self.data[self.data['product_id'] == product_id]
-        data = data[data['customer_id'] == customer_id]
-        data = data['units_sold'].values[from_point:to_point]
-        data = [serialize_volume(x, self.dec_sep) for x in data]
-        data = ' , '.join(data)
-        return data
+        _, units = self._aggregate('series').get((product_id, customer_id))
+        return serialize_volume(units[from_point:to_point], self.dec_sep)
+
+
+def _extends(weeks, previous):
+    """ Returns whether the weeks are the previous weeks followed by later ones. """
+
+    return len(weeks) >= len(previous) and np.array_equal(weeks[:len(previous)], previous)
+
+
+def _append_unique(uniques, values):
+    """ Returns the uniques followed by the values not seen before, in order of appearance. """
+
+    values = pd.unique(np.asarray(values))
+    new = values[~pd.Index(values).isin(np.asarray(uniques))]
+    return np.concatenate([np.asarray(uniques), new]) if len(new) else uniques
+
+
+def _key_dtype(dtype):
+    """ Returns the dtype of a key column in the aggregated results. Integer ids are widened, since appended ids
+    may not fit the compacted type, and categoricals return the type of their values. """
+
+    if isinstance(dtype, pd.CategoricalDtype):
+        return dtype.categories.dtype
+    return np.int64 if dtype.kind in 'iu' else dtype
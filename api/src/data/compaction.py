@@ -0,0 +1,175 @@
+# compaction.py
+# Description: Converts sales frames to compact dtypes and reports their memory usage.
+# Author: Joshua Stiller
+# Date: 18.10.26
+
+import numpy as np
+import pandas as pd
+
+
+NAME_COLUMNS = ['product', 'customer']
+ID_COLUMNS = ['product_id', 'customer_id']
+QUANTITY_COLUMNS = ['units_sold']
+
+
+def normalize_ids(data, columns=ID_COLUMNS):
+    """
+    Converts id columns that were read as text but only contain integers to int64.
+
+    Parameters
+    ----------
+    data: pd.DataFrame,
+        The sales data.
+    columns: list of str,
+        The id columns.
+
+    Returns
+    -------
+    data: pd.DataFrame,
+        The sales data with integer ids where possible. The given frame if nothing was converted.
+    """
+
+    converted = {}
+    for column in columns:
+        if column not in data or not _is_text(data[column]):
+            continue
+        numeric = pd.to_numeric(data[column], errors='coerce')
+        if numeric.notna().all() and (numeric % 1 == 0).all():
+            converted[column] = numeric.astype(np.int64)
+    return data.assign(**converted) if converted else data
+
+
+def compact_frame(data):
+    """
+    Returns a copy of the sales data with compact dtypes.
+
+    Names and text ids become categoricals, integer ids and quantities the smallest integer type that holds
+    them, other quantities float32 if that keeps their values, and weeks a datetime of the week start.
+
+    Parameters
+    ----------
+    data: pd.DataFrame,
+        The sales data.
+
+    Returns
+    -------
+    data: pd.DataFrame,
+        The compacted sales data.
+    """
+
+    data = normalize_ids(data)
+    columns = {}
+
+    for column in NAME_COLUMNS:
+        if column in data:
+            columns[column] = data[column].astype('category')
+
+    for column in ID_COLUMNS:
+        if column not in data:
+            continue
+        if data[column].dtype.kind in 'iu':
+            columns[column] = pd.to_numeric(data[column], downcast='integer')
+        else:
+            columns[column] = data[column].astype('category')
+
+    for column in QUANTITY_COLUMNS:
+        if column not in data:
+            continue
+        values = data[column]
+        if values.dtype.kind == 'f' and values.notna().all() and (values % 1 == 0).all():
+            values = values.astype(np.int64)
+        if values.dtype.kind in 'iu':
+            columns[column] = pd.to_numeric(values, downcast='integer')
+        elif values.dtype.kind == 'f':
+            # Only exact conversions, pandas also downcasts e.g. 0.1 if the column has missing values
+            narrow = values.astype(np.float32)
+            if np.array_equal(_floats(narrow), _floats(values), equal_nan=True):
+                columns[column] = narrow
+
+    if 'week' in data:
+        columns['week'] = parse_weeks(data['week'])
+
+    return data.assign(**columns)
+
+
+def parse_weeks(weeks):
+    """
+    Converts weeks to a compact type.
+
+    Integer weeks are downcast, ISO weeks such as '2023-05' or '2023-W05' and dates become the datetime of the
+    Monday of their week. Anything else becomes a categorical.
+
+    Parameters
+    ----------
+    weeks: pd.Series,
+        The weeks.
+
+    Returns
+    -------
+    weeks: pd.Series,
+        The converted weeks.
+    """
+
+    if weeks.dtype.kind in 'iu':
+        return pd.to_numeric(weeks, downcast='integer')
+    if weeks.dtype.kind == 'M':
+        return _week_start(weeks)
+
+    text = weeks.astype(str)
+    iso = text.str.fullmatch(r'\d{4}-W?\d{1,2}')
+    if iso.all():
+        return pd.to_datetime(text.str.replace('W', '') + '-1', format='%G-%V-%u')
+
+    try:
+        return _week_start(pd.to_datetime(text, format='ISO8601'))
+    except (ValueError, TypeError):
+        return weeks.astype('category')
+
+
+def _week_start(dates):
+    return (dates - pd.to_timedelta(dates.dt.dayofweek, unit='D')).dt.normalize()
+
+
+def memory_usage(data):
+    """ Returns the dtype and the deep memory usage in bytes of every column. """
+
+    return pd.DataFrame({
+        'dtype': data.dtypes.astype(str),
+        'bytes': data.memory_usage(index=False, deep=True),
+    })
+
+
+def memory_usage_report(before, after):
+    """
+    Compares two memory usages returned by memory_usage.
+
+    Parameters
+    ----------
+    before: pd.DataFrame,
+        The usage of the original frame.
+    after: pd.DataFrame,
+        The usage of the compacted frame.
+
+    Returns
+    -------
+    report: pd.DataFrame,
+        Dtypes and bytes per column before and after, the ratio between them and a total row.
+    """
+
+    report = pd.DataFrame({
+        'dtype_before': before['dtype'],
+        'dtype_after': after['dtype'],
+        'bytes_before': before['bytes'],
+        'bytes_after': after['bytes'],
+    })
+    report.loc['total'] = ['', '', report['bytes_before'].sum(), report['bytes_after'].sum()]
+    report['ratio'] = report['bytes_before'] / report['bytes_after']
+    return report
+
+
+def _floats(values):
+    return values.to_numpy(dtype=np.float64, na_value=np.nan)
+
+
+def _is_text(values):
+    return values.dtype == object or pd.api.types.is_string_dtype(values.dtype)
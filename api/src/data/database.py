@@ -0,0 +1,308 @@
+# database.py
+# Description: Pooled connections and chunked streaming of the sales table into frames with the BaseData schema.
+# Author: Joshua Stiller
+# Date: 18.10.26
+
+import contextlib
+import itertools
+import queue
+import re
+import sqlite3
+import threading
+
+import numpy as np
+import pandas as pd
+
+from src.monitoring import metrics
+
+
+# The column names of the sales table mapped to the names used by BaseData, as in the showcase notebook
+SALES_COLUMNS = {
+    'teil_id': 'product_id',
+    'teil_name': 'product',
+    'kunde_id': 'customer_id',
+    'kunde_name': 'customer',
+    'woche': 'week',
+    'menge': 'units_sold',
+}
+
+# Table and column names are part of the statements, so only plain identifiers are accepted
+_IDENTIFIER = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+# Numbers the server side cursors of a process
+_cursor_names = itertools.count()
+
+
+class ConnectionPool:
+    """ Thread safe pool of DB-API connections, which are opened on demand and reused between queries. """
+
+    def __init__(self, connect, size=4, paramstyle='qmark', server_side=False):
+        """
+        Parameters
+        ----------
+        connect: callable,
+            Opens a new connection.
+        size: int,
+            The maximal number of open connections. Further callers wait until a connection is returned.
+        paramstyle: str,
+            The placeholder style of the driver, 'qmark' for ? and 'format' or 'pyformat' for %s.
+        server_side: bool,
+            Whether the driver supports named cursors that keep the result on the server, like psycopg.
+        """
+
+        self.size = size
+        self.paramstyle = paramstyle
+        self.server_side = server_side
+        self._connect = connect
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+
+    @property
+    def placeholder(self):
+        return '?' if self.paramstyle == 'qmark' else '%s'
+
+    @contextlib.contextmanager
+    def connection(self):
+        """
+        Borrows a connection for the duration of a with block.
+
+        The transaction is rolled back when the connection is returned, so it is clean for the next caller.
+        Connections that fail to roll back are closed instead.
+        """
+
+        self._slots.acquire()
+        try:
+            try:
+                connection = self._idle.get_nowait()
+            except queue.Empty:
+                connection = self._connect()
+                metrics.increment('db_connections_total')
+            try:
+                yield connection
+            finally:
+                try:
+                    connection.rollback()
+                except Exception:
+                    connection.close()
+                else:
+                    self._idle.put(connection)
+        finally:
+            self._slots.release()
+
+    def close(self):
+        """ Closes all idle connections. """
+
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+def sqlite_pool(path, size=4):
+    """
+    Returns a pool of connections to a SQLite database, e.g. a local copy of the sales table.
+
+    Parameters
+    ----------
+    path: str,
+        The location of the database file.
+    size: int,
+        The maximal number of open connections.
+
+    Returns
+    -------
+    pool: ConnectionPool,
+        The pool.
+    """
+
+    return ConnectionPool(lambda: sqlite3.connect(path, check_same_thread=False), size, paramstyle='qmark')
+
+
+def postgres_pool(dsn, size=4):
+    """
+    Returns a pool of connections to a Postgres database. Requires psycopg or psycopg2.
+
+    Parameters
+    ----------
+    dsn: str,
+        The connection string, e.g. the POSTGRES_URL of the app.
+    size: int,
+        The maximal number of open connections.
+
+    Returns
+    -------
+    pool: ConnectionPool,
+        The pool. Tables are read with server side cursors.
+    """
+
+    try:
+        import psycopg as driver
+    except ImportError:
+        import psycopg2 as driver
+
+    return ConnectionPool(lambda: driver.connect(dsn), size, paramstyle=driver.paramstyle, server_side=True)
+
+
+class SalesReader:
+    """ Streams the sales of a tenant from the sales table in chunks. """
+
+    def __init__(self, pool, table='sales', column_mapper=None, tenant_column='user_id', chunksize=50_000):
+        """
+        Parameters
+        ----------
+        pool: ConnectionPool,
+            The connections to the database.
+        table: str,
+            The name of the sales table.
+        column_mapper: dict or None,
+            Maps the column names of the table to the names used by BaseData. Defaults to SALES_COLUMNS. Tables
+            without product or customer ids get ids numbered in the order the names are read.
+        tenant_column: str,
+            The column with the user the sales belong to.
+        chunksize: int,
+            The number of rows fetched at once.
+        """
+
+        self.pool = pool
+        self.table = _identifier(table)
+        self.column_mapper = dict(SALES_COLUMNS if column_mapper is None else column_mapper)
+        self.tenant_column = _identifier(tenant_column)
+        self.chunksize = chunksize
+        self._source_columns = None
+
+    @property
+    def source_columns(self):
+        """ The mapped columns that exist in the table, read once from the database. """
+
+        if self._source_columns is None:
+            with self.pool.connection() as connection:
+                cursor = connection.cursor()
+                cursor.execute(f'SELECT * FROM {self.table} WHERE 1 = 0')
+                existing = [column[0] for column in cursor.description]
+                cursor.close()
+            self._source_columns = [_identifier(column) for column in self.column_mapper if column in existing]
+        return self._source_columns
+
+    def iter_chunks(self, user_id, since=None):
+        """
+        Yields the sales of a tenant chunk by chunk, so only one chunk of rows exists at a time.
+
+        Parameters
+        ----------
+        user_id: str,
+            The tenant, e.g. the email of the user.
+        since: object or None,
+            Only weeks after this week are read. Passed to the database as is, so it has the type of the week
+            column.
+
+        Yields
+        ------
+        chunk: pd.DataFrame,
+            The rows of the chunk with the mapped column names.
+        """
+
+        columns = self.source_columns
+        week = next((column for column in columns if self.column_mapper[column] == 'week'), None)
+        statement = (f'SELECT {", ".join(columns)} FROM {self.table} '
+                     f'WHERE {self.tenant_column} = {self.pool.placeholder}')
+        parameters = [user_id]
+        if since is not None:
+            if week is None:
+                raise ValueError(f"The table {self.table} has no week column.")
+            statement += f' AND {week} > {self.pool.placeholder}'
+            parameters.append(since)
+
+        names = [self.column_mapper[column] for column in columns]
+        with self.pool.connection() as connection:
+            # Named cursors keep the result on the server and send it chunk by chunk
+            if self.pool.server_side:
+                cursor = connection.cursor(name=f'sales_{next(_cursor_names)}')
+                cursor.itersize = self.chunksize
+            else:
+                cursor = connection.cursor()
+            try:
+                cursor.execute(statement, parameters)
+                while True:
+                    rows = cursor.fetchmany(self.chunksize)
+                    if not rows:
+                        break
+                    metrics.increment('db_rows_total', len(rows))
+                    yield pd.DataFrame.from_records(rows, columns=names)
+            finally:
+                cursor.close()
+
+    def read(self, user_id, since=None, lookups=None):
+        """
+        Reads the sales of a tenant into one frame with the schema of BaseData.
+
+        Every chunk is reduced to numeric codes and typed arrays before the next one is fetched, so the rows of
+        the driver are never collected.
+
+        Parameters
+        ----------
+        user_id: str,
+            The tenant.
+        since: object or None,
+            Only weeks after this week are read.
+        lookups: dict or None,
+            The ids of known product and customer names, {'product': {name: id}, 'customer': {name: id}}. They
+            are used for tables without ids and extended with new names, so ids stay the same across reads.
+
+        Returns
+        -------
+        sales: pd.DataFrame,
+            The columns product_id, product, customer_id, customer, week and units_sold with the names as
+            categoricals.
+        """
+
+        lookups = lookups if lookups is not None else {}
+        parts = []
+        for chunk in self.iter_chunks(user_id, since):
+            part = {}
+            for kind in ('product', 'customer'):
+                lookup = lookups.setdefault(kind, {})
+                codes = _encode(chunk[kind].to_numpy(dtype=object), lookup)
+                part[kind] = codes
+                part[f'{kind}_id'] = chunk[f'{kind}_id'].to_numpy() if f'{kind}_id' in chunk else codes
+            part['week'] = chunk['week'].to_numpy()
+            part['units_sold'] = _quantities(chunk['units_sold'].to_numpy())
+            parts.append(pd.DataFrame(part))
+
+        columns = ['product_id', 'product', 'customer_id', 'customer', 'week', 'units_sold']
+        if not parts:
+            sales = pd.DataFrame({column: pd.Series(dtype=np.int32 if column.endswith('_id') else object)
+                                  for column in columns})
+        else:
+            sales = pd.concat(parts, ignore_index=True)
+
+        # The codes become categoricals of all names known so far
+        for kind in ('product', 'customer'):
+            categories = pd.Index(list(lookups.get(kind, {})), dtype=object)
+            sales[kind] = pd.Categorical.from_codes(sales[kind].to_numpy(dtype=np.int64), categories=categories)
+        return sales[columns]
+
+
+def _identifier(name):
+    if not _IDENTIFIER.match(name):
+        raise ValueError(f"Invalid identifier {name!r}.")
+    return name
+
+
+def _encode(names, lookup):
+    """ Returns the ids of names, adding names that are not in the lookup yet with the next free ids. """
+
+    codes, uniques = pd.factorize(names, use_na_sentinel=False)
+    ids = np.array([lookup.setdefault(name, len(lookup)) for name in uniques.tolist()], dtype=np.int32)
+    return ids[codes]
+
+
+def _quantities(values):
+    """ Returns the quantities of a chunk as integers if they all are, floats otherwise, e.g. for decimals. """
+
+    if values.dtype.kind in 'iuf':
+        return values
+    values = np.asarray(values, dtype=float)
+    if np.all(np.mod(values, 1) == 0):
+        return values.astype(np.int64)
+    return values
@@ -0,0 +1,64 @@
+# database_data.py
+# Description: Sales data of a tenant loaded from the sales table and kept up to date with new weeks.
+# Author: Joshua Stiller
+# Date: 18.10.26
+
+from src.data.base_data import BaseData
+from src.data.database import SalesReader
+
+
+class DatabaseData(BaseData):
+    """ The sales of a tenant read from the database, see SalesReader. """
+
+    def __init__(self, source, user_id, compact=True, **reader_kwargs):
+        """
+        Parameters
+        ----------
+        source: SalesReader or ConnectionPool,
+            The reader of the sales table or the connections to build one with.
+        user_id: str,
+            The tenant, e.g. the email of the user.
+        compact: bool,
+            Whether to convert the data to compact dtypes.
+        reader_kwargs: dict,
+            Passed to SalesReader if a pool is given, e.g. table, column_mapper or chunksize.
+        """
+
+        self.reader = source if isinstance(source, SalesReader) else SalesReader(source, **reader_kwargs)
+        self.user_id = user_id
+
+        # The names seen so far keep their ids when new weeks are read
+        self._lookups = {}
+        data = self.reader.read(user_id, lookups=self._lookups)
+        self.last_week = _last_week(data)
+        super().__init__(data, compact=compact)
+
+    def refresh(self):
+        """
+        Reads the weeks after the last loaded week and appends them, see BaseData.append.
+
+        Only weeks later than last_week are read, so rows that are inserted afterwards for a week up to last_week,
+        e.g. late corrections of the current week, are never picked up. Create a new DatabaseData to read them.
+
+        Returns
+        -------
+        n_rows: int,
+            The number of new rows.
+        """
+
+        new_rows = self.reader.read(self.user_id, since=self.last_week, lookups=self._lookups)
+        if new_rows.shape[0] == 0:
+            return 0
+        self.last_week = _last_week(new_rows, self.last_week)
+        self.append(new_rows)
+        return new_rows.shape[0]
+
+
+def _last_week(data, default=None):
+    """ Returns the latest week as read from the database, before it is converted by BaseData. """
+
+    weeks = data['week'].dropna()
+    if weeks.shape[0] == 0:
+        return default
+    last_week = weeks.max()
+    return last_week.item() if hasattr(last_week, 'item') else last_week
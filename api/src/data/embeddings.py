@@ -0,0 +1,245 @@
+# embeddings.py
+# Description: Normalized embedding matrix of all series with blocked cosine top-k search, storable memory-mapped.
+# Author: Joshua Stiller
+# Date: 18.10.26
+
+import os
+
+import numpy as np
+from src.data.series_cube import _compact
+
+
+class EmbeddingStore:
+    """ Unit length float32 embeddings with one row per product and customer combination. """
+
+    def __init__(self, vectors, product_ids, customer_ids, normalized=False, block_size=65_536):
+        """
+        Parameters
+        ----------
+        vectors: array-like,
+            The embeddings with shape (series, dimensions).
+        product_ids: np.ndarray,
+            The product id of every row.
+        customer_ids: np.ndarray,
+            The customer id of every row.
+        normalized: bool,
+            Whether the rows already have unit length, e.g. when loaded from disk. They are used as given then,
+            so a memory-mapped matrix stays on disk.
+        block_size: int,
+            The number of rows normalized and searched at once, which bounds the temporary memory.
+        """
+
+        self.product_ids = np.asarray(product_ids)
+        self.customer_ids = np.asarray(customer_ids)
+        self.block_size = block_size
+        self.vectors = vectors if normalized else _normalize(vectors, block_size)
+        self._lookup = {key: i for i, key in enumerate(zip(self.product_ids.tolist(), self.customer_ids.tolist()))}
+
+    def __len__(self):
+        return self.vectors.shape[0]
+
+    @property
+    def dimensions(self):
+        return self.vectors.shape[1]
+
+    @classmethod
+    def from_embeddings(cls, keys, embeddings, block_size=65_536):
+        """
+        Builds the store from embeddings, e.g. the output of GPT3Model.embed_many.
+
+        Parameters
+        ----------
+        keys: list of tuples,
+            The (product_id, customer_id) key of every embedding.
+        embeddings: array-like,
+            The embeddings in the order of the keys.
+        block_size: int,
+            The number of rows normalized and searched at once.
+
+        Returns
+        -------
+        store: EmbeddingStore,
+            The store.
+        """
+
+        keys = list(keys)
+        product_ids = np.array([key[0] for key in keys])
+        customer_ids = np.array([key[1] for key in keys])
+        embeddings = np.asarray(embeddings, dtype=np.float32).reshape(len(keys), -1)
+        return cls(embeddings, product_ids, customer_ids, block_size=block_size)
+
+    def add(self, keys, embeddings):
+        """
+        Adds embeddings in memory. The embeddings of existing keys are replaced.
+
+        Parameters
+        ----------
+        keys: list of tuples,
+            The (product_id, customer_id) keys.
+        embeddings: array-like,
+            The embeddings in the order of the keys.
+        """
+
+        other = EmbeddingStore.from_embeddings(keys, embeddings, self.block_size)
+        existing = np.array([self._lookup.get(key, -1) for key in zip(other.product_ids.tolist(),
+                                                                      other.customer_ids.tolist())], dtype=np.intp)
+        replace = existing >= 0
+
+        vectors = np.array(self.vectors, dtype=np.float32)
+        vectors[existing[replace]] = other.vectors[replace]
+        new = ~replace
+        self.vectors = np.concatenate([vectors, other.vectors[new]])
+        self.product_ids = np.concatenate([self.product_ids, other.product_ids[new]])
+        self.customer_ids = np.concatenate([self.customer_ids, other.customer_ids[new]])
+        offset = len(self._lookup)
+        for i, key in enumerate(zip(other.product_ids[new].tolist(), other.customer_ids[new].tolist())):
+            self._lookup[key] = offset + i
+
+    def save(self, directory):
+        """
+        Saves the store as .npy files, which can be loaded memory-mapped by other processes.
+
+        Parameters
+        ----------
+        directory: str,
+            The target directory. It is created if it does not exist.
+        """
+
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, 'vectors.npy'), np.asarray(self.vectors, dtype=np.float32))
+        np.save(os.path.join(directory, 'product_id.npy'), _compact(self.product_ids))
+        np.save(os.path.join(directory, 'customer_id.npy'), _compact(self.customer_ids))
+
+    @classmethod
+    def load(cls, directory, mmap_mode='r', block_size=65_536):
+        """
+        Loads a saved store. The vectors are memory-mapped, so processes share the same pages.
+
+        Parameters
+        ----------
+        directory: str,
+            The directory written by save.
+        mmap_mode: str or None,
+            The mode passed to np.load. None reads the vectors into memory.
+        block_size: int,
+            The number of rows searched at once.
+
+        Returns
+        -------
+        store: EmbeddingStore,
+            The loaded store.
+        """
+
+        vectors = np.load(os.path.join(directory, 'vectors.npy'), mmap_mode=mmap_mode)
+        product_ids = np.load(os.path.join(directory, 'product_id.npy'))
+        customer_ids = np.load(os.path.join(directory, 'customer_id.npy'))
+        return cls(vectors, product_ids, customer_ids, normalized=True, block_size=block_size)
+
+    def row(self, product_id, customer_id):
+        """ Returns the row of a series or None if it does not exist. """
+
+        return self._lookup.get((product_id, customer_id))
+
+    def vector(self, product_id, customer_id):
+        """ Returns the normalized embedding of a series. Unknown series raise a KeyError. """
+
+        return self.vectors[self._lookup[(product_id, customer_id)]]
+
+    def top_k(self, queries, k=5, exclude=None):
+        """
+        Returns the rows with the highest cosine similarity to one or several query embeddings.
+
+        The matrix is searched block by block and only the best k rows per query are kept between blocks, so the
+        temporary memory is independent of the number of series.
+
+        Parameters
+        ----------
+        queries: array-like,
+            A single embedding or a matrix with one embedding per row. They do not need to be normalized.
+        k: int,
+            The number of rows per query.
+        exclude: array-like or None,
+            One row per query that is never returned, e.g. the row of the query series itself.
+
+        Returns
+        -------
+        rows: np.ndarray,
+            The rows per query, most similar first. Shape (k,) for a single and (queries, k) for several queries.
+        similarities: np.ndarray,
+            The cosine similarities of the rows.
+        """
+
+        single = np.ndim(queries) == 1
+        queries = _normalize(np.atleast_2d(np.asarray(queries, dtype=np.float32)), self.block_size)
+        n_queries, n_rows = queries.shape[0], len(self)
+        k = min(k, n_rows - (exclude is not None))
+        if k <= 0:
+            rows, similarities = np.empty((n_queries, 0), np.intp), np.empty((n_queries, 0), np.float32)
+            return (rows[0], similarities[0]) if single else (rows, similarities)
+
+        best_rows = np.empty((n_queries, 0), dtype=np.intp)
+        best = np.empty((n_queries, 0), dtype=np.float32)
+        for start in range(0, n_rows, self.block_size):
+            block = np.asarray(self.vectors[start:start + self.block_size])
+            similarity = queries @ block.T
+            if exclude is not None:
+                local = np.asarray(exclude).reshape(-1) - start
+                inside = (local >= 0) & (local < block.shape[0])
+                similarity[np.flatnonzero(inside), local[inside]] = -np.inf
+
+            # Candidates of this block merged with the best rows so far
+            kk = min(k, similarity.shape[1])
+            top = np.argpartition(-similarity, kk - 1, axis=1)[:, :kk]
+            best_rows = np.concatenate([best_rows, top + start], axis=1)
+            best = np.concatenate([best, np.take_along_axis(similarity, top, axis=1)], axis=1)
+            if best.shape[1] > k:
+                keep = np.argpartition(-best, k - 1, axis=1)[:, :k]
+                best_rows = np.take_along_axis(best_rows, keep, axis=1)
+                best = np.take_along_axis(best, keep, axis=1)
+
+        order = np.argsort(-best, axis=1, kind='stable')
+        rows, similarities = np.take_along_axis(best_rows, order, axis=1), np.take_along_axis(best, order, axis=1)
+        return (rows[0], similarities[0]) if single else (rows, similarities)
+
+    def nearest(self, product_id, customer_id, k=5):
+        """
+        Returns the series with the most similar embeddings.
+
+        Parameters
+        ----------
+        product_id: int,
+            The product_id of the series.
+        customer_id: int,
+            The customer_id of the series.
+        k: int,
+            The number of neighbours.
+
+        Returns
+        -------
+        neighbours: list of tuples,
+            The product_id, customer_id and cosine similarity of the neighbours, most similar first. The series
+            itself is excluded.
+
+        Raises
+        ------
+        KeyError,
+            If the series has no embedding.
+        """
+
+        row = self._lookup[(product_id, customer_id)]
+        rows, similarities = self.top_k(self.vectors[row], k, exclude=[row])
+        return [(self.product_ids[i].item(), self.customer_ids[i].item(), float(s))
+                for i, s in zip(rows, similarities)]
+
+
+def _normalize(vectors, block_size):
+    """ Returns the rows of the vectors scaled to unit length as float32. Rows of zeros stay zero. """
+
+    vectors = np.asarray(vectors)
+    normalized = np.empty(vectors.shape, dtype=np.float32)
+    for start in range(0, vectors.shape[0], block_size):
+        block = np.asarray(vectors[start:start + block_size], dtype=np.float32)
+        norm = np.linalg.norm(block, axis=1, keepdims=True)
+        normalized[start:start + block_size] = np.divide(block, norm, out=np.zeros_like(block), where=norm > 0)
+    return normalized
+
@@ -0,0 +1,205 @@
+# ingestion.py
+# Description: Chunked reading of sales exports with a columnar Parquet sidecar.
+# Author: Joshua Stiller
+# Date: 18.10.26
+
+import hashlib
+import json
+import os
+
+import pandas as pd
+
+
+# Dtypes of the mapped columns, used unless the caller passes its own. Narrower integers are not used, since
+# read_csv wraps values that overflow them instead of raising.
+DEFAULT_DTYPES = {
+    'product_id': 'int64',
+    'customer_id': 'int64',
+    'product': 'string',
+    'customer': 'string',
+    'week': 'string',
+    'units_sold': 'Int64',
+}
+
+# The id columns that are read as text if they are not all integers in the range of their default dtype
+ID_COLUMNS = ['product_id', 'customer_id']
+
+# The quantities that are read as floats if they are not all whole numbers
+QUANTITY_COLUMNS = ['units_sold']
+
+_METADATA_KEY = b'demand_forecasting.source'
+
+
+def sidecar_path(path):
+    """ Returns the location of the Parquet sidecar of a CSV file. """
+
+    return f'{path}.parquet'
+
+
+def _fingerprint(path, column_mapper, dtypes):
+    """ Returns what identifies a sidecar: the source's mtime and size and the mapping used to write it. """
+
+    stat = os.stat(path)
+    mapping = json.dumps({'column_mapper': column_mapper, 'dtypes': dtypes}, sort_keys=True)
+    return {
+        'mtime_ns': stat.st_mtime_ns,
+        'size': stat.st_size,
+        'mapping': hashlib.sha256(mapping.encode()).hexdigest(),
+    }
+
+
+def _read_sidecar(path, fingerprint, columns):
+    """ Returns the sidecar contents if it matches the fingerprint, None otherwise. """
+
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        return None
+
+    location = sidecar_path(path)
+    if not os.path.exists(location):
+        return None
+
+    metadata = pq.read_schema(location).metadata or {}
+    if json.loads(metadata.get(_METADATA_KEY, b'null')) != fingerprint:
+        return None
+
+    table = pq.read_table(location, columns=columns, memory_map=True)
+    return table.to_pandas()
+
+
+def read_sales_csv(path, column_mapper, dtypes=None, columns=None, chunksize=500_000, sidecar=True):
+    """
+    Reads a sales export in chunks with typed columns and caches it as Parquet next to the CSV file.
+
+    The sidecar is reused as long as the modification time and size of the CSV file and the mapping are
+    unchanged. Writing it requires pyarrow and a writable directory, without them the CSV file is read on every
+    call.
+
+    Parameters
+    ----------
+    path: str,
+        The location of the CSV file.
+    column_mapper: dict,
+        Maps the column names of the file to the names used by BaseData.
+    dtypes: dict or None,
+        The dtypes of the mapped columns. Defaults to DEFAULT_DTYPES for the columns of the file, where ids that
+        are not all integers are read as text and quantities that are not all whole numbers as float64. Columns
+        without a dtype are read as text, so every chunk has the same schema.
+    columns: list of str or None,
+        The mapped columns to return. None returns all columns.
+    chunksize: int,
+        The number of rows read at once.
+    sidecar: bool,
+        Whether to read and write the Parquet sidecar.
+
+    Returns
+    -------
+    data: pd.DataFrame,
+        The sales data with renamed columns. Whole quantities are int64, or float64 if values are missing.
+    """
+
+    header = [column_mapper.get(column, column) for column in pd.read_csv(path, nrows=0).columns]
+    if dtypes is None:
+        # Integer ids are much smaller, text ids and decimal quantities of other exports are read as they are
+        defaults = {column: DEFAULT_DTYPES.get(column, 'string') for column in header}
+        text_ids = {column: 'string' for column in ID_COLUMNS if column in defaults}
+        decimals = {column: 'float64' for column in QUANTITY_COLUMNS if column in defaults}
+        candidates = [defaults, {**defaults, **text_ids}]
+        if decimals:
+            candidates += [{**defaults, **decimals}, {**defaults, **text_ids, **decimals}]
+    else:
+        candidates = [{**{column: 'string' for column in header}, **dtypes}]
+
+    if sidecar:
+        for candidate in candidates:
+            data = _read_sidecar(path, _fingerprint(path, column_mapper, candidate), columns)
+            if data is not None:
+                return _numpy_quantities(data)
+
+    for i, candidate in enumerate(candidates):
+        try:
+            return _numpy_quantities(_read_chunks(path, column_mapper, candidate, columns, chunksize, sidecar))
+        except (ValueError, TypeError, OverflowError):
+            if i == len(candidates) - 1:
+                raise
+
+
+def _read_chunks(path, column_mapper, dtypes, columns, chunksize, sidecar):
+    """ Reads the CSV file with the given dtypes of the mapped columns and writes the sidecar. """
+
+    fingerprint = _fingerprint(path, column_mapper, dtypes)
+
+    # Dtypes are given for the column names of the file
+    source_names = {target: source for source, target in column_mapper.items()}
+    source_dtypes = {source_names.get(column, column): dtype for column, dtype in dtypes.items()}
+
+    # The sidecar is written to a temporary file first, so readers never see a partial one
+    location = sidecar_path(path)
+    partial = f'{location}.partial'
+    writer = None
+    chunks = []
+    try:
+        for chunk in pd.read_csv(path, dtype=source_dtypes, chunksize=chunksize):
+            chunk = chunk.rename(columns=column_mapper)
+            if sidecar:
+                try:
+                    writer = _write_chunk(writer, partial, chunk, fingerprint)
+                except OSError:
+                    # E.g. a read-only data directory, the data is still read without caching it
+                    _discard(writer, partial)
+                    writer, sidecar = None, False
+            chunks.append(chunk if columns is None else chunk[columns])
+    except BaseException:
+        _discard(writer, partial)
+        raise
+
+    if writer is not None:
+        try:
+            writer.close()
+            os.replace(partial, location)
+        except OSError:
+            _discard(None, partial)
+
+    return pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame(columns=columns)
+
+
+def _numpy_quantities(data):
+    """ Converts nullable integer quantities to int64, or to float64 if values are missing, like read_csv does. """
+
+    converted = {}
+    for column in QUANTITY_COLUMNS:
+        if column in data and isinstance(data[column].dtype, pd.Int64Dtype):
+            values = data[column]
+            converted[column] = values.astype('float64') if values.hasnans else values.astype('int64')
+    return data.assign(**converted) if converted else data
+
+
+def _discard(writer, partial):
+    """ Closes the writer of a partial sidecar and removes it. """
+
+    try:
+        if writer is not None:
+            writer.close()
+        if os.path.exists(partial):
+            os.remove(partial)
+    except OSError:
+        pass
+
+
+def _write_chunk(writer, location, chunk, fingerprint):
+    """ Appends a chunk as row group to the Parquet file and returns the writer. """
+
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        return None
+
+    table = pa.Table.from_pandas(chunk, preserve_index=False)
+    if writer is None:
+        metadata = dict(table.schema.metadata or {})
+        metadata[_METADATA_KEY] = json.dumps(fingerprint).encode()
+        writer = pq.ParquetWriter(location, table.schema.with_metadata(metadata))
+    writer.write_table(table.cast(writer.schema))
+    return writer
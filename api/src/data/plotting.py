@@ -0,0 +1,82 @@
+# plotting.py
+# Description: Plots of sales and forecasts. matplotlib and seaborn are only imported when a plot is drawn.
+# Author: Joshua Stiller
+# Date: 18.10.26
+
+import numpy as np
+
+
+def plot_sales(data, x=None, ax=None):
+    """
+    Plots sales as a line plot.
+
+    Parameters
+    ----------
+    data: pd.DataFrame,
+        The sales with a units_sold column.
+    x: str or None,
+        The column on the x-axis. None plots against the row number.
+    ax: matplotlib.axes.Axes or None,
+        The axes to draw on. Defaults to the current axes.
+    """
+
+    import matplotlib.pyplot as plt
+
+    if ax is None:
+        ax = plt.gca()
+
+    if x is None:
+        ax.plot(data['units_sold'])
+    else:
+        ax.plot(data[x], data['units_sold'])
+
+
+def plot_forecast(data, forecast, start_date=None, show_from=0, ax=None, level=0.8):
+    """
+    Plots sales and their forecast as a line plot.
+
+    Parameters
+    ----------
+    data: pd.DataFrame,
+        The sales with a units_sold column.
+    forecast: array-like or SampledForecast,
+        The forecasted values. Sampled forecasts are drawn as their median with the prediction interval as band.
+    start_date: int,
+        The date from which the forecast should be plotted.
+    show_from: int,
+        The date from which the sales should be plotted.
+    ax: matplotlib.axes.Axes or None,
+        The axes to draw on. Defaults to the current axes.
+    level: float,
+        The coverage of the prediction interval of a sampled forecast.
+    """
+
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    interval = forecast.interval(level) if hasattr(forecast, 'interval') else None
+    forecast = np.asarray(forecast)
+
+    if ax is None:
+        ax = plt.gca()
+
+    # Initialize the forecast column
+    data = data.copy()
+    data['forecast'] = np.nan
+
+    # If no start date is given, start the forecast at the end of the data
+    if start_date is None:
+        start_date = data.shape[0] - len(forecast)
+
+    # Plot the data and the forecast
+    data.iloc[start_date:start_date+len(forecast), -1] = forecast
+    steps = data.index[start_date:start_date+len(forecast)]
+    data = data.iloc[show_from: start_date + len(forecast)]
+    data = data.reset_index()
+    data = data.melt(id_vars='index', value_vars=['units_sold', 'forecast'], var_name='type', value_name='volume')
+
+    sns.lineplot(data=data, x='index', y='volume', hue='type', ax=ax)
+
+    if interval is not None:
+        lower, upper = interval
+        ax.fill_between(steps, lower, upper, alpha=0.25, label=f'{level:.0%} interval')
@@ -0,0 +1,178 @@
+# profiling.py
+# Description: Vectorized demand profile of many series: intermittency, variability, trend and seasonality.
+# Author: Joshua Stiller
+# Date: 18.10.26
+
+import numpy as np
+import pandas as pd
+
+# The columns of a profile in the order of profile_frame
+PROFILE_COLUMNS = ['length', 'demand_weeks', 'zero_share', 'adi', 'cv2', 'mean', 'std', 'trend_strength',
+                   'seasonal_strength', 'last_week']
+
+
+def profile_values(values, season_length=52, trend_window=13, block_size=8_192):
+    """
+    Profiles the demand of many series at once.
+
+    Every series is profiled from its first to its last week with demand, so zeros before a launch and after the
+    last sale do not count as intermittency. Trend and seasonal strength follow the decomposition based measures
+    of Wang, Smith and Hyndman: one minus the variance of the remainder relative to the variance of the trend or
+    seasonal component plus remainder.
+
+    Parameters
+    ----------
+    values: np.ndarray,
+        The weekly sales with shape (series, weeks) and zeros for weeks without sales, e.g. SeriesCube.values.
+    season_length: int,
+        The number of weeks per season. Series shorter than two seasons get a seasonal strength of 0.
+    trend_window: int,
+        The number of weeks of the centered moving average that estimates the trend.
+    block_size: int,
+        The number of series profiled at once, which bounds the temporary memory.
+
+    Returns
+    -------
+    profile: dict of np.ndarray,
+        One array per column of PROFILE_COLUMNS, where last_week is the position of the last week with demand
+        and -1 for series without any.
+    """
+
+    values = np.asarray(values)
+    n_series = values.shape[0]
+    profile = {column: np.empty(n_series) for column in PROFILE_COLUMNS}
+    profile['length'] = np.empty(n_series, dtype=np.int64)
+    profile['demand_weeks'] = np.empty(n_series, dtype=np.int64)
+    profile['last_week'] = np.empty(n_series, dtype=np.int64)
+
+    # Series without demand or trend give NaN moments, which are replaced in the results
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for start in range(0, n_series, block_size):
+            block = np.asarray(values[start:start + block_size], dtype=np.float64)
+            for column, result in _profile_block(block, season_length, trend_window).items():
+                profile[column][start:start + block_size] = result
+    return profile
+
+
+def profile_frame(values, product_ids, customer_ids, season_length=52, trend_window=13):
+    """
+    Returns the profile of many series as frame indexed by product_id and customer_id.
+
+    Parameters
+    ----------
+    values: np.ndarray,
+        The weekly sales with shape (series, weeks), see profile_values.
+    product_ids: np.ndarray,
+        The product id of every row.
+    customer_ids: np.ndarray,
+        The customer id of every row.
+    season_length: int,
+        The number of weeks per season.
+    trend_window: int,
+        The number of weeks of the moving average that estimates the trend.
+
+    Returns
+    -------
+    profile: pd.DataFrame,
+        The columns of PROFILE_COLUMNS per series.
+    """
+
+    profile = profile_values(values, season_length, trend_window)
+    index = pd.MultiIndex.from_arrays([np.asarray(product_ids), np.asarray(customer_ids)],
+                                      names=['product_id', 'customer_id'])
+    return pd.DataFrame(profile, index=index, columns=PROFILE_COLUMNS)
+
+
+def _profile_block(values, season_length, trend_window):
+    n_series, n_weeks = values.shape
+    demand = values != 0
+    demand_weeks = demand.sum(axis=1)
+    has_demand = demand_weeks > 0
+
+    # The span from the first to the last week with demand
+    first = np.where(has_demand, np.argmax(demand, axis=1), 0)
+    last = np.where(has_demand, n_weeks - 1 - np.argmax(demand[:, ::-1], axis=1), -1)
+    length = np.where(has_demand, last - first + 1, 0)
+    weeks = np.arange(n_weeks)
+    in_span = (weeks >= first[:, None]) & (weeks <= last[:, None])
+
+    # Average demand interval and squared coefficient of variation of the demand sizes
+    size_mean, size_var = _moments(values, demand)
+    mean, var = _moments(values, in_span)
+    trend_strength, seasonal_strength = _strength(values, in_span, season_length, trend_window)
+
+    return {
+        'length': length,
+        'demand_weeks': demand_weeks,
+        'zero_share': np.where(has_demand, 1 - demand_weeks / np.maximum(length, 1), 1.),
+        'adi': np.where(has_demand, length / np.maximum(demand_weeks, 1), np.inf),
+        'cv2': np.where(has_demand, size_var / size_mean ** 2, 0.),
+        'mean': np.where(has_demand, mean, 0.),
+        'std': np.where(has_demand, np.sqrt(var), 0.),
+        'trend_strength': trend_strength,
+        'seasonal_strength': seasonal_strength,
+        'last_week': last,
+    }
+
+
+def _moments(values, mask):
+    """ Returns the mean and variance of every row over the masked weeks, NaN for rows without any. """
+
+    count = mask.sum(axis=1)
+    mean = np.where(mask, values, 0.).sum(axis=1) / count
+    var = np.where(mask, (values - mean[:, None]) ** 2, 0.).sum(axis=1) / count
+    return mean, var
+
+
+def _strength(values, in_span, season_length, trend_window):
+    """ Returns the trend and seasonal strength of the series within their span. """
+
+    n_series, n_weeks = values.shape
+    length = in_span.sum(axis=1)
+
+    # Centered moving average over a whole season if there are two, so it does not follow the seasonal pattern
+    window = season_length if n_weeks >= 2 * season_length else trend_window
+    window = max(min(window, n_weeks), 1)
+    sums = np.zeros((n_series, n_weeks + 1))
+    np.cumsum(np.where(in_span, values, 0.), axis=1, out=sums[:, 1:])
+    counts = np.zeros((n_series, n_weeks + 1), dtype=np.int64)
+    np.cumsum(in_span, axis=1, out=counts[:, 1:])
+
+    # The trend is only defined where the whole window lies within the span
+    half = window // 2
+    trend = np.zeros(values.shape)
+    has_trend = np.zeros(values.shape, dtype=bool)
+    has_trend[:, half:half + n_weeks - window + 1] = (counts[:, window:] - counts[:, :-window]) == window
+    trend[:, half:half + n_weeks - window + 1] = (sums[:, window:] - sums[:, :-window]) / window
+    detrended = np.where(has_trend, values - trend, 0.)
+
+    # Seasonal component as mean of the detrended weeks per position in the season, centered to sum to zero
+    seasonal = np.zeros(values.shape)
+    if n_weeks >= 2 * season_length:
+        seasons = -(-n_weeks // season_length)
+        padded = np.zeros((n_series, seasons * season_length))
+        padded[:, :n_weeks] = detrended
+        observed = np.zeros((n_series, seasons * season_length), dtype=np.int64)
+        observed[:, :n_weeks] = has_trend
+        phase_count = observed.reshape(n_series, seasons, season_length).sum(axis=1)
+        enough = phase_count >= 2
+        pattern = np.where(enough, padded.reshape(n_series, seasons, season_length).sum(axis=1)
+                           / np.maximum(phase_count, 1), 0.)
+        pattern -= (pattern.sum(axis=1) / np.maximum(enough.sum(axis=1), 1))[:, None] * enough
+        seasonal = np.tile(pattern, (1, seasons))[:, :n_weeks]
+        seasonal[length < 2 * season_length] = 0.
+
+        # A mean of k weeks absorbs 1/k of the noise, which would make noise look seasonal with few seasons
+        correction = np.where(enough, phase_count / np.maximum(phase_count - 1, 1), 1.)
+        correction[length < 2 * season_length] = 1.
+        remainder_scale = np.sqrt(np.tile(correction, (1, seasons))[:, :n_weeks])
+    else:
+        remainder_scale = 1.
+
+    remainder = detrended - seasonal
+    _, remainder_var = _moments(remainder * remainder_scale, has_trend)
+    _, trend_var = _moments(trend + remainder, has_trend)
+    _, seasonal_var = _moments(seasonal + remainder, has_trend)
+    trend_strength = np.clip(np.nan_to_num(1 - remainder_var / trend_var), 0., 1.)
+    seasonal_strength = np.clip(np.nan_to_num(1 - remainder_var / seasonal_var), 0., 1.)
+    return trend_strength, seasonal_strength
@@ -0,0 +1,199 @@
+# series_cube.py
+# Description: Dense series x week matrix of the sales history, shareable as memory-mapped file.
+# Author: Joshua Stiller
+# Date: 18.10.26
+
+import os
+
+import numpy as np
+
+
+class SeriesCube:
+    """ Dense matrix with one row per product and customer combination and one column per week. """
+
+    def __init__(self, values, product_ids, customer_ids, weeks):
+        """
+        Parameters
+        ----------
+        values: np.ndarray,
+            The sales volumes with shape (series, weeks). Rows are sorted by product_id and customer_id.
+        product_ids: np.ndarray,
+            The product id of every row.
+        customer_ids: np.ndarray,
+            The customer id of every row.
+        weeks: np.ndarray,
+            The week of every column.
+        """
+
+        self.values = values
+        self.product_ids = product_ids
+        self.customer_ids = customer_ids
+        self.weeks = weeks
+        self._lookup = {key: i for i, key in enumerate(zip(product_ids.tolist(), customer_ids.tolist()))}
+
+        # Rows are sorted by product, so the rows of one product form a contiguous block
+        starts = np.flatnonzero(np.r_[True, product_ids[1:] != product_ids[:-1]]) if len(product_ids) else []
+        ends = np.append(starts[1:], len(product_ids)) if len(product_ids) else []
+        self._product_rows = {product_ids[s].item(): (s, e) for s, e in zip(starts, ends)}
+
+    @property
+    def shape(self):
+        return self.values.shape
+
+    @classmethod
+    def from_data(cls, data, dtype=None):
+        """
+        Builds the cube from a BaseData. Weeks without sales of a series are filled with zeros, see week_grid.
+
+        Parameters
+        ----------
+        data: BaseData,
+            The sales data with its series index.
+        dtype: np.dtype or None,
+            The dtype of the values. None uses int32 for integer and float32 for other volumes.
+
+        Returns
+        -------
+        cube: SeriesCube,
+            The dense sales history.
+        """
+
+        frame = data.data
+        index = data.series_index
+        units = frame['units_sold'].to_numpy()
+        if dtype is None:
+            dtype = np.int32 if units.dtype.kind in 'iub' else np.float32
+
+        # The frame of BaseData is sorted by series, so every row maps to the series of its block
+        rows = np.repeat(np.arange(len(index)), np.diff(index.offsets))
+        frame_weeks = frame['week'].to_numpy()
+        weeks = week_grid(frame_weeks)
+        week_codes = np.searchsorted(weeks, frame_weeks)
+
+        n_series, n_weeks = len(index), len(weeks)
+        flat = np.bincount(rows * n_weeks + week_codes, weights=units, minlength=n_series * n_weeks)
+        values = flat.reshape(n_series, n_weeks).astype(dtype)
+
+        first_rows = index.offsets[:-1]
+        product_ids = frame['product_id'].to_numpy()[first_rows]
+        customer_ids = frame['customer_id'].to_numpy()[first_rows]
+        return cls(values, _compact(product_ids), _compact(customer_ids), weeks)
+
+    def save(self, directory):
+        """
+        Saves the cube as .npy files, which can be loaded memory-mapped by other processes.
+
+        Parameters
+        ----------
+        directory: str,
+            The target directory. It is created if it does not exist.
+        """
+
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, 'values.npy'), self.values)
+        np.save(os.path.join(directory, 'product_id.npy'), _compact(self.product_ids))
+        np.save(os.path.join(directory, 'customer_id.npy'), _compact(self.customer_ids))
+        np.save(os.path.join(directory, 'week.npy'), _compact(self.weeks))
+
+    @classmethod
+    def load(cls, directory, mmap_mode='r'):
+        """
+        Loads a saved cube. The values are memory-mapped, so processes share the same pages.
+
+        Parameters
+        ----------
+        directory: str,
+            The directory written by save.
+        mmap_mode: str or None,
+            The mode passed to np.load. None reads the values into memory.
+
+        Returns
+        -------
+        cube: SeriesCube,
+            The loaded cube.
+        """
+
+        values = np.load(os.path.join(directory, 'values.npy'), mmap_mode=mmap_mode)
+        product_ids = np.load(os.path.join(directory, 'product_id.npy'))
+        customer_ids = np.load(os.path.join(directory, 'customer_id.npy'))
+        weeks = np.load(os.path.join(directory, 'week.npy'))
+        return cls(values, product_ids, customer_ids, weeks)
+
+    def row(self, product_id, customer_id):
+        """ Returns the row of a series or None if it does not exist. """
+
+        return self._lookup.get((product_id, customer_id))
+
+    def rows(self, keys):
+        """ Returns the rows of the given (product_id, customer_id) keys. Unknown keys raise a KeyError. """
+
+        return np.array([self._lookup[key] for key in keys], dtype=np.intp)
+
+    def series(self, product_id, customer_id):
+        """ Returns the sales of one series as view into the cube. """
+
+        return self.values[self._lookup[(product_id, customer_id)]]
+
+    def product(self, product_id):
+        """ Returns all series of a product as view into the cube together with their customer ids. """
+
+        start, end = self._product_rows[product_id]
+        return self.values[start:end], self.customer_ids[start:end]
+
+    def select(self, keys, weeks=slice(None)):
+        """
+        Returns the sales of several series.
+
+        Parameters
+        ----------
+        keys: list of tuples,
+            The (product_id, customer_id) keys.
+        weeks: slice,
+            The columns to return, e.g. the history of a backtest fold.
+
+        Returns
+        -------
+        values: np.ndarray,
+            The sales with shape (len(keys), weeks). A view if the keys are consecutive rows.
+        """
+
+        rows = self.rows(keys)
+        if len(rows) and np.all(np.diff(rows) == 1):
+            return self.values[rows[0]:rows[-1] + 1, weeks]
+        return self.values[rows, weeks]
+
+
+def week_grid(weeks):
+    """
+    Returns the columns of a cube for the given weeks.
+
+    Dates that are whole weeks apart become every week from the first to the last, so weeks without any sales
+    get a column too. Other weeks, e.g. week numbers, are used as they are.
+
+    Parameters
+    ----------
+    weeks: np.ndarray,
+        The weeks of the sales.
+
+    Returns
+    -------
+    weeks: np.ndarray,
+        The sorted weeks of the columns.
+    """
+
+    uniques = np.unique(weeks)
+    if uniques.dtype.kind == 'M' and len(uniques) > 1:
+        step = np.timedelta64(7, 'D')
+        offsets = uniques - uniques[0]
+        if np.all(offsets % step == np.timedelta64(0)):
+            return uniques[0] + np.arange(offsets[-1] // step + 1) * step
+    return uniques
+
+
+def _compact(values):
+    """ Converts object arrays to fixed width arrays, which np.save can store without pickling. """
+
+    values = np.asarray(values)
+    if values.dtype == object:
+        values = values.astype(str)
+    return values
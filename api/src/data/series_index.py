@@ -0,0 +1,94 @@
+# series_index.py
+# Description: Maps series keys to the rows of a sales frame.
+# Author: Joshua Stiller
+# Date: 18.10.26
+
+import numpy as np
+import pandas as pd
+
+
+class SeriesIndex:
+    """ Index from the values of key columns to the positions of their rows, built once per frame. """
+
+    def __init__(self, data, columns):
+        """
+        Parameters
+        ----------
+        data: pd.DataFrame,
+            The frame to index.
+        columns: list of str,
+            The key columns. Keys are tuples if more than one column is given.
+        """
+
+        self.columns = list(columns)
+        n_rows = data.shape[0]
+
+        # Sort by the codes of the key columns, which also works for object and mixed dtypes
+        codes = [pd.factorize(data[column], sort=True)[0] for column in self.columns]
+        order = np.lexsort(codes[::-1]) if n_rows else np.arange(0)
+        sorted_codes = [code[order] for code in codes]
+
+        # Rows of one key are contiguous in the sorted order
+        change = np.zeros(n_rows, dtype=bool)
+        change[:1] = True
+        for code in sorted_codes:
+            change[1:] |= code[1:] != code[:-1]
+        starts = np.flatnonzero(change)
+        self.offsets = np.append(starts, n_rows)
+
+        # Keep no order if the frame is already sorted, so lookups are plain slices
+        self.order = None if np.all(order[1:] > order[:-1]) else order
+
+        first_rows = order[starts]
+        key_values = [data[column].to_numpy()[first_rows] for column in self.columns]
+        if len(self.columns) == 1:
+            self.keys = key_values[0].tolist()
+        else:
+            self.keys = list(zip(*[values.tolist() for values in key_values]))
+        self._lookup = {key: i for i, key in enumerate(self.keys)}
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, key):
+        return key in self._lookup
+
+    def __iter__(self):
+        for i, key in enumerate(self.keys):
+            yield key, self._positions(i)
+
+    def _positions(self, i):
+        start, end = self.offsets[i], self.offsets[i + 1]
+        if self.order is None:
+            return slice(start, end)
+        return self.order[start:end]
+
+    def positions(self, key):
+        """
+        Returns the row positions of a key.
+
+        Parameters
+        ----------
+        key: object or tuple,
+            The value of the key column, or a tuple of values for several key columns.
+
+        Returns
+        -------
+        positions: slice or np.ndarray,
+            A slice if the rows are contiguous in the frame, the positions in frame order otherwise.
+            Unknown keys return an empty selection.
+        """
+
+        i = self._lookup.get(key)
+        if i is None:
+            return slice(0, 0)
+        return self._positions(i)
+
+    def take(self, keys):
+        """ Returns the sorted row positions of all given keys. Unknown keys are skipped. """
+
+        selected = [self._positions(self._lookup[key]) for key in keys if key in self._lookup]
+        if not selected:
+            return np.arange(0)
+        positions = np.concatenate([np.arange(s.start, s.stop) if isinstance(s, slice) else s for s in selected])
+        return np.sort(positions)
@@ -0,0 +1,81 @@
+# similarity.py
+# Description: Nearest neighbour search between the sales histories of all series.
+# Author: Joshua Stiller
+# Date: 18.10.26
+
+import numpy as np
+
+
+class SeriesSimilarity:
+    """ Finds the series whose sales pattern is most similar to a given series, independent of their volume. """
+
+    def __init__(self, cube, block_size=65_536):
+        """
+        Parameters
+        ----------
+        cube: SeriesCube,
+            The dense sales history of all series.
+        block_size: int,
+            The number of series normalized at once, which bounds the temporary memory.
+        """
+
+        self.cube = cube
+        self.block_size = block_size
+
+        # Centered and unit length rows, so the dot product is the correlation of two series
+        n_series = cube.shape[0]
+        self.vectors = np.empty(cube.shape, dtype=np.float32)
+        for start in range(0, n_series, block_size):
+            block = np.asarray(cube.values[start:start + block_size], dtype=np.float32)
+            block = block - block.mean(axis=1, keepdims=True)
+            norm = np.linalg.norm(block, axis=1, keepdims=True)
+            self.vectors[start:start + block_size] = np.divide(block, norm, out=np.zeros_like(block),
+                                                               where=norm > 0)
+
+    @classmethod
+    def from_data(cls, data):
+        """ Builds the search from a BaseData. """
+
+        return cls(data.to_cube(dtype=np.float32))
+
+    def nearest(self, product_id, customer_id, k=5):
+        """
+        Returns the most similar series.
+
+        Parameters
+        ----------
+        product_id: int,
+            The product_id of the series.
+        customer_id: int,
+            The customer_id of the series.
+        k: int,
+            The number of neighbours.
+
+        Returns
+        -------
+        neighbours: list of tuples,
+            The product_id, customer_id and similarity of the neighbours, most similar first. The series itself
+            is excluded.
+
+        Raises
+        ------
+        KeyError,
+            If the series does not exist.
+        """
+
+        row = self.cube.row(product_id, customer_id)
+        if row is None:
+            raise KeyError((product_id, customer_id))
+
+        similarity = np.empty(self.vectors.shape[0], dtype=np.float32)
+        for start in range(0, similarity.shape[0], self.block_size):
+            similarity[start:start + self.block_size] = self.vectors[start:start + self.block_size] @ self.vectors[row]
+        similarity[row] = -np.inf
+
+        k = min(k, similarity.shape[0] - 1)
+        if k <= 0:
+            return []
+        top = np.argpartition(-similarity, k - 1)[:k]
+        top = top[np.argsort(-similarity[top], kind='stable')]
+        return [(self.cube.product_ids[i].item(), self.cube.customer_ids[i].item(), float(similarity[i]))
+                for i in top]
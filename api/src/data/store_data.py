@@ -4,11 +4,10 @@
 # Date: 26.12.23
 
 
-import matplotlib.pyplot as plt
-import numpy as np
 import pandas as pd
-import seaborn as sns
 
+from src.data import plotting
+from src.data.series_index import SeriesIndex
 from src.model.utils import serialize_volume
 
 
@@ -29,6 +28,14 @@ class StoreData:
         self.dec_sep = ' '
         self.embeddings_2D = pd.DataFrame(columns=['store_id', 'sku_id', 'embedding_1', 'embedding_2'])
 
+    @property
+    def data(self):
+        return self._data
+
+    @data.setter
+    def data(self, data):
+        self._data = data
+        self.series_index = SeriesIndex(data, ['sku_id', 'store_id'])
 
     def get_data(self, product_ids, store_ids):
         """
@@ -52,10 +59,9 @@ class StoreData:
         if isinstance(store_ids, int):
             store_ids = [store_ids]
 
-        # Select data for the given products and stores
-        data = self.data[self.data['sku_id'].isin(product_ids)]
-        data = data[data['store_id'].isin(store_ids)]
-        return data[['store_id', 'sku_id', 'units_sold']]
+        # Select data for the given products and stores in their original order
+        rows = self.series_index.take([(p, s) for p in product_ids for s in store_ids])
+        return self.data.iloc[rows][['store_id', 'sku_id', 'units_sold']]
 
     def add_embeddings(self, embeddings, store_ids, product_ids):
         """
@@ -96,14 +102,10 @@ class StoreData:
 
         """
 
-        if ax is None:
-            ax = plt.gca()
-
         data = self.get_data(product_ids=product_id, store_ids=store_id)
+        plotting.plot_sales(data, ax=ax)
 
-        ax.plot(data['units_sold'])
-
-    def plot_forecast(self, product_id, store_id, forecast, start_date=None, show_from=0, ax=None):
+    def plot_forecast(self, product_id, store_id, forecast, start_date=None, show_from=0, ax=None, level=0.8):
         """
         Plots the sales of a product and its forecast as a line plot.
 
@@ -113,36 +115,22 @@ class StoreData:
             The product_id
         store_id: int,
             The store_id
-        forecast: array-like,
-            The forecasted values.
+        forecast: array-like or SampledForecast,
+            The forecasted values. Sampled forecasts are drawn with their prediction interval.
         start_date: int,
             The date from which the forecast should be plotted.
         show_from: int,
             The date from which the sales should be plotted.
+        level: float,
+            The coverage of the prediction interval of a sampled forecast.
 
         Returns
         -------
 
         """
 
-        if ax is None:
-            ax = plt.gca()
-
-        # Get the data and initialize the forecast column
         data = self.get_data(product_ids=product_id, store_ids=store_id)
-        data['forecast'] = np.nan
-
-        # If no start date is given, start the forecast at the end of the data
-        if start_date is None:
-            start_date = data.shape[0] - len(forecast)
-
-        # Plot the data and the forecast
-        data.iloc[start_date:start_date+len(forecast), -1] = forecast
-        data = data.iloc[show_from: start_date + len(forecast)]
-        data = data.reset_index()
-        data = data.melt(id_vars='index', value_vars=['units_sold', 'forecast'], var_name='type', value_name='volume')
-
-        sns.lineplot(data=data, x='index', y='volume', hue='type', ax=ax)
+        plotting.plot_forecast(data, forecast, start_date=start_date, show_from=show_from, ax=ax, level=level)
 
     def get_serialized_data(self, product_id, store_id, from_point=0, to_point=None):
         """
@@ -165,9 +153,6 @@ class StoreData:
             The serialized data.
         """
 
-        data = self.data[self.data['sku_id'] == product_id]
-        data = data[data['store_id'] == store_id]
-        data = data['units_sold'].values[from_point:to_point]
-        data = [serialize_volume(x, self.dec_sep) for x in data]
-        data = ' , '.join(data)
-        return data
+        rows = self.series_index.positions((product_id, store_id))
+        data = self.data['units_sold'].values[rows][from_point:to_point]
+        return serialize_volume(data, self.dec_sep)
@@ -4,13 +4,48 @@
 # Date: 15.03.24
 
 from src.data.base_data import BaseData
-import pandas as pd
+from src.data.ingestion import read_sales_csv
 
 class UserData(BaseData):
     
     
-    def __init__(self, data, column_mapper):
+    def __init__(self, data, column_mapper, dtypes=None, columns=None, sidecar=True, chunksize=500_000,
+                 compact=False):
+        """
+        Parameters
+        ----------
+        data: pd.DataFrame or str,
+            The sales data or the location of a CSV export.
+        column_mapper: dict,
+            Maps the column names of the data to the names used by BaseData.
+        dtypes: dict or None,
+            The dtypes of the mapped columns when reading a CSV export. See ingestion.DEFAULT_DTYPES.
+        columns: list of str or None,
+            The mapped columns to read from a CSV export. None reads all columns.
+        sidecar: bool,
+            Whether to cache a CSV export as Parquet file next to it.
+        chunksize: int,
+            The number of rows read at once from a CSV export.
+        compact: bool,
+            Whether to convert the data to compact dtypes.
+        """
+
+        self.column_mapper = column_mapper
         if isinstance(data, str):
-            data = pd.read_csv(data)
-        data.rename(columns=column_mapper, inplace=True)
-        super().__init__(data)
+            data = read_sales_csv(data, column_mapper, dtypes=dtypes, columns=columns, sidecar=sidecar,
+                                  chunksize=chunksize)
+        else:
+            data.rename(columns=column_mapper, inplace=True)
+        super().__init__(data, compact=compact)
+
+    def append(self, new_rows):
+        """
+        Adds new sales with the column names of the source, see BaseData.append.
+
+        Parameters
+        ----------
+        new_rows: pd.DataFrame,
+            The new sales.
+        """
+
+        super().append(new_rows.rename(columns=self.column_mapper))
@@ -0,0 +1,4 @@
+# __init__.py
+# Description: A brief description of what this file does.
+# Author: Joshua Stiller
+# Date: 18.10.26
@@ -0,0 +1,318 @@
+# backtest.py
+# Description: Rolling origin backtests of forecasting models over all series of a dataset.
+# Author: Joshua Stiller
+# Date: 18.10.26
+
+import asyncio
+import glob
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from src.model.bulk import run_blocking
+
+
+METRICS = ['mae', 'smape', 'mase', 'bias']
+
+
+def compute_metrics(actual, forecast, history, season_length=1):
+    """
+    Computes the accuracy of one forecast.
+
+    Parameters
+    ----------
+    actual: np.ndarray,
+        The observed sales of the forecast horizon.
+    forecast: np.ndarray,
+        The forecasted sales. Missing values are NaN and ignored.
+    history: np.ndarray,
+        The sales before the forecast origin, used to scale the MASE.
+    season_length: int,
+        The lag of the naive forecast that scales the MASE.
+
+    Returns
+    -------
+    metrics: dict,
+        The mean absolute error, symmetric MAPE in percent, mean absolute scaled error and mean bias.
+    """
+
+    error = forecast - actual
+    valid = ~np.isnan(error)
+    if not valid.any():
+        return {metric: np.nan for metric in METRICS}
+
+    error, actual, forecast = error[valid], actual[valid], forecast[valid]
+    mae = np.abs(error).mean()
+
+    # Weeks where forecast and actual are both zero count as perfect forecasts
+    denominator = np.abs(actual) + np.abs(forecast)
+    ratio = np.divide(2 * np.abs(error), denominator, out=np.zeros_like(denominator), where=denominator > 0)
+    smape = 100 * ratio.mean()
+
+    naive = np.abs(history[season_length:] - history[:-season_length]).mean() if len(history) > season_length else np.nan
+    mase = mae / naive if naive > 0 else np.nan
+
+    return {'mae': mae, 'smape': smape, 'mase': mase, 'bias': error.mean()}
+
+
+def rolling_origins(n_weeks, horizon, n_folds, step=None, min_train=20):
+    """
+    Returns the forecast origins of a rolling origin evaluation, latest first.
+
+    Parameters
+    ----------
+    n_weeks: int,
+        The length of the series.
+    horizon: int,
+        The number of weeks forecasted from each origin.
+    n_folds: int,
+        The maximal number of origins.
+    step: int or None,
+        The distance between origins. Defaults to the horizon.
+    min_train: int,
+        The minimal number of weeks before an origin.
+
+    Returns
+    -------
+    origins: list of int,
+        The number of weeks of history of every fold.
+    """
+
+    step = horizon if step is None else step
+    origins = [n_weeks - horizon - fold * step for fold in range(n_folds)]
+    return [origin for origin in origins if origin >= min_train]
+
+
+def _evaluate(model, task, horizon, season_length):
+    """ Forecasts one fold and returns its result row. """
+
+    product_id, customer_id, fold, origin, cutoff, values = task
+    history, actual = values[:origin], values[origin:origin + horizon].astype(float)
+    row = {'product_id': product_id, 'customer_id': customer_id, 'fold': fold, 'origin': origin, 'cutoff': cutoff,
+           'error': None}
+
+    try:
+        forecast, _ = model.predict(history, horizon)
+    except Exception as error:
+        row['error'] = repr(error)
+        row.update({metric: np.nan for metric in METRICS})
+        return row
+
+    return _score(row, forecast, actual, history, horizon, season_length)
+
+
+def _score(row, forecast, actual, history, horizon, season_length):
+    """ Adds the metrics of a forecast to a result row. Short forecasts are padded with NaN. """
+
+    padded = np.full(horizon, np.nan)
+    forecast = np.ravel(np.asarray(forecast, dtype=float))[:horizon]
+    padded[:len(forecast)] = forecast
+    row.update(compute_metrics(actual, padded, history, season_length))
+    return row
+
+
+def _evaluate_unit(model, tasks, horizon, season_length):
+    """ Evaluates a work unit in a worker process. """
+
+    return [_evaluate(model, task, horizon, season_length) for task in tasks]
+
+
+class Backtest:
+    """ Rolling origin backtest of a model over every series of a BaseData. """
+
+    def __init__(self, model, data, horizon=10, n_folds=3, step=None, min_train=20, season_length=1,
+                 output=None, executor='auto', n_jobs=None, unit_size=256):
+        """
+        Parameters
+        ----------
+        model: object,
+            Any model with predict(history, predict_frame) returning (forecast, extra). Models with apredict
+            are evaluated asynchronously by the auto executor.
+        data: BaseData,
+            The sales data.
+        horizon: int,
+            The number of calendar weeks forecasted per fold.
+        n_folds: int,
+            The maximal number of folds per series.
+        step: int or None,
+            The distance between fold origins. Defaults to the horizon.
+        min_train: int,
+            The minimal number of weeks of history of a fold, counted from the first week of the series.
+        season_length: int,
+            The lag of the naive forecast that scales the MASE.
+        output: str or None,
+            A directory for the Parquet results. Folds with a result for the same series and cutoff week are
+            skipped when a run is resumed, failed folds are run again.
+        executor: str,
+            One of 'process', 'async', 'serial' or 'auto'.
+        n_jobs: int or None,
+            The number of worker processes or concurrent requests.
+        unit_size: int,
+            The number of folds per work unit and result file.
+        """
+
+        if executor not in ('auto', 'process', 'async', 'serial'):
+            raise ValueError(f"Unknown executor {executor}.")
+
+        self.model = model
+        self.data = data
+        self.horizon = horizon
+        self.n_folds = n_folds
+        self.step = step
+        self.min_train = min_train
+        self.season_length = season_length
+        self.output = output
+        self.executor = executor
+        self.n_jobs = n_jobs
+        self.unit_size = unit_size
+
+    def _tasks(self, finished):
+        """ Returns all folds that are not finished yet. """
+
+        tasks = []
+        # Positions are calendar weeks, weeks without sales are zeros in the history and the horizon
+        for (product_id, customer_id), weeks, values in self.data.iter_weekly():
+            origins = rolling_origins(len(values), self.horizon, self.n_folds, self.step, self.min_train)
+            for fold, origin in enumerate(origins):
+                # Folds are identified by the last week of their history, which stays the same when weeks are added
+                cutoff = _week_key(weeks[origin - 1])
+                if (product_id, customer_id, cutoff) not in finished:
+                    tasks.append((product_id, customer_id, fold, origin, cutoff, values))
+        return tasks
+
+    def _keys(self):
+        """ Returns the fold number of every fold key of the current data. """
+
+        return {(task[0], task[1], task[4]): task[2] for task in self._tasks(set())}
+
+    def _finished(self):
+        """ Returns the keys of all folds without error in existing result files. """
+
+        results = self._read_parts()
+        if results.empty:
+            return set()
+        results = results[results['error'].isna()]
+        cutoffs = [_week_key(cutoff) for cutoff in results['cutoff'].tolist()]
+        return set(zip(results['product_id'].tolist(), results['customer_id'].tolist(), cutoffs))
+
+    def _read_parts(self):
+        """ Returns the latest result of every fold in the result files. Files of older versions without cutoff
+        weeks are ignored. """
+
+        if self.output is None:
+            return pd.DataFrame()
+        parts = sorted(glob.glob(os.path.join(self.output, 'folds', 'part-*.parquet')))
+        parts = [part for part in map(pd.read_parquet, parts) if 'cutoff' in part]
+        if not parts:
+            return pd.DataFrame()
+        folds = pd.concat(parts, ignore_index=True)
+        return folds.drop_duplicates(['product_id', 'customer_id', 'cutoff'], keep='last').reset_index(drop=True)
+
+    def _write_part(self, rows):
+        if self.output is None or not rows:
+            return
+        directory = os.path.join(self.output, 'folds')
+        os.makedirs(directory, exist_ok=True)
+
+        # Write to a temporary name first, so an interrupted write is not taken for a finished unit
+        number = len(glob.glob(os.path.join(directory, 'part-*.parquet')))
+        location = os.path.join(directory, f'part-{number:06d}.parquet')
+        pd.DataFrame(rows).to_parquet(f'{location}.partial', index=False)
+        os.replace(f'{location}.partial', location)
+
+    def run(self):
+        """
+        Runs all folds that are not finished yet.
+
+        Returns
+        -------
+        folds: pd.DataFrame,
+            One row with the metrics per series and fold.
+        """
+
+        finished = self._finished()
+        tasks = self._tasks(finished)
+        units = [tasks[i:i + self.unit_size] for i in range(0, len(tasks), self.unit_size)]
+
+        executor = self.executor
+        if executor == 'auto':
+            executor = 'async' if hasattr(self.model, 'apredict') else 'process'
+
+        rows = []
+        if executor == 'async':
+            rows = run_blocking(self._run_async(units))
+        elif executor == 'process' and len(units) > 1:
+            with ProcessPoolExecutor(max_workers=self.n_jobs) as pool:
+                futures = [pool.submit(_evaluate_unit, self.model, unit, self.horizon, self.season_length)
+                           for unit in units]
+                for future in futures:
+                    unit_rows = future.result()
+                    self._write_part(unit_rows)
+                    rows.extend(unit_rows)
+        else:
+            for unit in units:
+                unit_rows = _evaluate_unit(self.model, unit, self.horizon, self.season_length)
+                self._write_part(unit_rows)
+                rows.extend(unit_rows)
+
+        folds = pd.DataFrame(rows)
+        if self.output is not None:
+            # Folds of earlier runs whose cutoff is no longer a fold origin of the data are left out, the others
+            # are numbered by their position in the current data
+            folds = self._read_parts()
+            if len(folds):
+                keys = self._keys()
+                numbers = [keys.get(key, -1) for key in zip(folds['product_id'].tolist(),
+                                                            folds['customer_id'].tolist(),
+                                                            map(_week_key, folds['cutoff'].tolist()))]
+                folds = folds.assign(fold=numbers)
+                folds = folds[folds['fold'] >= 0].reset_index(drop=True)
+            self.summary(folds).to_parquet(os.path.join(self.output, 'summary.parquet'))
+        return folds
+
+    async def _run_async(self, units):
+        semaphore = asyncio.Semaphore(self.n_jobs or 8)
+
+        async def evaluate(task):
+            product_id, customer_id, fold, origin, cutoff, values = task
+            history, actual = values[:origin], values[origin:origin + self.horizon].astype(float)
+            row = {'product_id': product_id, 'customer_id': customer_id, 'fold': fold, 'origin': origin,
+                   'cutoff': cutoff, 'error': None}
+            try:
+                async with semaphore:
+                    forecast, _ = await self.model.apredict(history, self.horizon)
+            except Exception as error:
+                row['error'] = repr(error)
+                row.update({metric: np.nan for metric in METRICS})
+                return row
+            return _score(row, forecast, actual, history, self.horizon, self.season_length)
+
+        rows = []
+        for unit in units:
+            unit_rows = await asyncio.gather(*[evaluate(task) for task in unit])
+            self._write_part(unit_rows)
+            rows.extend(unit_rows)
+        return rows
+
+    def per_series(self, folds):
+        """ Returns the metrics of every series averaged over its folds. """
+
+        return folds.groupby(['product_id', 'customer_id'], observed=True)[METRICS].mean().reset_index()
+
+    def summary(self, folds):
+        """ Returns the metrics averaged over all folds, together with the number of folds and failures. """
+
+        summary = folds.reindex(columns=METRICS).astype(float).mean().to_frame().T
+        summary['folds'] = len(folds)
+        summary['failed'] = folds['error'].notna().sum() if 'error' in folds else 0
+        return summary
+
+
+def _week_key(week):
+    """ Returns a week in one type, whether it comes from the data or was read back from a result file. """
+
+    if isinstance(week, (np.datetime64, pd.Timestamp)):
+        return pd.Timestamp(week)
+    return week.item() if isinstance(week, np.generic) else week
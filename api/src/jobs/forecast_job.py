@@ -0,0 +1,319 @@
+# forecast_job.py
+# Description: Forecasts a whole portfolio ahead of time with resumable work units and partitioned Parquet output.
+# Author: Joshua Stiller
+# Date: 18.10.26
+
+import asyncio
+import glob
+import os
+import threading
+import zlib
+from concurrent.futures import Future, ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from src.model.bulk import run_blocking
+from src.monitoring import metrics
+
+# The columns of the forecast files, one row per series
+COLUMNS = ['product_id', 'customer_id', 'last_week', 'forecast', 'error', 'fallback', 'route']
+
+
+def min_weeks(n_weeks=20):
+    """
+    Returns a series filter that keeps series with sales in at least n_weeks distinct weeks, the rule of the
+    product selection of the app.
+
+    Parameters
+    ----------
+    n_weeks: int,
+        The minimal number of distinct weeks.
+
+    Returns
+    -------
+    select: callable,
+        Takes a BaseData and returns the (product_id, customer_id) keys to forecast.
+    """
+
+    def select(data):
+        weeks = data.data.groupby(['product_id', 'customer_id'], observed=True)['week'].nunique()
+        return set(weeks.index[weeks.to_numpy() >= n_weeks].tolist())
+
+    return select
+
+
+def _forecast_unit(model, tasks, horizon):
+    """ Forecasts a work unit series by series, also in a worker process. """
+
+    rows = []
+    for product_id, customer_id, values, last_week in tasks:
+        row = _row(product_id, customer_id, last_week)
+        try:
+            forecast, _ = model.predict(values, horizon)
+            row['forecast'] = _values(forecast, horizon)
+        except Exception as error:
+            row['error'] = repr(error)
+        rows.append(row)
+    return rows
+
+
+def _row(product_id, customer_id, last_week):
+    return {'product_id': product_id, 'customer_id': customer_id, 'last_week': last_week, 'forecast': None,
+            'error': None, 'fallback': False, 'route': None}
+
+
+def _values(forecast, horizon):
+    """ Returns a forecast as list of floats with NaN for missing values. """
+
+    return np.ravel(np.asarray(forecast, dtype=float))[:horizon].tolist()
+
+
+class ForecastJob:
+    """ Forecasts every selected series of a BaseData and stores the results for the API. """
+
+    def __init__(self, model, data, output, horizon=10, select=None, executor='auto', n_jobs=None,
+                 unit_size=256, n_buckets=16, **predict_kwargs):
+        """
+        Parameters
+        ----------
+        model: object,
+            Any model with predict(history, predict_frame) returning (forecast, extra). Models with
+            apredict_many, e.g. GPT3Model or RoutedModel, forecast every work unit with one bulk call.
+        data: BaseData,
+            The sales data.
+        output: str,
+            The directory of the Parquet results. Every series is forecast from the last week of the data, series
+            with a forecast from this week in existing result files are skipped when a run is resumed.
+        horizon: int,
+            The number of weeks to forecast.
+        select: callable or None,
+            Takes the data and returns the (product_id, customer_id) keys to forecast, e.g. min_weeks(20).
+            None forecasts all series.
+        executor: str,
+            One of 'process', 'async', 'serial' or 'auto'.
+        n_jobs: int or None,
+            The number of worker processes or of work units in flight.
+        unit_size: int,
+            The number of series per work unit.
+        n_buckets: int,
+            The number of partitions of the results by product_id.
+        predict_kwargs: dict,
+            Passed to apredict_many, e.g. max_concurrency, tokens_per_minute or pack_budget.
+        """
+
+        if executor not in ('auto', 'process', 'async', 'serial'):
+            raise ValueError(f"Unknown executor {executor}.")
+
+        self.model = model
+        self.data = data
+        self.output = output
+        self.horizon = horizon
+        self.select = select
+        self.executor = executor
+        self.n_jobs = n_jobs
+        self.unit_size = unit_size
+        self.n_buckets = n_buckets
+        self.predict_kwargs = predict_kwargs
+
+        self.units_total = 0
+        self.units_done = 0
+        self._lock = threading.Lock()
+        self._part = 0
+
+    @property
+    def progress(self):
+        """ The share of finished work units of the current run. """
+
+        return self.units_done / self.units_total if self.units_total else 1.
+
+    def _tasks(self, finished):
+        """ Returns the selected series that are not finished yet. """
+
+        selected = self.select(self.data) if self.select is not None else None
+        tasks = []
+        # Histories with zeros for weeks without sales, so intermittent and inactive series are recognized
+        for key, weeks, values in self.data.iter_weekly():
+            if selected is not None and key not in selected:
+                continue
+            last_week = weeks[-1] if len(weeks) else None
+            if key in finished and finished[key] == last_week:
+                continue
+            tasks.append((key[0], key[1], values, last_week))
+        return tasks
+
+    def _finished(self):
+        """ Returns the last week of every series with a forecast in existing result files. Failed series are
+        missing, so they are retried, and all series are forecast again once the data has later weeks. """
+
+        results = read_forecasts(self.output, columns=['product_id', 'customer_id', 'last_week', 'error'])
+        results = results[results['error'].isna()]
+        keys = zip(results['product_id'].tolist(), results['customer_id'].tolist())
+        return dict(zip(keys, results['last_week'].tolist()))
+
+    def _write_unit(self, rows):
+        """ Writes the results of a work unit into one file per bucket of product ids. """
+
+        if not rows:
+            return
+        frame = pd.DataFrame(rows, columns=COLUMNS)
+        buckets = np.array([_bucket(product_id, self.n_buckets) for product_id in frame['product_id'].tolist()])
+
+        with self._lock:
+            number = self._part
+            self._part += 1
+
+        # Every file is written to a temporary name first, so an interrupted write is not taken for a result
+        for bucket in np.unique(buckets):
+            directory = os.path.join(self.output, 'forecasts', f'bucket={bucket:03d}')
+            os.makedirs(directory, exist_ok=True)
+            location = os.path.join(directory, f'part-{number:06d}.parquet')
+            frame[buckets == bucket].to_parquet(f'{location}.partial', index=False)
+            os.replace(f'{location}.partial', location)
+
+        metrics.increment('job_series_total', int(frame['error'].isna().sum()), status='ok')
+        metrics.increment('job_series_total', int(frame['error'].notna().sum()), status='failed')
+
+    def run(self):
+        """
+        Forecasts all selected series that are not finished yet.
+
+        Returns
+        -------
+        forecasts: pd.DataFrame,
+            One row per series of this and earlier runs with the columns of COLUMNS.
+        """
+
+        os.makedirs(self.output, exist_ok=True)
+        self._part = _next_part(self.output)
+        tasks = self._tasks(self._finished())
+        units = [tasks[i:i + self.unit_size] for i in range(0, len(tasks), self.unit_size)]
+        self.units_total, self.units_done = len(units), 0
+
+        executor = self.executor
+        if executor == 'auto':
+            executor = 'async' if hasattr(self.model, 'apredict_many') else 'process'
+
+        if executor == 'async':
+            run_blocking(self._run_async(units))
+        elif executor == 'process' and len(units) > 1:
+            with ProcessPoolExecutor(max_workers=self.n_jobs) as pool:
+                futures = [pool.submit(_forecast_unit, self.model, unit, self.horizon) for unit in units]
+                for future in futures:
+                    self._finish_unit(future.result())
+        else:
+            for unit in units:
+                self._finish_unit(_forecast_unit(self.model, unit, self.horizon))
+
+        return read_forecasts(self.output)
+
+    def start(self):
+        """
+        Runs the job in a background thread.
+
+        Returns
+        -------
+        future: concurrent.futures.Future,
+            Resolves to the result of run. The progress can be followed in the meantime.
+        """
+
+        future = Future()
+
+        def target():
+            try:
+                future.set_result(self.run())
+            except BaseException as error:
+                future.set_exception(error)
+
+        threading.Thread(target=target, name='forecast-job', daemon=True).start()
+        return future
+
+    def _finish_unit(self, rows):
+        self._write_unit(rows)
+        self.units_done += 1
+
+    async def _run_async(self, units):
+        semaphore = asyncio.Semaphore(self.n_jobs or 2)
+
+        async def forecast(unit):
+            async with semaphore:
+                results = await self.model.apredict_many([task[2] for task in unit], self.horizon,
+                                                         **self.predict_kwargs)
+            rows = []
+            for (product_id, customer_id, _, last_week), result in zip(unit, results):
+                row = _row(product_id, customer_id, last_week)
+                if result.forecast is not None:
+                    row['forecast'] = _values(result.forecast, self.horizon)
+                row['error'] = None if result.ok else repr(result.error)
+                row['fallback'] = result.fallback
+                row['route'] = getattr(result, 'route', None)
+                rows.append(row)
+            self._finish_unit(rows)
+
+        await asyncio.gather(*[forecast(unit) for unit in units])
+
+
+def _bucket(product_id, n_buckets):
+    """ Returns the bucket of a product, stable across processes unlike the builtin hash of strings. """
+
+    return zlib.crc32(str(product_id).encode()) % n_buckets
+
+
+def _next_part(output):
+    """ Returns the number of the next result file, so a resumed run does not overwrite earlier files. """
+
+    parts = glob.glob(os.path.join(output, 'forecasts', 'bucket=*', 'part-*.parquet'))
+    numbers = [int(os.path.basename(part)[5:11]) for part in parts]
+    return max(numbers, default=-1) + 1
+
+
+def forecasts_version(output):
+    """
+    Returns what changes whenever a job writes results, so readers know when to load them again.
+
+    Parameters
+    ----------
+    output: str,
+        The output directory of the job.
+
+    Returns
+    -------
+    version: tuple,
+        The number of result files and the latest modification time.
+    """
+
+    parts = glob.glob(os.path.join(output, 'forecasts', 'bucket=*', 'part-*.parquet'))
+    return len(parts), max((os.stat(part).st_mtime_ns for part in parts), default=0)
+
+
+def read_forecasts(output, product_id=None, columns=None, n_buckets=16):
+    """
+    Reads the results of a ForecastJob.
+
+    Parameters
+    ----------
+    output: str,
+        The output directory of the job.
+    product_id: int or None,
+        Only reads the bucket of this product, which is much faster than reading all results.
+    columns: list of str or None,
+        The columns to read. None reads all.
+    n_buckets: int,
+        The number of buckets the job was run with.
+
+    Returns
+    -------
+    forecasts: pd.DataFrame,
+        One row per series. Series forecast by several runs keep the latest result.
+    """
+
+    pattern = '*' if product_id is None else f'{_bucket(product_id, n_buckets):03d}'
+    parts = sorted(glob.glob(os.path.join(output, 'forecasts', f'bucket={pattern}', 'part-*.parquet')),
+                   key=os.path.basename)
+    if not parts:
+        return pd.DataFrame(columns=columns or COLUMNS)
+
+    forecasts = pd.concat([pd.read_parquet(part, columns=columns) for part in parts], ignore_index=True)
+    if product_id is not None:
+        forecasts = forecasts[forecasts['product_id'] == product_id]
+    return forecasts.drop_duplicates(['product_id', 'customer_id'], keep='last').reset_index(drop=True)
@@ -0,0 +1,197 @@
+# bulk.py
+# Description: Concurrency and rate limited execution of many model requests.
+# Author: Joshua Stiller
+# Date: 18.10.26
+
+import asyncio
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class ForecastResult:
+    """ Outcome of a single series in a bulk run. """
+
+    def __init__(self, index, forecast=None, completion=None, error=None, attempts=0):
+        self.index = index
+        self.forecast = forecast
+        self.completion = completion
+        self.error = error
+        self.attempts = attempts
+        self.fallback = False
+        self.route = None
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def __repr__(self):
+        status = 'ok' if self.ok else f'error={self.error!r}'
+        return f"ForecastResult(index={self.index}, {status}, attempts={self.attempts})"
+
+
+class RateLimiter:
+    """ Token bucket limiter for requests and tokens per minute. """
+
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None, clock=time.monotonic, sleep=asyncio.sleep):
+        """
+        Parameters
+        ----------
+        requests_per_minute: int or None,
+            The maximal number of requests started per minute. None disables the limit.
+        tokens_per_minute: int or None,
+            The maximal number of tokens spent per minute. None disables the limit.
+        clock: callable,
+            Returns the current time in seconds.
+        sleep: coroutine function,
+            Waits for the given number of seconds.
+        """
+
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._clock = clock
+        self._sleep = sleep
+        self._requests = float(requests_per_minute or 0)
+        self._tokens = float(tokens_per_minute or 0)
+        self._last = clock()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = self._clock()
+        elapsed = now - self._last
+        self._last = now
+        if self.requests_per_minute:
+            self._requests = min(self.requests_per_minute, self._requests + elapsed * self.requests_per_minute / 60)
+        if self.tokens_per_minute:
+            self._tokens = min(self.tokens_per_minute, self._tokens + elapsed * self.tokens_per_minute / 60)
+
+    def _wait_time(self, tokens):
+        wait = 0.
+        if self.requests_per_minute and self._requests < 1:
+            wait = max(wait, (1 - self._requests) * 60 / self.requests_per_minute)
+        if self.tokens_per_minute:
+            # A single request larger than the whole budget only waits for a full bucket
+            tokens = min(tokens, self.tokens_per_minute)
+            if self._tokens < tokens:
+                wait = max(wait, (tokens - self._tokens) * 60 / self.tokens_per_minute)
+        return wait
+
+    async def acquire(self, tokens=0):
+        """
+        Waits until one request with the given number of tokens fits into the budget.
+
+        Parameters
+        ----------
+        tokens: int,
+            The estimated number of tokens of the request.
+        """
+
+        async with self._lock:
+            while True:
+                self._refill()
+                wait = self._wait_time(tokens)
+                if wait <= 0:
+                    break
+                await self._sleep(wait)
+
+            if self.requests_per_minute:
+                self._requests -= 1
+            if self.tokens_per_minute:
+                self._tokens -= tokens
+
+    def correct(self, estimated, actual):
+        """ Books the difference between the estimated and the actually used tokens. """
+
+        if self.tokens_per_minute and actual is not None:
+            self._tokens = min(self.tokens_per_minute, self._tokens + estimated - actual)
+
+
+async def run_bulk(request, items, max_concurrency=8, limiter=None, estimate_tokens=None, max_retries=3,
+                   backoff=1., max_backoff=30., retry_on=(Exception,), sleep=asyncio.sleep):
+    """
+    Runs request(item) for all items with bounded concurrency, rate limits and retries.
+
+    Parameters
+    ----------
+    request: coroutine function,
+        Called with one item, returns a tuple (forecast, completion).
+    items: iterable,
+        The inputs of the single requests.
+    max_concurrency: int,
+        The maximal number of requests in flight.
+    limiter: RateLimiter or None,
+        The rate limiter that every attempt has to pass.
+    estimate_tokens: callable or None,
+        Returns the estimated number of tokens of an item for the limiter.
+    max_retries: int,
+        The number of retries after a failed attempt.
+    backoff: float,
+        The base delay in seconds of the exponential backoff.
+    max_backoff: float,
+        The upper bound of a single backoff delay.
+    retry_on: tuple of Exception types,
+        The errors that are retried. All other errors fail the item immediately.
+    sleep: coroutine function,
+        Waits for the given number of seconds.
+
+    Returns
+    -------
+    results: list of ForecastResult,
+        One result per item in input order. Failed items carry the error instead of a forecast.
+    """
+
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def run_one(index, item):
+        tokens = estimate_tokens(item) if estimate_tokens is not None else 0
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                async with semaphore:
+                    if limiter is not None:
+                        await limiter.acquire(tokens)
+                    forecast, completion = await request(item)
+            except retry_on as error:
+                if attempt > max_retries:
+                    return ForecastResult(index, error=error, attempts=attempt)
+                delay = min(max_backoff, backoff * 2 ** (attempt - 1))
+                await sleep(delay * (0.5 + random.random() / 2))
+                continue
+            except Exception as error:
+                return ForecastResult(index, error=error, attempts=attempt)
+
+            if limiter is not None:
+                usage = getattr(completion, 'usage', None)
+                limiter.correct(tokens, getattr(usage, 'total_tokens', None))
+            return ForecastResult(index, forecast=forecast, completion=completion, attempts=attempt)
+
+    return await asyncio.gather(*[run_one(index, item) for index, item in enumerate(items)])
+
+
+def run_blocking(coroutine):
+    """
+    Runs a coroutine to completion from blocking code.
+
+    asyncio.run fails inside a running event loop, e.g. in a notebook or an async endpoint, so the coroutine then
+    gets its own loop on a worker thread. Async callers should await the coroutine instead, since the running loop
+    is blocked until it is done.
+
+    Parameters
+    ----------
+    coroutine: coroutine,
+        The coroutine to run.
+
+    Returns
+    -------
+    result: object,
+        The result of the coroutine.
+    """
+
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix='run-blocking') as pool:
+        return pool.submit(asyncio.run, coroutine).result()
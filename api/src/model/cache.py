@@ -0,0 +1,298 @@
+# cache.py
+# Description: Content addressed caches for completions and embeddings.
+# Author: Joshua Stiller
+# Date: 18.10.26
+
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+def _default(obj):
+    """ Makes numpy objects and other parts of a request JSON serializable. """
+
+    if isinstance(obj, np.ndarray):
+        if obj.dtype.hasobject:
+            return {'shape': obj.shape, 'values': json.dumps(obj.tolist(), default=str)}
+        data = np.ascontiguousarray(obj)
+        return {'dtype': data.dtype.str, 'shape': data.shape, 'sha256': hashlib.sha256(data.tobytes()).hexdigest()}
+    if isinstance(obj, np.generic):
+        return obj.item()
+    return repr(obj)
+
+
+def make_key(**parts):
+    """
+    Returns the content hash of a request.
+
+    Parameters
+    ----------
+    parts: dict,
+        Everything that determines the result, e.g. the kind of the request, model, messages and parameters.
+
+    Returns
+    -------
+    key: str,
+        The hex digest of the serialized parts.
+    """
+
+    payload = json.dumps(parts, sort_keys=True, default=_default)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def describe_scaler(scaler):
+    """ Returns the configuration of a scaler that influences a forecast. """
+
+    if scaler is None:
+        return None
+    if hasattr(scaler, 'get_params'):
+        params = scaler.get_params()
+    else:
+        # The default repr contains the memory address, so only plain public attributes are used
+        params = {name: value for name, value in getattr(scaler, '__dict__', {}).items()
+                  if not name.startswith('_') and isinstance(value, (bool, int, float, str, type(None)))}
+    return {'type': f'{type(scaler).__module__}.{type(scaler).__qualname__}', 'params': params}
+
+
+class CacheStats:
+    """ Hit and miss counters of a cache. """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.
+
+    def as_dict(self):
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions, 'hit_rate': self.hit_rate}
+
+    def __repr__(self):
+        return f"CacheStats(hits={self.hits}, misses={self.misses}, evictions={self.evictions})"
+
+
+class MemoryCache:
+    """ In-memory LRU cache with an optional time to live. """
+
+    def __init__(self, max_items=1024, ttl=None, clock=time.time):
+        """
+        Parameters
+        ----------
+        max_items: int,
+            The number of entries kept before the least recently used one is evicted.
+        ttl: float or None,
+            The lifetime of an entry in seconds. None keeps entries until they are evicted.
+        clock: callable,
+            Returns the current time in seconds.
+        """
+
+        self.max_items = max_items
+        self.ttl = ttl
+        self.stats = CacheStats()
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """ Returns the cached value or None. """
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl is not None and self._clock() - entry[1] > self.ttl:
+                del self._entries[key]
+                self.stats.evictions += 1
+                entry = None
+            if entry is None:
+                self.stats.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats.hits += 1
+            return entry[0]
+
+    def set(self, key, value):
+        """ Stores a value and evicts the least recently used entries above max_items. """
+
+        with self._lock:
+            self._entries[key] = (value, self._clock())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_items:
+                self._entries.popitem(last=False)
+                self.stats.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class DiskCache:
+    """
+    Persistent cache in a SQLite file with size and age based eviction.
+
+    The total size is counted when the file is opened and then by this instance only, so other processes that write to
+    the same file are not seen until it is opened again.
+    """
+
+    def __init__(self, path, max_bytes=512 * 2 ** 20, ttl=None, clock=time.time):
+        """
+        Parameters
+        ----------
+        path: str,
+            The location of the SQLite file. Missing directories are created.
+        max_bytes: int or None,
+            The total size of the stored values before the least recently used ones are evicted.
+        ttl: float or None,
+            The lifetime of an entry in seconds. None keeps entries until they are evicted.
+        clock: callable,
+            Returns the current time in seconds.
+        """
+
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.stats = CacheStats()
+        self._clock = clock
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value BLOB, '
+                                 'size INTEGER, created REAL, accessed REAL)')
+        self._connection.execute('CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)')
+
+        # The total size is kept up to date by every change, so set does not sum the whole table
+        self._total = self._size()
+
+    def __len__(self):
+        with self._lock:
+            return self._connection.execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+
+    def get(self, key):
+        """ Returns the cached value or None. """
+
+        with self._lock:
+            row = self._connection.execute('SELECT value, created, size FROM entries WHERE key = ?',
+                                           (key,)).fetchone()
+            now = self._clock()
+            if row is not None and self.ttl is not None and now - row[1] > self.ttl:
+                self._connection.execute('DELETE FROM entries WHERE key = ?', (key,))
+                self._total -= row[2]
+                self.stats.evictions += 1
+                row = None
+            if row is None:
+                self.stats.misses += 1
+                return None
+            self._connection.execute('UPDATE entries SET accessed = ? WHERE key = ?', (now, key))
+            self.stats.hits += 1
+        return pickle.loads(row[0])
+
+    def set(self, key, value):
+        """ Stores a value and evicts the least recently used entries above max_bytes. """
+
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            now = self._clock()
+            previous = self._connection.execute('SELECT size FROM entries WHERE key = ?', (key,)).fetchone()
+            self._connection.execute('INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)',
+                                     (key, blob, len(blob), now, now))
+            self._total += len(blob) - (previous[0] if previous is not None else 0)
+            if self.max_bytes is not None and self._total > self.max_bytes:
+                self._evict()
+
+    def _size(self):
+        return self._connection.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+
+    def _evict(self):
+        """ Deletes the least recently used entries until the total size is within max_bytes. """
+
+        # Only the oldest rows are read from the index on accessed, until they free enough space
+        excess = self._total - self.max_bytes
+        cursor = self._connection.execute('SELECT size FROM entries ORDER BY accessed')
+        count = freed = 0
+        while freed < excess:
+            row = cursor.fetchone()
+            if row is None:
+                break
+            count += 1
+            freed += row[0]
+        cursor.close()
+
+        self._connection.execute('DELETE FROM entries WHERE key IN '
+                                 '(SELECT key FROM entries ORDER BY accessed LIMIT ?)', (count,))
+        self._total -= freed
+        self.stats.evictions += count
+
+    def expire(self):
+        """ Removes all entries older than the time to live. """
+
+        if self.ttl is None:
+            return
+        with self._lock:
+            cursor = self._connection.execute('DELETE FROM entries WHERE created < ?', (self._clock() - self.ttl,))
+            self.stats.evictions += cursor.rowcount
+            self._total = self._size()
+
+    def clear(self):
+        with self._lock:
+            self._connection.execute('DELETE FROM entries')
+            self._total = 0
+
+    def close(self):
+        self._connection.close()
+
+
+class TieredCache:
+    """ Memory cache in front of a disk cache. Disk hits are promoted to memory. """
+
+    def __init__(self, memory=None, disk=None):
+        """
+        Parameters
+        ----------
+        memory: MemoryCache or None,
+            The first tier. A default MemoryCache is used if not given.
+        disk: DiskCache or None,
+            The persistent second tier.
+        """
+
+        self.memory = memory if memory is not None else MemoryCache()
+        self.disk = disk
+        self.stats = CacheStats()
+
+    def get(self, key):
+        """ Returns the cached value or None. """
+
+        value = self.memory.get(key)
+        if value is None and self.disk is not None:
+            value = self.disk.get(key)
+            if value is not None:
+                self.memory.set(key, value)
+
+        if value is None:
+            self.stats.misses += 1
+        else:
+            self.stats.hits += 1
+        return value
+
+    def set(self, key, value):
+        self.memory.set(key, value)
+        if self.disk is not None:
+            self.disk.set(key, value)
+
+    def clear(self):
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
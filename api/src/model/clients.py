@@ -0,0 +1,80 @@
+# clients.py
+# Description: OpenAI clients shared by all models of a process and created on first use.
+# Author: Joshua Stiller
+# Date: 18.10.26
+
+import asyncio
+import threading
+import weakref
+
+_lock = threading.Lock()
+_client = None
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_client():
+    """
+    Returns the blocking OpenAI client of the process.
+
+    The openai package and the .env file are only loaded by the first call, so importing the models stays cheap.
+
+    Returns
+    -------
+    client: OpenAI,
+        The client, configured from the environment.
+    """
+
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                from dotenv import load_dotenv
+                from openai import OpenAI
+
+                load_dotenv()
+                _client = OpenAI()
+    return _client
+
+
+def get_async_client():
+    """
+    Returns the asynchronous OpenAI client of the running event loop.
+
+    Its connection pool is bound to the loop, so every loop gets its own client, which is dropped with the loop.
+
+    Returns
+    -------
+    client: AsyncOpenAI,
+        The client, configured from the environment.
+    """
+
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        loop = None
+
+    with _lock:
+        client = _async_clients.get(loop) if loop is not None else None
+        if client is None:
+            from dotenv import load_dotenv
+            from openai import AsyncOpenAI
+
+            load_dotenv()
+            client = AsyncOpenAI()
+            if loop is not None:
+                _async_clients[loop] = client
+    return client
+
+
+def api_errors():
+    """ Returns the base class of the errors raised by the OpenAI API. """
+
+    import openai
+    return openai.APIError
+
+
+def retryable_errors():
+    """ Returns the errors of the OpenAI API that are worth another attempt. """
+
+    import openai
+    return (openai.RateLimitError, openai.APIConnectionError, openai.APITimeoutError, openai.InternalServerError)
@@ -0,0 +1,188 @@
+# codec.py
+# Description: Vectorized conversion between numeric arrays and prompt text.
+# Author: Joshua Stiller
+# Date: 18.10.26
+
+import re
+from functools import lru_cache
+from itertools import islice
+
+import numpy as np
+
+
+@lru_cache(maxsize=16)
+def _pattern(digit_sep):
+    """ Returns the regular expression of a number whose characters are separated by digit_sep. """
+
+    sep = f'(?:{re.escape(digit_sep)})?' if digit_sep else ''
+    return re.compile(rf'(?:-{sep})?\d(?:{sep}\d)*(?:{sep}\.{sep}\d(?:{sep}\d)*)?')
+
+
+def resolve_precision(values, precision=None, default=2):
+    """ Returns the given precision, or 0 for integral values and the default otherwise. """
+
+    if precision is not None:
+        return precision
+    values = np.asarray(values)
+    if values.dtype.kind in 'iub' or np.all(np.mod(values, 1) == 0):
+        return 0
+    return default
+
+
+def encode(values, precision=None, digit_sep=' ', num_sep=' , ', point='.'):
+    """
+    Encodes a 1-D or 2-D array of numbers as text in one vectorized step.
+
+    Every value is rounded to a fixed precision, its characters are separated by digit_sep and the values are
+    separated by num_sep. Rows of a 2-D array are encoded independently.
+
+    Parameters
+    ----------
+    values: array-like,
+        The numbers to encode. Scalars are treated as a single value.
+    precision: int or None,
+        The number of decimals. None uses 0 for integral values and 2 otherwise.
+    digit_sep: str,
+        The separator between the characters of a number.
+    num_sep: str,
+        The separator between numbers.
+    point: str,
+        The decimal point. An empty string drops it, which is unambiguous due to the fixed precision.
+
+    Returns
+    -------
+    text: str or list of str,
+        The encoded values, one string per row for 2-D input.
+    """
+
+    values = np.asarray(values, dtype=float)
+    rows = values.ndim == 2
+    if values.ndim > 2:
+        raise ValueError(f"Expected a 1-D or 2-D array, got {values.ndim} dimensions.")
+    values = np.atleast_2d(values)
+    if values.size == 0:
+        return [''] * values.shape[0] if rows else ''
+    if not np.all(np.isfinite(values)):
+        raise ValueError("Cannot encode NaN or infinite values.")
+
+    precision = resolve_precision(values, precision)
+    n_rows, n_cols = values.shape
+    flat = values.ravel()
+
+    # Fixed point integers of the absolute values and their number of digits
+    ints = np.rint(np.abs(flat) * 10 ** precision).astype(np.int64)
+    negative = (flat < 0) & (ints > 0)
+    n_digits = np.maximum(np.floor(np.log10(np.maximum(ints, 1))).astype(np.int64) + 1, precision + 1)
+    width = int(n_digits.max())
+
+    # Right aligned digit matrix, columns left of a value's first digit are invalid
+    powers = 10 ** np.arange(width - 1, -1, -1, dtype=np.int64)
+    digits = (ints[:, None] // powers) % 10
+    valid = np.arange(width) >= (width - n_digits)[:, None]
+
+    # Character slots per value: sign, integer digits, decimal point, decimals
+    point = point.encode()
+    n_int = width - precision
+    has_point = precision > 0 and len(point) > 0
+    slots = 1 + width + has_point
+    chars = np.zeros((flat.size, slots), dtype=np.uint8)
+    chars[:, 0] = np.where(negative, ord('-'), 0)
+    chars[:, 1:1 + n_int] = np.where(valid[:, :n_int], digits[:, :n_int] + ord('0'), 0)
+    if has_point:
+        chars[:, 1 + n_int] = point[0]
+    chars[:, slots - precision:] = digits[:, n_int:] + ord('0')
+
+    # Every slot is followed by the digit separator, the last slot of a value by the number separator
+    digit_sep, num_sep = digit_sep.encode(), num_sep.encode()
+    slot_width = 1 + max(len(digit_sep), len(num_sep))
+    text = np.zeros((flat.size, slots, slot_width), dtype=np.uint8)
+    text[:, :, 0] = chars
+    used = chars[:, :-1] != 0
+    if digit_sep:
+        text[:, :-1, 1:1 + len(digit_sep)] = np.where(used[:, :, None], np.frombuffer(digit_sep, np.uint8), 0)
+    if num_sep:
+        text[:, -1, 1:1 + len(num_sep)] = np.frombuffer(num_sep, np.uint8)
+        text.reshape(n_rows, n_cols, slots, slot_width)[:, -1, -1, 1:] = 0
+
+    text = text.reshape(n_rows, -1)
+    mask = text != 0
+    encoded = text[mask].tobytes().decode()
+    if not rows:
+        return encoded
+
+    bounds = np.concatenate([[0], np.cumsum(mask.sum(axis=1))])
+    return [encoded[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+
+
+def decode(text, n=None, digit_sep=' ', out=None, implied_decimals=0):
+    """
+    Decodes numbers from a completion, skipping any text around and between them.
+
+    Parameters
+    ----------
+    text: str,
+        The completion.
+    n: int or None,
+        The maximal number of values. Parsing stops once n values are found.
+    digit_sep: str,
+        The separator between the characters of a number.
+    out: np.ndarray or None,
+        A preallocated float array the values are written into. Its length bounds the number of values.
+    implied_decimals: int,
+        The precision of values encoded without decimal point.
+
+    Returns
+    -------
+    values: np.ndarray,
+        The decoded values. A view of out if it is given.
+    """
+
+    # Numbers may contain the digit separator between their characters, e.g. "1 2 . 5"
+    number = _pattern(digit_sep)
+
+    if out is None and n is None:
+        matches = number.findall(text)
+        if digit_sep:
+            matches = '\0'.join(matches).replace(digit_sep, '').split('\0') if matches else []
+        values = np.array(matches, dtype=float)
+        return values / 10 ** implied_decimals if implied_decimals else values
+
+    if out is None:
+        out = np.empty(n, dtype=float)
+    elif n is not None:
+        out = out[:n]
+
+    count = 0
+    for match in islice(number.finditer(text), len(out)):
+        out[count] = float(match.group().replace(digit_sep, '') if digit_sep else match.group())
+        count += 1
+    if implied_decimals:
+        out[:count] /= 10 ** implied_decimals
+    return out[:count]
+
+
+def decode_many(texts, n, digit_sep=' ', implied_decimals=0):
+    """
+    Decodes the first n numbers of several completions into the rows of one array.
+
+    Parameters
+    ----------
+    texts: list of str,
+        The completions, e.g. the choices of a request with several samples.
+    n: int,
+        The number of values per row.
+    digit_sep: str,
+        The separator between the characters of a number.
+    implied_decimals: int,
+        The precision of values encoded without decimal point.
+
+    Returns
+    -------
+    values: np.ndarray,
+        A len(texts) x n float array. Rows of completions with fewer than n numbers are padded with NaN.
+    """
+
+    values = np.full((len(texts), n), np.nan)
+    for row, text in zip(values, texts):
+        decode(text or '', out=row, digit_sep=digit_sep, implied_decimals=implied_decimals)
+    return values
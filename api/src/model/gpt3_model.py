@@ -3,21 +3,190 @@
 # Author: Joshua Stiller
 # Date: 27.12.23
 
-from dotenv import load_dotenv
-from openai import OpenAI
-from src.model.utils import serialize_volume, deserialize_volume
+import copy
 
+import numpy as np
+from src.model import clients
+from src.model.bulk import ForecastResult, RateLimiter, run_blocking, run_bulk
+from src.model.cache import make_key, describe_scaler
+from src.model.codec import decode_many
+from src.model.probabilistic import SampledForecast
+from src.model import packing
+from src.model.singleflight import SingleFlight
+from src.model.streaming import astream_completion, max_tokens_for, stream_completion
+from src.model.utils import serialize_volume, deserialize_volume
+from src.monitoring import metrics
 
 
 class GPT3Model:
     """ API wrapper for the GPT-3 API. """
 
-    def __init__(self, scaler=None):
+    def __init__(self, scaler=None, client=None, async_client=None, model="gpt-3.5-turbo", cache=None,
+                 fallback=None, single_flight=None, stream=False):
+        """
+        Parameters
+        ----------
+        scaler: object or None,
+            The scaler applied to the history before serialization.
+        client: OpenAI or None,
+            The client for blocking requests. The shared client of the process is used if not given.
+        async_client: AsyncOpenAI or None,
+            The client for asynchronous requests. The shared client of the running event loop is used if not given.
+        model: str,
+            The name of the chat model.
+        cache: MemoryCache, DiskCache, TieredCache or None,
+            The cache for completions and embeddings. None sends every request to the API.
+        fallback: object or None,
+            A local model with the same predict contract, e.g. StatisticalModel, used when the API fails.
+        single_flight: SingleFlight or None,
+            Lets concurrent identical requests share one API call. Pass the same instance to several models to
+            coalesce across them, a new one is used if not given.
+        stream: bool,
+            Whether to stream completions and close them as soon as predict_frame values are decoded. The
+            completion returned by predict then is a StreamedCompletion with the time to the first value.
+        """
 
-        load_dotenv()
-        self.client = OpenAI()
+        self._client = client
+        self._async_client = async_client
 
         self.scaler = scaler
+        self.model = model
+        self.embedding_model = "text-embedding-ada-002"
+        self.cache = cache
+        self.fallback = fallback
+        self.single_flight = single_flight if single_flight is not None else SingleFlight()
+        self.stream = stream
+
+    @property
+    def client(self):
+        # Created on first use, so constructing a model neither imports openai nor reads the environment
+        return self._client if self._client is not None else clients.get_client()
+
+    @property
+    def async_client(self):
+        return self._async_client if self._async_client is not None else clients.get_async_client()
+
+    def _scale(self, history, isolated=False):
+        """ Returns the scaled history and the scaler fitted to it. """
+
+        if self.scaler is None:
+            return history, None
+
+        # Concurrent requests and threads get their own scaler, so they do not overwrite each others fit
+        scaler = self._new_scaler() if isolated else self.scaler
+        history = scaler.fit_transform(history.reshape(-1,1))
+        return history, scaler
+
+    def _new_scaler(self):
+        """ Returns an unfitted scaler with the configuration of the scaler of the model. """
+
+        # Building it from its parameters skips copying the fitted state, which is refitted anyway
+        if hasattr(self.scaler, 'get_params'):
+            return type(self.scaler)(**self.scaler.get_params())
+        return copy.deepcopy(self.scaler)
+
+    def _request_key(self, kind, history, prompt, **params):
+        """ Returns the content hash of a request, which identifies it in the cache and among the calls in flight. """
+
+        model = self.embedding_model if kind == 'embedding' else self.model
+        return make_key(kind=kind, model=model, prompt=prompt, history=np.asarray(history),
+                        scaler=describe_scaler(self.scaler), params=params)
+
+    def _cache_get(self, key):
+        if self.cache is None:
+            return None
+        value = self.cache.get(key)
+        metrics.increment('cache_total', result='miss' if value is None else 'hit')
+        return value
+
+    def _cache_set(self, key, value):
+        if self.cache is not None:
+            self.cache.set(key, value)
+
+    def _build_messages(self, input_str, predict_frame):
+        """ Returns the chat messages asking for a continuation of the serialized history. """
+
+        chatgpt_sys_message = (f"You predict sales volumes. The user will provide a sequence of historic sales "
+                               f"volumes and you will predict the remaining sequence. The decimal values of the "
+                               f"volumes are separated by spaces and the different volumina are separated by commas.")
+        extra_input = (f"Please continue the following sequence for {predict_frame} values without producing any "
+                       f"additional text. Do not say anything like 'the next terms in the sequence are', just return "
+                       f"the numbers split by commas. Sequence:\n")
+
+        return [
+            {"role": "system", "content": chatgpt_sys_message},
+            {"role": "user", "content": extra_input + input_str}
+        ]
+
+    def _record(self, completion):
+        """ Adds the token usage and, for streamed completions, the time to the first value to the metrics. """
+
+        metrics.count_tokens(self.model, getattr(completion, 'usage', None))
+        time_to_first_value = getattr(completion, 'time_to_first_value', None)
+        if time_to_first_value is not None:
+            metrics.observe('time_to_first_value_seconds', time_to_first_value, model=self.model)
+        if getattr(completion, 'closed_early', False):
+            metrics.increment('streams_closed_early_total', model=self.model)
+
+    def _parse_forecast(self, completion, scaler, predict_frame):
+        """ Returns the forecast contained in the completion on the original scale. """
+
+        forecast = deserialize_volume(completion.choices[0].message.content, n=predict_frame)
+
+        if scaler is not None:
+            forecast = scaler.inverse_transform(forecast)
+
+        return forecast
+
+    def _chat_request(self, kind, history, predict_frame, **params):
+        """
+        Prepares the chat request of a forecast, shared by the blocking and the asynchronous variants.
+
+        Parameters
+        ----------
+        kind: str,
+            The kind of forecast in the request key, e.g. 'chat' or 'samples'.
+        history: np.ndarray,
+            The historic sales volumes.
+        predict_frame: int,
+            The number of days to predict.
+        params: dict,
+            Further arguments of the request, e.g. n and temperature. They are part of the request key.
+
+        Returns
+        -------
+        key: str,
+            The request key.
+        request: dict,
+            The arguments of chat.completions.create.
+        scaler: object or None,
+            The scaler fitted to the history.
+        cached: tuple or None,
+            The cached forecast and completion.
+        """
+
+        scaled, scaler = self._scale(history, isolated=True)
+        messages = self._build_messages(serialize_volume(scaled, dec_sep=' '), predict_frame)
+        key = self._request_key(kind, history, messages, predict_frame=predict_frame, **params)
+        request = dict(model=self.model, messages=messages, max_tokens=max_tokens_for(scaled, predict_frame), **params)
+        return key, request, scaler, self._cache_get(key)
+
+    def _finish(self, key, completion, forecast):
+        """ Records the usage of a completion and caches its forecast. """
+
+        self._record(completion)
+        result = forecast, completion
+        self._cache_set(key, result)
+        return result
+
+    def _fallback_forecast(self, history, predict_frame):
+        metrics.increment('fallbacks_total', model=self.model)
+        return self.fallback.predict(history, predict_frame)
+
+    def _fallback_samples(self, history, predict_frame):
+        # The point forecast of the fallback is a single sample without spread
+        forecast, extra = self._fallback_forecast(history, predict_frame)
+        return SampledForecast(np.reshape(forecast, (1, -1))), extra
 
     def predict(self, history, predict_frame=10):
         """
@@ -37,33 +206,330 @@ class GPT3Model:
             The GPT-3 completion of the prompt.
         """
 
-        if self.scaler is not None:
-            history = self.scaler.fit_transform(history.reshape(-1,1))
+        key, request, scaler, cached = self._chat_request('chat', history, predict_frame)
+        if cached is not None:
+            return cached
+        return self.single_flight.do(key, self._complete, key, history, request, scaler, predict_frame)
+
+    def _complete(self, key, history, request, scaler, predict_frame):
+        """ Sends the chat request of predict and caches the forecast. """
+
+        try:
+            with metrics.timer('openai', model=self.model):
+                if self.stream:
+                    completion = stream_completion(self.client, self.model, request['messages'], predict_frame,
+                                                   request['max_tokens'])
+                else:
+                    completion = self.client.chat.completions.create(**request)
+        except clients.api_errors():
+            if self.fallback is None:
+                raise
+            return self._fallback_forecast(history, predict_frame)
+
+        return self._finish(key, completion, self._parse_forecast(completion, scaler, predict_frame))
+
+    async def apredict(self, history, predict_frame=10):
+        """
+        Asynchronous version of predict using the async client.
+
+        Parameters
+        ----------
+        history: array-like
+            The historic sales volumes.
+        predict_frame: int
+            The number of days to predict.
+
+        Returns
+        -------
+        forecast: list,
+            The forecasted sales volumes as a list.
+        completion: Completion,
+            The GPT-3 completion of the prompt, or the extra output of the fallback model if the request failed.
+        """
+
+        try:
+            return await self._apredict(history, predict_frame)
+        except clients.api_errors():
+            if self.fallback is None:
+                raise
+            return self._fallback_forecast(history, predict_frame)
+
+    async def _apredict(self, history, predict_frame):
+        """ Forecasts with the API only. Bulk requests retry its errors before they fall back. """
+
+        key, request, scaler, cached = self._chat_request('chat', history, predict_frame)
+        if cached is not None:
+            return cached
+        return await self.single_flight.ado(key, self._acomplete, key, request, scaler, predict_frame)
+
+    async def _acomplete(self, key, request, scaler, predict_frame):
+        """ Sends the chat request of apredict and caches the forecast. """
+
+        with metrics.timer('openai', model=self.model):
+            if self.stream:
+                completion = await astream_completion(self.async_client, self.model, request['messages'],
+                                                      predict_frame, request['max_tokens'])
+            else:
+                completion = await self.async_client.chat.completions.create(**request)
+
+        return self._finish(key, completion, self._parse_forecast(completion, scaler, predict_frame))
+
+    def _parse_samples(self, completion, scaler, predict_frame):
+        """ Returns the forecasts of all choices of the completion as SampledForecast on the original scale. """
+
+        samples = decode_many([choice.message.content for choice in completion.choices], predict_frame)
+
+        if scaler is not None:
+            samples = scaler.inverse_transform(samples.reshape(-1, 1)).reshape(samples.shape)
+
+        return SampledForecast(samples)
+
+    def predict_samples(self, history, predict_frame=10, n_samples=20, temperature=1.):
+        """
+        Predicts sample paths of the sales volumes with a single request for several choices.
+
+        Parameters
+        ----------
+        history: array-like
+            The historic sales volumes.
+        predict_frame: int
+            The number of days to predict.
+        n_samples: int
+            The number of samples, i.e. choices of the completion.
+        temperature: float
+            The sampling temperature, which controls the spread of the samples.
+
+        Returns
+        -------
+        forecast: SampledForecast,
+            The samples with their quantiles and prediction intervals. Choices that cannot be parsed are
+            dropped, short ones are NaN after their last value.
+        completion: Completion,
+            The GPT-3 completion of the prompt.
+        """
+
+        key, request, scaler, cached = self._chat_request('samples', history, predict_frame, n=n_samples,
+                                                          temperature=temperature)
+        if cached is not None:
+            return cached
+        return self.single_flight.do(key, self._complete_samples, key, history, request, scaler, predict_frame)
 
+    def _complete_samples(self, key, history, request, scaler, predict_frame):
+        """ Sends the chat request of predict_samples and caches the samples. """
+
+        try:
+            with metrics.timer('openai', model=self.model):
+                completion = self.client.chat.completions.create(**request)
+        except clients.api_errors():
+            if self.fallback is None:
+                raise
+            return self._fallback_samples(history, predict_frame)
+
+        return self._finish(key, completion, self._parse_samples(completion, scaler, predict_frame))
+
+    async def apredict_samples(self, history, predict_frame=10, n_samples=20, temperature=1.):
+        """ Asynchronous version of predict_samples using the async client. """
+
+        try:
+            key, request, scaler, cached = self._chat_request('samples', history, predict_frame, n=n_samples,
+                                                              temperature=temperature)
+            if cached is not None:
+                return cached
+            return await self.single_flight.ado(key, self._acomplete_samples, key, request, scaler, predict_frame)
+        except clients.api_errors():
+            if self.fallback is None:
+                raise
+            return self._fallback_samples(history, predict_frame)
+
+    async def _acomplete_samples(self, key, request, scaler, predict_frame):
+        """ Sends the chat request of apredict_samples and caches the samples. """
+
+        with metrics.timer('openai', model=self.model):
+            completion = await self.async_client.chat.completions.create(**request)
+
+        return self._finish(key, completion, self._parse_samples(completion, scaler, predict_frame))
+
+    def _estimate_tokens(self, history, predict_frame):
+        """ Returns a rough upper estimate of the tokens of one request for the rate limiter. """
+
+        history, _ = self._scale(history, isolated=True)
         input_str = serialize_volume(history, dec_sep=' ')
+        prompt = sum(len(message['content']) for message in self._build_messages(input_str, predict_frame))
 
-        chatgpt_sys_message = (f"You predict sales volumes. The user will provide a sequence of historic sales "
-                               f"volumes and you will predict the remaining sequence. The decimal values of the "
-                               f"volumes are separated by spaces and the different volumina are separated by commas.")
-        extra_input = (f"Please continue the following sequence for {predict_frame} values without producing any "
-                       f"additional text. Do not say anything like 'the next terms in the sequence are', just return "
-                       f"the numbers split by commas. Sequence:\n")
+        # Digits separated by spaces end up as roughly one token per character pair
+        return prompt // 2 + max_tokens_for(history, predict_frame)
+
+    async def apredict_many(self, histories, predict_frame=10, max_concurrency=8, requests_per_minute=None,
+                            tokens_per_minute=None, max_retries=3, backoff=1., pack_budget=None):
+        """
+        Predicts many series concurrently with bounded parallelism, rate limits and retries.
+
+        Parameters
+        ----------
+        histories: iterable of array-like
+            The historic sales volumes of every series.
+        predict_frame: int
+            The number of days to predict.
+        max_concurrency: int
+            The maximal number of requests in flight.
+        requests_per_minute: int or None
+            The request budget per minute.
+        tokens_per_minute: int or None
+            The token budget per minute.
+        max_retries: int
+            The number of retries of a failed request.
+        backoff: float
+            The base delay in seconds of the exponential backoff.
+        pack_budget: int or None
+            Packs several labelled series into one request of at most this many estimated tokens, which saves
+            the instructions and the round trip per series. None sends one request per series.
+
+        Returns
+        -------
+        results: list of ForecastResult,
+            One result per series in input order. Failures are reported in the error attribute and carry the
+            forecast of the fallback model if one is set.
+        """
+
+        histories = list(histories)
+        limiter = None
+        if requests_per_minute or tokens_per_minute:
+            limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+
+        if pack_budget:
+            results = await self._apredict_packed(histories, predict_frame, pack_budget, max_concurrency, limiter,
+                                                  max_retries, backoff)
+        else:
+            results = await self._apredict_single(histories, predict_frame, max_concurrency, limiter,
+                                                  bool(tokens_per_minute), max_retries, backoff)
+
+        # Failed series keep their error but get the forecast of the fallback model
+        if self.fallback is not None:
+            for result in results:
+                if not result.ok:
+                    result.forecast, _ = self.fallback.predict(histories[result.index], predict_frame)
+                    result.fallback = True
+
+        return results
+
+    async def _apredict_single(self, histories, predict_frame, max_concurrency, limiter, estimate, max_retries,
+                               backoff):
+        """ Sends one request per series. """
 
-        completion = self.client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": chatgpt_sys_message},
-                {"role": "user", "content": extra_input + input_str}
-            ]
+        return await run_bulk(
+            lambda history: self._apredict(history, predict_frame),
+            histories,
+            max_concurrency=max_concurrency,
+            limiter=limiter,
+            estimate_tokens=(lambda history: self._estimate_tokens(history, predict_frame)) if estimate else None,
+            max_retries=max_retries,
+            backoff=backoff,
+            retry_on=clients.retryable_errors(),
         )
 
-        forecast = deserialize_volume(completion.choices[0].message.content)
+    async def _apredict_packed(self, histories, predict_frame, budget, max_concurrency, limiter, max_retries,
+                               backoff):
+        """
+        Packs the series into as few requests as the token budget allows and asks for a labelled continuation of
+        every series. Series that are cached skip the request, series whose part of the answer is missing,
+        malformed or cut off at max_tokens, or whose request failed, are requeued as single requests.
+        """
 
-        if self.scaler is not None:
-            forecast = self.scaler.inverse_transform(forecast)
+        results = [None] * len(histories)
+        pending = []
+        for index, history in enumerate(histories):
+            history = np.asarray(history)
+            scaled, scaler = self._scale(history, isolated=True)
+            input_str = serialize_volume(scaled, dec_sep=' ')
+            key = self._request_key('chat', history, self._build_messages(input_str, predict_frame),
+                                    predict_frame=predict_frame)
+            cached = self._cache_get(key)
+            if cached is not None:
+                results[index] = ForecastResult(index, forecast=cached[0], completion=cached[1])
+                continue
+
+            # The label, value separators and line break take a few tokens on top of the values
+            cost = packing.estimate_tokens(input_str) + max_tokens_for(scaled, predict_frame) + 4
+            pending.append((index, key, scaler, input_str, scaled, cost))
+
+        overhead = packing.estimate_tokens(''.join(
+            message['content'] for message in packing.build_packed_messages([], predict_frame)))
+        packs = [[pending[i] for i in pack]
+                 for pack in packing.pack_series([item[-1] for item in pending], budget, overhead)]
+
+        answers = await run_bulk(
+            lambda pack: self._acomplete_packed(pack, predict_frame),
+            packs,
+            max_concurrency=max_concurrency,
+            limiter=limiter,
+            estimate_tokens=lambda pack: overhead + sum(item[-1] for item in pack),
+            max_retries=max_retries,
+            backoff=backoff,
+            retry_on=clients.retryable_errors(),
+        )
+
+        requeue = []
+        for pack, answer in zip(packs, answers):
+            forecasts = answer.forecast if answer.ok else {}
+            for label, (index, *_) in zip(map(packing.label, range(len(pack))), pack):
+                if label in forecasts:
+                    results[index] = ForecastResult(index, forecast=forecasts[label], completion=answer.completion,
+                                                    attempts=answer.attempts)
+                else:
+                    requeue.append(index)
+
+        if requeue:
+            metrics.increment('packed_requeued_total', len(requeue), model=self.model)
+            single = await self._apredict_single([histories[index] for index in requeue], predict_frame,
+                                                 max_concurrency, limiter, limiter is not None, max_retries, backoff)
+            for index, result in zip(requeue, single):
+                result.index = index
+                results[index] = result
+
+        return results
+
+    async def _acomplete_packed(self, pack, predict_frame):
+        """ Sends one packed chat request and returns the forecasts by label together with the completion. """
 
-        return forecast[:predict_frame], completion
+        labels = [packing.label(i) for i in range(len(pack))]
+        messages = packing.build_packed_messages([(label, item[3]) for label, item in zip(labels, pack)],
+                                                 predict_frame)
+        max_tokens = sum(max_tokens_for(item[4], predict_frame) + 4 for item in pack)
 
+        with metrics.timer('openai', model=self.model):
+            completion = await self.async_client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                max_tokens=max_tokens
+            )
+        self._record(completion)
+        metrics.increment('packed_requests_total', model=self.model)
+
+        choice = completion.choices[0]
+        parsed = packing.parse_packed(choice.message.content, labels, predict_frame,
+                                      truncated=choice.finish_reason == 'length')
+        forecasts = {}
+        for label, (index, key, scaler, *_) in zip(labels, pack):
+            if label not in parsed:
+                continue
+            forecast = parsed[label]
+            if scaler is not None:
+                forecast = scaler.inverse_transform(forecast)
+            forecasts[label] = forecast
+            self._cache_set(key, (forecast, completion))
+        return forecasts, completion
+
+    def predict_many(self, histories, predict_frame=10, **kwargs):
+        """
+        Blocking version of apredict_many. Accepts the same keyword arguments.
+
+        Returns
+        -------
+        results: list of ForecastResult,
+            One result per series in input order.
+        """
+
+        return run_blocking(self.apredict_many(histories, predict_frame, **kwargs))
 
     def embed(self, history):
         """
@@ -80,11 +546,90 @@ class GPT3Model:
             The embedding of the sales data.
         """
 
+        input_str = self._embedding_input(history)
+
+        key = self._request_key('embedding', history, input_str)
+        cached = self._cache_get(key)
+        if cached is not None:
+            return cached
+
+        return self.single_flight.do(key, self._embed, key, input_str)
+
+    def _embedding_input(self, history):
+        """ Returns the serialized history that is embedded. """
+
+        scaled = history
         if self.scaler is not None:
-            history = self.scaler.fit_transform(history)
+            scaled = self._new_scaler().fit_transform(history)
+
+        input_str = serialize_volume(scaled)
+        return input_str.replace("\n", " ")
 
-        input_str = serialize_volume(history)
-        input_str = input_str.replace("\n", " ")
-        embedding = self.client.embeddings.create(input=[input_str], model="text-embedding-ada-002").data[0].embedding
+    def _embed(self, key, input_str):
+        """ Sends the embedding request of embed and caches the embedding. """
 
+        with metrics.timer('openai', model=self.embedding_model):
+            response = self.client.embeddings.create(input=[input_str], model=self.embedding_model)
+        metrics.count_tokens(self.embedding_model, getattr(response, 'usage', None))
+        embedding = response.data[0].embedding
+
+        self._cache_set(key, embedding)
         return embedding
+
+    def embed_many(self, histories, batch_size=2048, max_batch_tokens=250_000):
+        """
+        Embeds many series with as few requests as the limits of the embeddings endpoint allow.
+
+        Parameters
+        ----------
+        histories: iterable of array-like
+            The historic sales volumes of every series.
+        batch_size: int
+            The maximal number of inputs per request.
+        max_batch_tokens: int
+            The maximal estimated tokens of all inputs of a request.
+
+        Returns
+        -------
+        embeddings: np.ndarray,
+            The float32 embeddings with one row per series in input order, e.g. for EmbeddingStore.
+        """
+
+        histories = [np.asarray(history) for history in histories]
+        embeddings = [None] * len(histories)
+
+        pending = []
+        for index, history in enumerate(histories):
+            input_str = self._embedding_input(history)
+            key = self._request_key('embedding', history, input_str)
+            cached = self._cache_get(key)
+            if cached is not None:
+                embeddings[index] = cached
+            else:
+                pending.append((index, key, input_str))
+
+        # Digits separated by spaces end up as roughly one token per character pair
+        batch, tokens = [], 0
+        for item in pending:
+            cost = len(item[2]) // 2 + 1
+            if batch and (len(batch) >= batch_size or tokens + cost > max_batch_tokens):
+                self._embed_batch(batch, embeddings)
+                batch, tokens = [], 0
+            batch.append(item)
+            tokens += cost
+        if batch:
+            self._embed_batch(batch, embeddings)
+
+        return np.asarray(embeddings, dtype=np.float32).reshape(len(histories), -1)
+
+    def _embed_batch(self, batch, embeddings):
+        """ Sends one embedding request for a batch of embed_many and caches every embedding. """
+
+        with metrics.timer('openai', model=self.embedding_model):
+            response = self.client.embeddings.create(input=[item[2] for item in batch], model=self.embedding_model)
+        metrics.count_tokens(self.embedding_model, getattr(response, 'usage', None))
+
+        for data in response.data:
+            index, key, _ = batch[data.index]
+            embeddings[index] = data.embedding
+            self._cache_set(key, data.embedding)
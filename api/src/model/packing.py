@@ -0,0 +1,126 @@
+# packing.py
+# Description: Packs several series into one chat request and parses the labelled continuations.
+# Author: Joshua Stiller
+# Date: 18.10.26
+
+import re
+
+from src.model.codec import decode
+
+_LINE = re.compile(r'^[\s*#>-]*([A-Za-z]+\d+)\s*[:=)\]-]\s*(.*)$', re.MULTILINE)
+
+
+def label(i):
+    """ Returns the label of the i-th series of a pack. """
+
+    return f'S{i + 1}'
+
+
+def estimate_tokens(text):
+    """ Returns a rough number of tokens of prompt text, digits separated by spaces are about two characters. """
+
+    return len(text) // 2 + 1
+
+
+def pack_series(costs, budget, overhead=0):
+    """
+    Groups series into requests whose estimated tokens stay within a budget, keeping their order.
+
+    Parameters
+    ----------
+    costs: list of int,
+        The estimated prompt and completion tokens of every series.
+    budget: int,
+        The maximal tokens of a request.
+    overhead: int,
+        The fixed tokens of every request, i.e. the instructions.
+
+    Returns
+    -------
+    packs: list of lists of int,
+        The positions of the series of every request. A series above the budget gets a request of its own.
+    """
+
+    packs = []
+    current, used = [], overhead
+    for i, cost in enumerate(costs):
+        if current and used + cost > budget:
+            packs.append(current)
+            current, used = [], overhead
+        current.append(i)
+        used += cost
+    if current:
+        packs.append(current)
+    return packs
+
+
+def build_packed_messages(sequences, predict_frame):
+    """
+    Returns the chat messages asking for the continuation of several labelled series.
+
+    Parameters
+    ----------
+    sequences: list of tuples,
+        The label and the serialized history of every series.
+    predict_frame: int,
+        The number of values to continue every series with.
+
+    Returns
+    -------
+    messages: list of dict,
+        The system and user message.
+    """
+
+    system_message = ("You predict sales volumes. The user will provide several labelled sequences of historic sales "
+                      "volumes and you will predict the remaining values of each. The decimal values of the volumes "
+                      "are separated by spaces and the different volumina are separated by commas.")
+    instructions = (f"Please continue each of the following sequences for {predict_frame} values. Answer with one "
+                    f"line per sequence that starts with its label and a colon, followed by the numbers split by "
+                    f"commas, without producing any additional text. Sequences:\n")
+    lines = '\n'.join(f'{name}: {text}' for name, text in sequences)
+
+    return [
+        {"role": "system", "content": system_message},
+        {"role": "user", "content": instructions + lines}
+    ]
+
+
+def parse_packed(content, labels, predict_frame, digit_sep=' ', truncated=False):
+    """
+    Parses the labelled continuations of a packed completion.
+
+    Parameters
+    ----------
+    content: str,
+        The message content of the completion.
+    labels: list of str,
+        The labels of the series of the request.
+    predict_frame: int,
+        The number of values expected per series.
+    digit_sep: str,
+        The separator between the characters of a number.
+    truncated: bool,
+        Whether the completion stopped at max_tokens, i.e. finish_reason is 'length'. Its last line may end within a
+        number and is ignored.
+
+    Returns
+    -------
+    forecasts: dict,
+        The values by label. Labels whose line is missing, cut off or has fewer than predict_frame values are left
+        out, a duplicated label keeps its first line.
+    """
+
+    content = content or ''
+    if truncated:
+        content = content[:max(content.rfind('\n'), 0)]
+
+    wanted = set(labels)
+    forecasts = {}
+    for match in _LINE.finditer(content):
+        name = match.group(1).upper()
+        if name not in wanted or name in forecasts:
+            continue
+        values = decode(match.group(2), n=predict_frame, digit_sep=digit_sep)
+        if len(values) == predict_frame:
+            forecasts[name] = values
+    return forecasts
@@ -0,0 +1,87 @@
+# probabilistic.py
+# Description: Forecasts given as samples of several completions with vectorized quantiles and intervals.
+# Author: Joshua Stiller
+# Date: 18.10.26
+
+import warnings
+
+import numpy as np
+
+
+class SampledForecast:
+    """ Sample paths of a forecast. Every row is one sample, every column one step of the horizon. """
+
+    def __init__(self, samples):
+        """
+        Parameters
+        ----------
+        samples: array-like,
+            A samples x horizon array. Steps a sample did not reach are NaN, samples without any value are dropped.
+        """
+
+        samples = np.atleast_2d(np.asarray(samples, dtype=float))
+        self.samples = samples[~np.all(np.isnan(samples), axis=1)]
+        self.horizon = samples.shape[1]
+
+    @property
+    def n_samples(self):
+        return self.samples.shape[0]
+
+    @property
+    def counts(self):
+        """ The number of samples that reached every step. """
+
+        return np.sum(~np.isnan(self.samples), axis=0)
+
+    def quantiles(self, q):
+        """
+        Returns the quantiles of every step over the samples.
+
+        Parameters
+        ----------
+        q: float or array-like,
+            The quantiles between 0 and 1.
+
+        Returns
+        -------
+        quantiles: np.ndarray,
+            The quantiles with shape horizon for a single q and len(q) x horizon otherwise. Steps without any
+            sample are NaN.
+        """
+
+        if self.n_samples == 0:
+            return np.full(np.shape(q) + (self.horizon,), np.nan)
+
+        # Steps that no sample reached are NaN, which is the intended result and no reason to warn
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            return np.nanquantile(self.samples, q, axis=0)
+
+    def interval(self, level=0.8):
+        """ Returns the lower and upper bound of the central prediction interval with the given coverage. """
+
+        lower, upper = self.quantiles([(1 - level) / 2, (1 + level) / 2])
+        return lower, upper
+
+    @property
+    def median(self):
+        return self.quantiles(0.5)
+
+    @property
+    def mean(self):
+        if self.n_samples == 0:
+            return np.full(self.horizon, np.nan)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            return np.nanmean(self.samples, axis=0)
+
+    def __len__(self):
+        return self.horizon
+
+    def __array__(self, dtype=None, copy=None):
+        # Used like a point forecast, e.g. by plot_forecast, the sampled forecast is its median
+        median = self.median
+        return median if dtype is None else median.astype(dtype)
+
+    def __repr__(self):
+        return f"SampledForecast(n_samples={self.n_samples}, horizon={self.horizon})"
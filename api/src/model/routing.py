@@ -0,0 +1,251 @@
+# routing.py
+# Description: Routes every series by its demand profile to the LLM, a local method or a constant forecast.
+# Author: Joshua Stiller
+# Date: 18.10.26
+
+import numpy as np
+import pandas as pd
+
+from src.data.profiling import profile_values
+from src.model.bulk import ForecastResult, run_blocking
+from src.model.statistical_model import StatisticalModel
+from src.monitoring import metrics
+
+ROUTES = ('llm', 'local', 'constant')
+
+
+class RoutingPolicy:
+    """
+    Decides per series whether a forecast is worth an LLM request.
+
+    Series are classified by the scheme of Syntetos and Boylan into smooth, erratic, intermittent and lumpy demand
+    using the average demand interval (ADI) and the squared coefficient of variation of the demand sizes (CV²).
+    Series without recent demand or with constant demand get a constant forecast, intermittent, lumpy and short
+    series a local method, and only smooth or erratic series with a clear trend or seasonality the LLM.
+
+    Both measures count calendar weeks, so histories need one value per week with zeros for weeks without sales,
+    like the rows of SeriesCube or BaseData.iter_weekly. The weekly sums of get_data and iter_series skip these
+    weeks, with them every series looks smooth and active.
+    """
+
+    def __init__(self, adi_cutoff=1.32, cv2_cutoff=0.49, min_length=26, min_strength=0.5, max_inactive=26,
+                 constant_cv=0.01, local_methods=None, season_length=52, trend_window=13):
+        """
+        Parameters
+        ----------
+        adi_cutoff: float,
+            The average demand interval from which demand counts as intermittent.
+        cv2_cutoff: float,
+            The squared coefficient of variation of the demand sizes from which demand counts as erratic.
+        min_length: int,
+            The number of weeks from the first to the last sale below which a series is forecast locally.
+        min_strength: float,
+            The trend or seasonal strength from which a smooth or erratic series is sent to the LLM.
+        max_inactive: int,
+            The number of weeks without sales after which a series is forecast as zero.
+        constant_cv: float,
+            The coefficient of variation up to which a series is forecast by its mean.
+        local_methods: dict or None,
+            The StatisticalModel method per class. Defaults to SBA for intermittent and lumpy, SES otherwise.
+        season_length: int,
+            The number of weeks per season of the profile.
+        trend_window: int,
+            The number of weeks of the moving average of the profile for series shorter than two seasons.
+        """
+
+        self.adi_cutoff = adi_cutoff
+        self.cv2_cutoff = cv2_cutoff
+        self.min_length = min_length
+        self.min_strength = min_strength
+        self.max_inactive = max_inactive
+        self.constant_cv = constant_cv
+        self.local_methods = {'smooth': 'ses', 'erratic': 'ses', 'intermittent': 'sba', 'lumpy': 'sba',
+                              **(local_methods or {})}
+        self.season_length = season_length
+        self.trend_window = trend_window
+
+    def classify(self, profile):
+        """ Returns the demand class of every profiled series. """
+
+        intermittent = np.asarray(profile['adi']) >= self.adi_cutoff
+        erratic = np.asarray(profile['cv2']) >= self.cv2_cutoff
+        return np.select([intermittent & erratic, intermittent, erratic], ['lumpy', 'intermittent', 'erratic'],
+                         'smooth')
+
+    def route(self, profile, n_weeks):
+        """
+        Returns the route of every profiled series.
+
+        Parameters
+        ----------
+        profile: pd.DataFrame or dict,
+            The columns of profiling.PROFILE_COLUMNS.
+        n_weeks: int,
+            The number of weeks of the history, which tells how long ago the last sale was.
+
+        Returns
+        -------
+        routes: pd.DataFrame,
+            The columns class, route, method and level with the index of the profile. The method is the
+            StatisticalModel method of local series, the level the forecast of constant series.
+        """
+
+        demand_class = self.classify(profile)
+        mean = np.asarray(profile['mean'], dtype=float)
+        std = np.asarray(profile['std'], dtype=float)
+        length = np.asarray(profile['length'])
+        strength = np.maximum(np.asarray(profile['trend_strength']), np.asarray(profile['seasonal_strength']))
+        inactive = (n_weeks - 1 - np.asarray(profile['last_week']) > self.max_inactive) | (length == 0)
+        constant = std <= self.constant_cv * np.abs(mean)
+        sparse = np.isin(demand_class, ['intermittent', 'lumpy'])
+
+        route = np.select([inactive | constant, sparse | (length < self.min_length), strength >= self.min_strength],
+                          ['constant', 'local', 'llm'], 'local')
+        method = np.where(route == 'local', pd.Series(demand_class).map(self.local_methods).to_numpy(), None)
+        level = np.where(route == 'constant', np.where(inactive, 0., mean), np.nan)
+
+        index = profile.index if isinstance(profile, pd.DataFrame) else None
+        return pd.DataFrame({'class': demand_class, 'route': route, 'method': method, 'level': level}, index=index)
+
+    def route_histories(self, histories):
+        """
+        Profiles histories of any length and returns their routes in input order.
+
+        Parameters
+        ----------
+        histories: iterable of array-like,
+            The weekly sales of every series with zeros for weeks without sales, e.g. rows of SeriesCube. All
+            histories end with the same week.
+
+        Returns
+        -------
+        routes: pd.DataFrame,
+            The routes of the histories, see route.
+        """
+
+        histories = [np.asarray(history, dtype=float).ravel() for history in histories]
+        n_weeks = max((len(history) for history in histories), default=0)
+
+        # Left padding with zeros keeps the last weeks aligned and is ignored as weeks before the first sale
+        values = np.zeros((len(histories), n_weeks))
+        for row, history in zip(values, histories):
+            if len(history):
+                row[n_weeks - len(history):] = history
+        profile = profile_values(values, self.season_length, self.trend_window)
+        return self.route(profile, n_weeks)
+
+    def __repr__(self):
+        return (f"RoutingPolicy(adi_cutoff={self.adi_cutoff}, cv2_cutoff={self.cv2_cutoff}, "
+                f"min_length={self.min_length}, min_strength={self.min_strength})")
+
+
+class RoutedModel:
+    """ Model with the predict contract of GPT3Model that only sends series to it when the policy says so. """
+
+    def __init__(self, model, policy=None, local=None):
+        """
+        Parameters
+        ----------
+        model: GPT3Model,
+            The model of series routed to the LLM.
+        policy: RoutingPolicy or None,
+            The routing policy. The defaults are used if not given.
+        local: dict or None,
+            Keyword arguments of the StatisticalModel of local series, e.g. season_length.
+        """
+
+        self.model = model
+        self.policy = policy if policy is not None else RoutingPolicy()
+        self.local = local or {}
+        self._local_models = {}
+
+    def _local_model(self, method):
+        if method not in self._local_models:
+            self._local_models[method] = StatisticalModel(method, **self.local)
+        return self._local_models[method]
+
+    def _predict_local(self, history, predict_frame, route):
+        """ Returns the forecast of a series that does not go to the LLM. """
+
+        metrics.increment('routes_total', route=route['route'])
+        if route['route'] == 'constant':
+            return np.full(predict_frame, route['level']), None
+        return self._local_model(route['method']).predict(np.asarray(history, dtype=float), predict_frame)
+
+    def predict(self, history, predict_frame=10):
+        """ Predicts one series with the route of its profile, see GPT3Model.predict. The history needs one value
+        per week, see RoutingPolicy. """
+
+        route = self.policy.route_histories([history]).iloc[0]
+        if route['route'] != 'llm':
+            return self._predict_local(history, predict_frame, route)
+        metrics.increment('routes_total', route='llm')
+        return self.model.predict(history, predict_frame)
+
+    async def apredict(self, history, predict_frame=10):
+        """ Asynchronous version of predict. """
+
+        route = self.policy.route_histories([history]).iloc[0]
+        if route['route'] != 'llm':
+            return self._predict_local(history, predict_frame, route)
+        metrics.increment('routes_total', route='llm')
+        return await self.model.apredict(history, predict_frame)
+
+    async def apredict_many(self, histories, predict_frame=10, routes=None, **kwargs):
+        """
+        Predicts many series, sending only those routed to the LLM through the bulk path of the model.
+
+        Parameters
+        ----------
+        histories: iterable of array-like
+            The weekly sales of every series with zeros for weeks without sales, see RoutingPolicy.
+        predict_frame: int
+            The number of weeks to predict.
+        routes: pd.DataFrame or None
+            The routes of the histories in input order, e.g. from BaseData.routes. They are profiled if not given.
+        kwargs: dict
+            Passed to the apredict_many of the model, e.g. max_concurrency or pack_budget.
+
+        Returns
+        -------
+        results: list of ForecastResult,
+            One result per series in input order with the route in the route attribute.
+        """
+
+        histories = list(histories)
+        if routes is None:
+            routes = self.policy.route_histories(histories)
+        route = np.asarray(routes['route'])
+        results = [None] * len(histories)
+
+        # Constant and local series are forecast together per method and length, without requests
+        for index in np.flatnonzero(route == 'constant'):
+            results[index] = ForecastResult(index, forecast=np.full(predict_frame, routes['level'].iloc[index]))
+        local = np.flatnonzero(route == 'local')
+        groups = pd.DataFrame({'method': np.asarray(routes['method'])[local],
+                               'length': [len(histories[index]) for index in local]}, index=local)
+        for (method, _), group in groups.groupby(['method', 'length'], sort=False):
+            batch = np.array([np.asarray(histories[index], dtype=float).ravel() for index in group.index])
+            forecast, _ = self._local_model(method).predict(batch, predict_frame)
+            for index, values in zip(group.index, forecast):
+                results[index] = ForecastResult(index, forecast=values)
+
+        llm = np.flatnonzero(route == 'llm')
+        if len(llm):
+            sent = await self.model.apredict_many([histories[index] for index in llm], predict_frame, **kwargs)
+            for index, result in zip(llm, sent):
+                result.index = index
+                results[index] = result
+
+        for name in ROUTES:
+            count = int(np.sum(route == name))
+            if count:
+                metrics.increment('routes_total', count, route=name)
+        for result, name in zip(results, route):
+            result.route = name
+        return results
+
+    def predict_many(self, histories, predict_frame=10, **kwargs):
+        """ Blocking version of apredict_many. """
+
+        return run_blocking(self.apredict_many(histories, predict_frame, **kwargs))
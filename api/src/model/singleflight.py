@@ -0,0 +1,134 @@
+# singleflight.py
+# Description: Collapses concurrent identical calls into a single execution whose outcome all callers share.
+# Author: Joshua Stiller
+# Date: 18.10.26
+
+import asyncio
+import threading
+from concurrent.futures import Future
+
+from src.monitoring import metrics
+
+# The outcome of a call whose caller was cancelled or interrupted, a waiting caller executes it again instead
+_RETRY = object()
+
+
+class FlightStats:
+    """ Counters of a SingleFlight. """
+
+    def __init__(self):
+        self.calls = 0
+        self.executions = 0
+        self.collapsed = 0
+
+    def as_dict(self):
+        return {'calls': self.calls, 'executions': self.executions, 'collapsed': self.collapsed}
+
+    def __repr__(self):
+        return f"FlightStats(calls={self.calls}, executions={self.executions}, collapsed={self.collapsed})"
+
+
+class SingleFlight:
+    """
+    Runs at most one call per key at a time. Callers that arrive while a call with the same key is in flight wait
+    for it and get its result or exception instead of starting their own.
+
+    Threads and coroutines share the same calls, so a coroutine can wait for a call started by a thread and the
+    other way round. Cancellation is never shared: if the executing caller is cancelled, a waiting caller takes
+    over the call.
+    """
+
+    def __init__(self):
+        self.stats = FlightStats()
+        self._lock = threading.Lock()
+        self._flights = {}
+
+    def __len__(self):
+        return len(self._flights)
+
+    def _join(self, key):
+        """ Returns the future of the call in flight and whether the caller has to execute it. """
+
+        with self._lock:
+            self.stats.calls += 1
+            future = self._flights.get(key)
+            if future is not None:
+                self.stats.collapsed += 1
+                metrics.increment('single_flight_total', result='collapsed')
+                return future, False
+            future = Future()
+            self._flights[key] = future
+            self.stats.executions += 1
+            metrics.increment('single_flight_total', result='executed')
+            return future, True
+
+    def _land(self, key, future, result=None, error=None):
+        with self._lock:
+            del self._flights[key]
+        if error is None:
+            future.set_result(result)
+        else:
+            future.set_exception(error)
+
+    def do(self, key, func, *args, **kwargs):
+        """
+        Calls func(*args, **kwargs) unless a call with the same key is in flight, then waits for that one.
+
+        Parameters
+        ----------
+        key: hashable,
+            Identifies calls with the same outcome, e.g. the hash of a request.
+        func: callable,
+            The call.
+
+        Returns
+        -------
+        result: object,
+            The result of the call. Its exception is raised in every waiting caller.
+        """
+
+        while True:
+            future, leader = self._join(key)
+            if leader:
+                break
+            result = future.result()
+            if result is not _RETRY:
+                return result
+
+        try:
+            result = func(*args, **kwargs)
+        except Exception as error:
+            self._land(key, future, error=error)
+            raise
+        except BaseException:
+            self._land(key, future, _RETRY)
+            raise
+        self._land(key, future, result)
+        return result
+
+    async def ado(self, key, func, *args, **kwargs):
+        """
+        Asynchronous version of do for a coroutine function func.
+
+        A waiting caller that is cancelled does not cancel the call it waits for.
+        """
+
+        while True:
+            future, leader = self._join(key)
+            if leader:
+                break
+            result = await asyncio.shield(asyncio.wrap_future(future))
+            if result is not _RETRY:
+                return result
+
+        try:
+            result = await func(*args, **kwargs)
+        except Exception as error:
+            self._land(key, future, error=error)
+            raise
+        except BaseException:
+            # A cancelled leader hands the call to the next waiting caller instead of cancelling it
+            self._land(key, future, _RETRY)
+            raise
+        self._land(key, future, result)
+        return result
@@ -0,0 +1,154 @@
+# statistical_model.py
+# Description: Classic forecasting baselines vectorized over batches of series.
+# Author: Joshua Stiller
+# Date: 18.10.26
+
+import numpy as np
+
+
+class StatisticalModel:
+    """ Local forecasting model with the same predict contract as GPT3Model. """
+
+    methods = ('naive', 'seasonal_naive', 'moving_average', 'ses', 'holt', 'croston', 'sba')
+
+    def __init__(self, method='ses', scaler=None, season_length=52, window=4, alpha=0.3, beta=0.1, phi=1.):
+        """
+        Parameters
+        ----------
+        method: str,
+            One of naive, seasonal_naive, moving_average, ses, holt, croston and sba.
+        scaler: object or None,
+            The scaler applied to the history before forecasting and inverted afterwards.
+        season_length: int,
+            The number of weeks per season of the seasonal naive forecast.
+        window: int,
+            The number of weeks averaged by the moving average.
+        alpha: float,
+            The smoothing factor of the level, and of demand size and interval for Croston.
+        beta: float,
+            The smoothing factor of the trend of Holt's method.
+        phi: float,
+            The damping of the trend of Holt's method. 1 means no damping.
+        """
+
+        if method not in self.methods:
+            raise ValueError(f"Unknown method {method}. Choose one of {', '.join(self.methods)}.")
+
+        self.method = method
+        self.scaler = scaler
+        self.season_length = season_length
+        self.window = window
+        self.alpha = alpha
+        self.beta = beta
+        self.phi = phi
+
+    def predict(self, history, predict_frame=10):
+        """
+        Predicts the sales volumes for the next predict_frame weeks.
+
+        Parameters
+        ----------
+        history: array-like
+            The historic sales volumes, either one series or a 2-D array with one series per row. Croston and SBA
+            need one value per week with zeros for weeks without sales, e.g. rows of SeriesCube, since the demand
+            intervals are counted in values.
+        predict_frame: int
+            The number of weeks to predict.
+
+        Returns
+        -------
+        forecast: np.ndarray,
+            The forecasted sales volumes with the batch shape of the history. NaN for empty histories.
+        completion: None,
+            There is no completion, kept for compatibility with GPT3Model.
+        """
+
+        history = np.asarray(history, dtype=float)
+        single = history.ndim == 1
+        history = np.atleast_2d(history)
+
+        # Like in GPT3Model the scaler sees the series as columns
+        scaler = self.scaler
+        if scaler is not None:
+            history = scaler.fit_transform(history.T).T
+
+        forecast = getattr(self, f'_{self.method}')(history, predict_frame)
+
+        if scaler is not None:
+            forecast = scaler.inverse_transform(forecast.T).T
+
+        return (forecast[0] if single else forecast), None
+
+    def _naive(self, history, predict_frame):
+        if history.shape[1] == 0:
+            return _empty(history, predict_frame)
+        return np.repeat(history[:, -1:], predict_frame, axis=1)
+
+    def _seasonal_naive(self, history, predict_frame):
+        if history.shape[1] < self.season_length:
+            return self._naive(history, predict_frame)
+        season = history[:, -self.season_length:]
+        repeats = -(-predict_frame // self.season_length)
+        return np.tile(season, (1, repeats))[:, :predict_frame]
+
+    def _moving_average(self, history, predict_frame):
+        if history.shape[1] == 0:
+            return _empty(history, predict_frame)
+        level = history[:, -self.window:].mean(axis=1, keepdims=True)
+        return np.repeat(level, predict_frame, axis=1)
+
+    def _ses(self, history, predict_frame):
+        if history.shape[1] == 0:
+            return _empty(history, predict_frame)
+        level = history[:, 0].copy()
+        for t in range(1, history.shape[1]):
+            level += self.alpha * (history[:, t] - level)
+        return np.repeat(level[:, None], predict_frame, axis=1)
+
+    def _holt(self, history, predict_frame):
+        if history.shape[1] == 0:
+            return _empty(history, predict_frame)
+        level = history[:, 0].copy()
+        trend = history[:, 1] - history[:, 0] if history.shape[1] > 1 else np.zeros_like(level)
+        for t in range(1, history.shape[1]):
+            previous = level
+            level = self.alpha * history[:, t] + (1 - self.alpha) * (previous + self.phi * trend)
+            trend = self.beta * (level - previous) + (1 - self.beta) * self.phi * trend
+
+        # Damped trend sums phi + phi^2 + ... + phi^h for horizon h
+        steps = np.cumsum(self.phi ** np.arange(1, predict_frame + 1))
+        return level[:, None] + steps[None, :] * trend[:, None]
+
+    def _croston(self, history, predict_frame, bias_correction=1.):
+        n_series, n_weeks = history.shape
+        if n_weeks == 0:
+            return _empty(history, predict_frame)
+        size = np.zeros(n_series)
+        interval = np.ones(n_series)
+        initialized = np.zeros(n_series, dtype=bool)
+        since_demand = np.ones(n_series)
+
+        # Demand size and interval are only updated in weeks with demand
+        for t in range(n_weeks):
+            demand = history[:, t] > 0
+            first = demand & ~initialized
+            update = demand & initialized
+            size[first] = history[first, t]
+            interval[first] = since_demand[first]
+            size[update] += self.alpha * (history[update, t] - size[update])
+            interval[update] += self.alpha * (since_demand[update] - interval[update])
+            initialized |= demand
+            since_demand = np.where(demand, 1, since_demand + 1)
+
+        rate = bias_correction * size / interval
+        return np.repeat(rate[:, None], predict_frame, axis=1)
+
+    def _sba(self, history, predict_frame):
+        # Syntetos-Boylan approximation removes the upward bias of Croston's method
+        return self._croston(history, predict_frame, bias_correction=1 - self.alpha / 2)
+
+
+def _empty(history, predict_frame):
+    """ Returns the forecast of series without history, which is unknown. """
+
+    return np.full((history.shape[0], predict_frame), np.nan)
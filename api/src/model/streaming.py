@@ -0,0 +1,230 @@
+# streaming.py
+# Description: Incremental parsing of streamed chat completions that stops once the horizon is decoded.
+# Author: Joshua Stiller
+# Date: 18.10.26
+
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+from src.model.codec import decode, resolve_precision
+
+
+def max_tokens_for(history, predict_frame, precision=None, growth=10., slack=8):
+    """
+    Returns a max_tokens limit for a forecast of the serialized history.
+
+    Every character and separator of an encoded value is about one token, so the limit covers predict_frame
+    values that are up to growth times larger than the history, the separator after the last value and some
+    slack for stray text.
+
+    Parameters
+    ----------
+    history: np.ndarray,
+        The serialized, i.e. scaled history.
+    predict_frame: int,
+        The number of values to forecast.
+    precision: int or None,
+        The number of decimals of the encoding. None derives it like serialize_volume.
+    growth: float,
+        The factor by which forecasts may exceed the largest value of the history.
+    slack: int,
+        Additional tokens.
+
+    Returns
+    -------
+    max_tokens: int,
+        The token limit of the completion.
+    """
+
+    history = np.asarray(history, dtype=float)
+    precision = resolve_precision(history, precision)
+    largest = np.abs(history).max() * growth if history.size else growth
+    int_digits = int(np.floor(np.log10(max(largest, 1.)))) + 1
+
+    # Sign, digits, decimal point and the separator between values
+    chars = 1 + int_digits + precision + (precision > 0) + 1
+    return (predict_frame + 1) * chars + slack
+
+
+class StreamDecoder:
+    """ Decodes values from text that arrives in pieces. A value counts once the separator after it arrived. """
+
+    def __init__(self, n, digit_sep=' ', num_sep=','):
+        """
+        Parameters
+        ----------
+        n: int,
+            The number of values after which decoding is done.
+        digit_sep: str,
+            The separator between the characters of a number.
+        num_sep: str,
+            The separator between numbers.
+        """
+
+        self.n = n
+        self.digit_sep = digit_sep
+        self.num_sep = num_sep
+        self.values = []
+        self._buffer = ''
+
+    @property
+    def done(self):
+        return len(self.values) >= self.n
+
+    def feed(self, text):
+        """ Adds the next piece of text and returns whether n values are decoded. """
+
+        self._buffer += text
+        *complete, self._buffer = self._buffer.split(self.num_sep)
+        for part in complete:
+            self._decode(part)
+        return self.done
+
+    def close(self):
+        """ Decodes the value after the last separator at the end of the stream and returns all values. """
+
+        self._decode(self._buffer)
+        self._buffer = ''
+        return np.array(self.values[:self.n], dtype=float)
+
+    def _decode(self, text):
+        remaining = self.n - len(self.values)
+        if remaining > 0 and text:
+            self.values.extend(decode(text, n=remaining, digit_sep=self.digit_sep).tolist())
+
+
+class StreamedCompletion:
+    """ The text of a streamed chat completion with the timing of the stream. """
+
+    def __init__(self, model=None):
+        self.model = model
+        self.content = ''
+        self.finish_reason = None
+        self.chunks = 0
+        self.closed_early = False
+        self.time_to_first_value = None
+        self.duration = None
+
+    @property
+    def choices(self):
+        # The layout of a regular completion, so the text is parsed the same way
+        message = SimpleNamespace(role='assistant', content=self.content)
+        return [SimpleNamespace(index=0, message=message, finish_reason=self.finish_reason)]
+
+    @property
+    def usage(self):
+        # The usage is only sent at the end of a stream, every content chunk is about one token
+        return SimpleNamespace(prompt_tokens=None, completion_tokens=self.chunks, total_tokens=None)
+
+    def __repr__(self):
+        return (f"StreamedCompletion(chunks={self.chunks}, closed_early={self.closed_early}, "
+                f"time_to_first_value={self.time_to_first_value})")
+
+
+class _StreamState:
+    """ Collects the chunks of a stream and decides when to close it. """
+
+    def __init__(self, predict_frame, model, digit_sep, clock):
+        self.decoder = StreamDecoder(predict_frame, digit_sep)
+        self.completion = StreamedCompletion(model)
+        self.clock = clock
+        self.start = clock()
+
+    def add(self, chunk):
+        """ Adds a chunk and returns whether the stream can be closed. """
+
+        if not chunk.choices:
+            return False
+        choice = chunk.choices[0]
+        if choice.finish_reason is not None:
+            self.completion.finish_reason = choice.finish_reason
+
+        text = choice.delta.content or ''
+        if not text:
+            return False
+        self.completion.content += text
+        self.completion.chunks += 1
+        done = self.decoder.feed(text)
+        if self.completion.time_to_first_value is None and self.decoder.values:
+            self.completion.time_to_first_value = self.clock() - self.start
+        return done
+
+    def finish(self, closed_early):
+        self.completion.closed_early = closed_early
+        if closed_early:
+            self.completion.finish_reason = 'horizon'
+        self.decoder.close()
+        if self.completion.time_to_first_value is None and self.decoder.values:
+            self.completion.time_to_first_value = self.clock() - self.start
+        self.completion.duration = self.clock() - self.start
+        return self.completion
+
+
+def stream_completion(client, model, messages, predict_frame, max_tokens=None, digit_sep=' ',
+                      clock=time.perf_counter):
+    """
+    Streams a chat completion and closes the stream once predict_frame values are decoded.
+
+    Parameters
+    ----------
+    client: OpenAI,
+        The blocking client.
+    model: str,
+        The name of the chat model.
+    messages: list of dict,
+        The chat messages.
+    predict_frame: int,
+        The number of values after which the stream is closed.
+    max_tokens: int or None,
+        The token limit of the completion.
+    digit_sep: str,
+        The separator between the characters of a number.
+    clock: callable,
+        Returns the current time in seconds.
+
+    Returns
+    -------
+    completion: StreamedCompletion,
+        The received text, the time to the first decoded value and whether the stream was closed early.
+    """
+
+    state = _StreamState(predict_frame, model, digit_sep, clock)
+    stream = client.chat.completions.create(model=model, messages=messages, stream=True,
+                                            **_limit(max_tokens))
+    closed_early = False
+    try:
+        for chunk in stream:
+            if state.add(chunk):
+                closed_early = True
+                break
+    finally:
+        close = getattr(stream, 'close', None)
+        if close is not None:
+            close()
+    return state.finish(closed_early)
+
+
+async def astream_completion(client, model, messages, predict_frame, max_tokens=None, digit_sep=' ',
+                             clock=time.perf_counter):
+    """ Asynchronous version of stream_completion for an AsyncOpenAI client. """
+
+    state = _StreamState(predict_frame, model, digit_sep, clock)
+    stream = await client.chat.completions.create(model=model, messages=messages, stream=True,
+                                                  **_limit(max_tokens))
+    closed_early = False
+    try:
+        async for chunk in stream:
+            if state.add(chunk):
+                closed_early = True
+                break
+    finally:
+        close = getattr(stream, 'close', None)
+        if close is not None:
+            await close()
+    return state.finish(closed_early)
+
+
+def _limit(max_tokens):
+    return {} if max_tokens is None else {'max_tokens': max_tokens}
@@ -3,62 +3,115 @@
 # Author: Joshua Stiller
 # Date: 26.12.23
 
+import re
 
 import pandas as pd
 import numpy as np
 
+from src.model.codec import encode, decode
+from src.monitoring import metrics
+
 def historic_data_as_text(data, product_ids=None):
-    """ Returns the historic sales information of a model as text prompt. """
+    """
+    Returns the historic sales information of a model as text prompt.
+
+    Parameters
+    ----------
+    data: pd.DataFrame,
+        The sales with a DatetimeIndex of days and one column per product.
+    product_ids: list or None,
+        The columns to include. None includes all columns.
+
+    Returns
+    -------
+    text: str,
+        One line per day, e.g. "day 2023-01-02: Product 3 was sold 5 times. Product 7 was sold 1 times. ".
+    """
 
     if product_ids is None:
         product_ids = data.columns
+    if len(data) == 0:
+        return ''
+
+    # A template of a whole line, so every day is rendered by a single format call
+    pieces = [f"Product {_escape(product_id)} was sold {{}} times. " for product_id in product_ids]
+    line = 'day {}: ' + ''.join(pieces) + '\n'
+    days = pd.Index(data.index).strftime('%Y-%m-%d').tolist()
+
+    # The values share the dtype of all columns like rows of the frame, e.g. integers are "2.0" next to floats
+    values = data.to_numpy()
+    columns = [values[:, data.columns.get_loc(product_id)].tolist() for product_id in product_ids]
+
+    # Joining the lines once keeps the rendering linear in the size of the prompt
+    return ''.join(map(line.format, days, *columns))
+
 
-    str = ''
-    for index, row in data.iterrows():
-        str += f"day {index.strftime('%Y-%m-%d')}: "
-        for product_id in product_ids:
-            str += f"Product {product_id} was sold {row[product_id]} times. "
-        str += '\n'
-    return str
+def _escape(value):
+    return str(value).replace('{', '{{').replace('}', '}}')
 
 
+# A day, a sales statement or a line break, the days of the statements are resolved by their position
+_TOKEN = re.compile(r'day\s+(\d{4}-\d{1,2}-\d{1,2})'
+                    r'|Product\s+([^\s:]+?)\s+was\s+sold\s+(-?\d+(?:\.\d+)?)\s+times?'
+                    r'|(\n)')
+
 
 def get_forecast_from_completion(completion):
-    """ Returns the forecast from a completion. """
+    """
+    Returns the forecast from a completion in the format of historic_data_as_text.
+
+    Parameters
+    ----------
+    completion: Completion,
+        The chat completion.
+
+    Returns
+    -------
+    forecast: pd.DataFrame,
+        The columns day, product_id and sales with one row per product and day. Lines without a valid day and
+        statements that do not match the format are skipped.
+    """
 
     # Get the forecast from the completion
-    forecast = completion.choices[0].message.content
-
-    # Convert the forecast to a dataframe
-    forecast = forecast.split('\n')
-    forecast = [x.split(':') for x in forecast]
-    forecast = pd.DataFrame(forecast, columns=['day', 'sales'])
-    forecast['day'] = forecast['day'].str.replace('day ', '')
-    forecast['sales'] = forecast['sales'].str.replace('Product 0 was sold ', '')
-    forecast['sales'] = forecast['sales'].str.replace(' times.', '')
-    forecast['day'] = pd.to_datetime(forecast['day'])
-    forecast['sales'] = forecast['sales'].astype(int)
+    content = completion.choices[0].message.content or ''
+    tokens = np.array(_TOKEN.findall(content), dtype=object).reshape(-1, 4)
+    day, product_id, sales, newline = tokens.T
+
+    # Every statement belongs to the last day before it, unless a line break comes in between
+    position = np.arange(len(tokens))
+    last = np.maximum.accumulate(np.where((day != '') | (newline != ''), position, -1)) if len(tokens) else position
+    has_day = last >= 0
+    has_day[has_day] = day[last[has_day]] != ''
+    valid = (sales != '') & has_day
+
+    # Dates are parsed once per distinct day, impossible dates like 2023-13-01 drop their statements
+    uniques, codes = np.unique(day[last[valid]], return_inverse=True)
+    days = pd.to_datetime(pd.Series(uniques, dtype=object), format='%Y-%m-%d', errors='coerce').to_numpy()[codes]
+    forecast = pd.DataFrame({'day': days, 'product_id': product_id[valid], 'sales': sales[valid].astype(float)})
+    forecast = forecast[forecast['day'].notna()].reset_index(drop=True)
+
+    # Numeric product ids and integral sales get integer dtypes
+    numeric = pd.to_numeric(forecast['product_id'], errors='coerce')
+    if numeric.notna().all() and np.all(np.mod(numeric, 1) == 0):
+        forecast['product_id'] = numeric.astype(np.int64)
+    if np.all(np.mod(forecast['sales'], 1) == 0):
+        forecast['sales'] = forecast['sales'].astype(np.int64)
 
     return forecast
 
 
-def serialize_volume(volumes, dec_sep=' ', num_sep=','):
+@metrics.timed('serialize')
+def serialize_volume(volumes, dec_sep=' ', num_sep=',', precision=None):
     """ Serializes a volume to a string. """
 
-    # Convert the list of volumes to a string where the volumes are separated by num_sep
-    volumes = str(volumes).replace(' ', num_sep)
-
-    # Separate each digit by dec_sep
-    volumes = dec_sep.join(volumes)
-    return volumes
+    # Each digit is separated by dec_sep, the volumes by num_sep surrounded by dec_sep
+    volumes = np.ravel(np.asarray(volumes, dtype=float))
+    return encode(volumes, precision=precision, digit_sep=dec_sep, num_sep=f'{dec_sep}{num_sep}{dec_sep}')
 
 
-def deserialize_volume(volumes, dec_sep=' ', num_sep=','):
-    """ Deserializes a volume from a string. """
-    # Remove decimal separators and split the string into separate volumes
-    volumes = volumes.replace(dec_sep, '')
-    volumes = volumes.split(num_sep)
+@metrics.timed('deserialize')
+def deserialize_volume(volumes, dec_sep=' ', n=None):
+    """ Deserializes a volume from a string. Any text between the numbers separates them, e.g. the num_sep of
+    serialize_volume. """
 
-    # Convert the volumes to floats
-    volumes = [float(''.join(volume.split(dec_sep))) for volume in volumes]
-    return np.array(volumes)
\ No newline at end of file
+    return decode(volumes, n=n, digit_sep=dec_sep)
\ No newline at end of file
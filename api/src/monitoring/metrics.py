@@ -0,0 +1,279 @@
+# metrics.py
+# Description: Latency, token and error instrumentation of the forecasting pipeline with a pluggable sink.
+# Author: Joshua Stiller
+# Date: 18.10.26
+
+import functools
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Upper bounds in seconds of the latency histograms, from index lookups to API round trips
+BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1., 2.5, 5., 10., 30.)
+
+# The sink that receives all measurements. None disables the instrumentation.
+_sink = None
+
+# The HELP text of the metrics of the pipeline by name without namespace
+DESCRIPTIONS = {
+    'cache_total': 'Lookups of the completion and embedding cache by result.',
+    'db_connections_total': 'Database connections opened by the pool.',
+    'db_rows_total': 'Sales rows read from the database.',
+    'errors_total': 'Errors raised in a stage by error type.',
+    'fallbacks_total': 'Forecasts of the fallback model after the API failed.',
+    'job_series_total': 'Series forecast by the batch job by status.',
+    'packed_requests_total': 'Chat requests with several packed series.',
+    'packed_requeued_total': 'Series of packed requests that were requested again on their own.',
+    'routes_total': 'Series forecast per route.',
+    'single_flight_total': 'Requests that were sent or shared an identical request in flight.',
+    'stage_seconds': 'Duration of a stage in seconds.',
+    'streams_closed_early_total': 'Streamed completions closed once the forecast was decoded.',
+    'time_to_first_value_seconds': 'Time from sending a streamed request to its first forecast value in seconds.',
+    'tokens_total': 'Prompt and completion tokens by model.',
+}
+
+
+class Histogram:
+    """ Counts of observations per bucket together with their sum. """
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Registry:
+    """ Sink that aggregates measurements in memory and renders them in the Prometheus text format. """
+
+    def __init__(self, namespace='forecast', buckets=BUCKETS):
+        """
+        Parameters
+        ----------
+        namespace: str,
+            The prefix of all metric names.
+        buckets: tuple of float,
+            The upper bounds of the histogram buckets.
+        """
+
+        self.namespace = namespace
+        self.buckets = buckets
+        self.counters = {}
+        self.histograms = {}
+        self._lock = threading.Lock()
+
+    def increment(self, name, value, labels):
+        key = (name, _key(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, labels):
+        key = (name, _key(labels))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(self.buckets)
+            histogram.observe(value)
+
+    def clear(self):
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    def snapshot(self):
+        """ Returns the counters and the count and sum of every histogram by name and labels. """
+
+        with self._lock:
+            counters = {_series(name, labels): value for (name, labels), value in self.counters.items()}
+            histograms = {_series(name, labels): {'count': h.count, 'sum': h.sum}
+                          for (name, labels), h in self.histograms.items()}
+        return {'counters': counters, 'histograms': histograms}
+
+    def render(self):
+        """ Returns all metrics in the Prometheus text exposition format, see DESCRIPTIONS for their HELP. """
+
+        lines = []
+        with self._lock:
+            for name in sorted({name for name, _ in self.counters}):
+                metric = f'{self.namespace}_{name}'
+                lines.append(_help(metric, name))
+                lines.append(f'# TYPE {metric} counter')
+                for (other, labels), value in sorted(self.counters.items()):
+                    if other == name:
+                        lines.append(f'{metric}{_labels(labels)} {_number(value)}')
+
+            for name in sorted({name for name, _ in self.histograms}):
+                metric = f'{self.namespace}_{name}'
+                lines.append(_help(metric, name))
+                lines.append(f'# TYPE {metric} histogram')
+                for (other, labels), histogram in sorted(self.histograms.items(), key=lambda item: item[0]):
+                    if other != name:
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets + (float('inf'),), histogram.counts):
+                        cumulative += count
+                        lines.append(f'{metric}_bucket{_labels(labels + (("le", _number(bound)),))} {cumulative}')
+                    lines.append(f'{metric}_sum{_labels(labels)} {_number(histogram.sum)}')
+                    lines.append(f'{metric}_count{_labels(labels)} {histogram.count}')
+
+        return '\n'.join(lines) + '\n'
+
+
+def enable(sink=None):
+    """
+    Starts sending measurements to a sink.
+
+    Parameters
+    ----------
+    sink: object or None,
+        Any object with increment(name, value, labels) and observe(name, value, labels), e.g. to forward to
+        StatsD. A new Registry is used if not given.
+
+    Returns
+    -------
+    sink: object,
+        The active sink.
+    """
+
+    global _sink
+    _sink = sink if sink is not None else Registry()
+    return _sink
+
+
+def disable():
+    """ Stops the instrumentation. The hooks then return right away. """
+
+    global _sink
+    _sink = None
+
+
+def get_sink():
+    return _sink
+
+
+def increment(name, value=1, **labels):
+    """ Adds a value to a counter, e.g. increment('cache_total', result='hit'). """
+
+    if _sink is not None:
+        _sink.increment(name, value, labels)
+
+
+def observe(name, value, **labels):
+    """ Adds an observation to a histogram. """
+
+    if _sink is not None:
+        _sink.observe(name, value, labels)
+
+
+@contextmanager
+def _timer(sink, stage, labels):
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException as error:
+        sink.increment('errors_total', 1, {'stage': stage, 'error': type(error).__name__, **labels})
+        raise
+    finally:
+        sink.observe('stage_seconds', time.perf_counter() - start, {'stage': stage, **labels})
+
+
+class _NoTimer:
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NO_TIMER = _NoTimer()
+
+
+def timer(stage, **labels):
+    """
+    Returns a context manager that records the duration of a stage and counts the errors raised in it.
+
+    Parameters
+    ----------
+    stage: str,
+        The name of the stage, e.g. 'openai'.
+    labels: str,
+        Additional labels such as the model.
+    """
+
+    sink = _sink
+    if sink is None:
+        return _NO_TIMER
+    return _timer(sink, stage, labels)
+
+
+def timed(stage):
+    """ Decorator that records every call of a function as stage. """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            sink = _sink
+            if sink is None:
+                return func(*args, **kwargs)
+
+            # Inlined instead of using timer, since the decorated functions are on hot paths
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            except BaseException as error:
+                sink.increment('errors_total', 1, {'stage': stage, 'error': type(error).__name__})
+                raise
+            finally:
+                sink.observe('stage_seconds', time.perf_counter() - start, {'stage': stage})
+
+        return wrapper
+
+    return decorator
+
+
+def count_tokens(model, usage):
+    """ Adds the token usage of a completion or embedding to the counters of the model. """
+
+    if _sink is None or usage is None:
+        return
+    for kind in ('prompt', 'completion'):
+        tokens = getattr(usage, f'{kind}_tokens', None)
+        if tokens:
+            _sink.increment('tokens_total', tokens, {'model': model, 'type': kind})
+
+
+def _key(labels):
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    escaped = [(key, value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+               for key, value in labels]
+    return '{' + ','.join(f'{key}="{value}"' for key, value in escaped) + '}'
+
+
+def _series(name, labels):
+    return name + _labels(labels)
+
+
+def _help(metric, name):
+    text = DESCRIPTIONS.get(name, name.replace('_', ' ').capitalize() + '.')
+    return f'# HELP {metric} ' + text.replace('\\', '\\\\').replace('\n', '\\n')
+
+
+def _number(value):
+    if not isinstance(value, float):
+        return str(value)
+    if value != value:
+        return 'NaN'
+    if value in (float('inf'), float('-inf')):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(value)
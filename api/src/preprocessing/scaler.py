@@ -9,12 +9,73 @@ import numpy as np
 
 class QuantileScaler:
 
-    def __init__(self, upper_quant = 0.95):
+    def __init__(self, upper_quant = 0.95, axis=None, min_scale=0.1):
+        """
+        Parameters
+        ----------
+        upper_quant: float,
+            The quantile the data is divided by.
+        axis: int or None,
+            The axis over which the quantile is computed. None uses one quantile for all data, 1 one quantile per
+            row of a (series, weeks) array and 0 one quantile per column of a (weeks, series) array.
+        min_scale: float,
+            The lower bound of the quantile, so series without sales are not divided by zero.
+        """
+
         self.upper_quant = upper_quant
+        self.axis = axis
+        self.min_scale = min_scale
         self.upper_quantile = None
+        self._estimator = None
+
+    def get_params(self):
+        return {'upper_quant': self.upper_quant, 'axis': self.axis, 'min_scale': self.min_scale}
 
     def fit(self, data):
-        self.upper_quantile = np.maximum(np.quantile(data, self.upper_quant), 0.1)
+        """
+        Fits the quantile to the data. Only the markers of the streaming estimate are kept, so a later partial_fit
+        continues from the quantiles of the data instead of only seeing the new observations.
+
+        Parameters
+        ----------
+        data: array-like,
+            The observations in the layout given by axis. NaN values are skipped.
+        """
+
+        self._estimator = P2Quantile.from_sample(self.upper_quant, self._rows(data))
+        self._update_quantile()
+
+    def partial_fit(self, data):
+        """
+        Updates the quantile with new observations without keeping the history, using the P² algorithm.
+
+        Parameters
+        ----------
+        data: array-like,
+            The new observations in the layout given by axis, e.g. the new weeks of every series as (series, weeks)
+            array for axis 1. NaN values are skipped.
+        """
+
+        data = self._rows(data)
+        if self._estimator is None:
+            self._estimator = P2Quantile(self.upper_quant, data.shape[0])
+        self._estimator.update(data)
+        self._update_quantile()
+
+    def _update_quantile(self):
+        quantile = np.maximum(self._estimator.estimate(), self.min_scale)
+        if self.axis is None:
+            self.upper_quantile = quantile[0]
+        else:
+            self.upper_quantile = np.expand_dims(quantile, self.axis)
+
+    def _rows(self, data):
+        """ Returns the data as (series, observations) array. """
+
+        data = np.asarray(data, dtype=float)
+        if self.axis is None:
+            return data.reshape(1, -1)
+        return data.T if self.axis == 0 else data
 
     def transform(self, data):
         return data / self.upper_quantile
@@ -24,4 +85,193 @@ class QuantileScaler:
 
     def fit_transform(self, data):
         self.fit(data)
-        return self.transform(data)
\ No newline at end of file
+        return self.transform(data)
+
+    def to_dict(self):
+        """ Returns the parameters and the fitted state as JSON serializable dictionary. """
+
+        state = {'params': self.get_params(), 'upper_quantile': None, 'estimator': None}
+        if self.upper_quantile is not None:
+            state['upper_quantile'] = np.asarray(self.upper_quantile).tolist()
+        if self._estimator is not None:
+            state['estimator'] = self._estimator.to_dict()
+        return state
+
+    @classmethod
+    def from_dict(cls, state):
+        """ Restores a scaler from the dictionary returned by to_dict. """
+
+        scaler = cls(**state['params'])
+        if state['upper_quantile'] is not None:
+            upper_quantile = np.asarray(state['upper_quantile'], dtype=float)
+            scaler.upper_quantile = upper_quantile if upper_quantile.ndim else float(upper_quantile)
+        if state['estimator'] is not None:
+            scaler._estimator = P2Quantile.from_dict(state['estimator'])
+        return scaler
+
+
+class P2Quantile:
+    """ Streaming estimate of a quantile of many series at once with the P² algorithm of Jain and Chlamtac. """
+
+    def __init__(self, quantile, n_series):
+        """
+        Parameters
+        ----------
+        quantile: float,
+            The quantile to estimate.
+        n_series: int,
+            The number of series updated together.
+        """
+
+        self.quantile = quantile
+        self.count = np.zeros(n_series, dtype=np.int64)
+
+        # Heights and positions of the five markers of every series, the first observations are buffered in heights
+        self.heights = np.full((n_series, 5), np.nan)
+        self.positions = np.tile(np.arange(1., 6.), (n_series, 1))
+        p = quantile
+        self.desired = np.tile([1., 1 + 2 * p, 1 + 4 * p, 3 + 2 * p, 5.], (n_series, 1))
+        self.increments = np.array([0., p / 2, p, (1 + p) / 2, 1.])
+
+    @classmethod
+    def from_sample(cls, quantile, data):
+        """
+        Returns an estimator in the state it would ideally reach after the observations of a sample.
+
+        The markers are the exact quantiles of every series at the desired marker positions, so the estimate is
+        the exact quantile of the sample and further updates continue from it.
+
+        Parameters
+        ----------
+        quantile: float,
+            The quantile to estimate.
+        data: np.ndarray,
+            The observations as (series, steps) array. NaN values are skipped.
+        """
+
+        estimator = cls(quantile, data.shape[0])
+        levels = estimator.increments
+
+        # Row sums are a cheap test for NaN values, which need the slower nan-aware quantiles
+        if not np.isnan(data.sum(axis=1)).any():
+            estimator.count = np.full(data.shape[0], data.shape[1], dtype=np.int64)
+            if data.shape[1] >= 5:
+                # Sorting is faster than np.quantile even for one level, and gives all markers at once
+                estimator.heights = _sorted_quantiles(np.sort(data, axis=1), levels)
+        else:
+            estimator.count = (~np.isnan(data)).sum(axis=1)
+            full = estimator.count >= 5
+            if full.any():
+                estimator.heights[full] = np.nanquantile(data[full], levels, axis=1).T
+
+        # Series with fewer than five observations keep them in the buffer of the first markers
+        few = estimator.count < 5
+        if few.any():
+            buffered = np.sort(data[few], axis=1)[:, :5]
+            estimator.heights[few, :buffered.shape[1]] = buffered
+
+        positions = 1 + (estimator.count[~few, None] - 1) * levels
+        estimator.positions[~few] = positions
+        estimator.desired[~few] = positions
+        return estimator
+
+    def update(self, data):
+        """ Adds observations given as (series, steps) array, one step at a time for all series. """
+
+        for x in np.asarray(data, dtype=float).T:
+            self._update(x)
+
+    def _update(self, x):
+        observed = ~np.isnan(x)
+
+        # Buffer the first five observations of a series, then sort them into the initial markers
+        filling = observed & (self.count < 5)
+        if filling.any():
+            rows = np.flatnonzero(filling)
+            self.heights[rows, self.count[rows]] = x[rows]
+            self.count[rows] += 1
+            full = rows[self.count[rows] == 5]
+            self.heights[full] = np.sort(self.heights[full], axis=1)
+
+        active = observed & ~filling & (self.count >= 5)
+        if not active.any():
+            return
+        self.count[active] += 1
+        rows = np.flatnonzero(active)
+        q, n, desired, x = self.heights[rows], self.positions[rows], self.desired[rows], x[rows]
+
+        # Extend the outer markers and find the cell of the observation
+        q[:, 0] = np.minimum(q[:, 0], x)
+        q[:, 4] = np.maximum(q[:, 4], x)
+        cell = np.clip((q[:, 1:4] <= x[:, None]).sum(axis=1), 0, 3)
+        n += np.arange(5)[None, :] > cell[:, None]
+        desired += self.increments
+
+        # Move the three middle markers towards their desired positions
+        for i in (1, 2, 3):
+            d = desired[:, i] - n[:, i]
+            move = ((d >= 1) & (n[:, i + 1] - n[:, i] > 1)) | ((d <= -1) & (n[:, i - 1] - n[:, i] < -1))
+            if not move.any():
+                continue
+            d = np.sign(d) * move
+            parabolic = q[:, i] + d / (n[:, i + 1] - n[:, i - 1]) * (
+                (n[:, i] - n[:, i - 1] + d) * (q[:, i + 1] - q[:, i]) / (n[:, i + 1] - n[:, i])
+                + (n[:, i + 1] - n[:, i] - d) * (q[:, i] - q[:, i - 1]) / (n[:, i] - n[:, i - 1]))
+            neighbour = np.where(d > 0, i + 1, i - 1)
+            q_neighbour = np.take_along_axis(q, neighbour[:, None], axis=1)[:, 0]
+            n_neighbour = np.take_along_axis(n, neighbour[:, None], axis=1)[:, 0]
+            with np.errstate(invalid='ignore', divide='ignore'):
+                linear = q[:, i] + d * (q_neighbour - q[:, i]) / (n_neighbour - n[:, i])
+            inside = (q[:, i - 1] < parabolic) & (parabolic < q[:, i + 1])
+            q[:, i] = np.where(move, np.where(inside, parabolic, linear), q[:, i])
+            n[:, i] += d
+
+        self.heights[rows], self.positions[rows], self.desired[rows] = q, n, desired
+
+    def estimate(self):
+        """ Returns the current quantile estimate of every series. Series with fewer than five observations use
+        the exact quantile of what they have seen. """
+
+        estimate = self.heights[:, 2].copy()
+        few = self.count < 5
+        if few.any():
+            with np.errstate(all='ignore'):
+                seen = self.heights[few]
+                estimate[few] = np.nan_to_num(_nanquantile(seen, self.quantile))
+        return estimate
+
+    def to_dict(self):
+        return {'quantile': self.quantile, 'count': self.count.tolist(), 'heights': self.heights.tolist(),
+                'positions': self.positions.tolist(), 'desired': self.desired.tolist()}
+
+    @classmethod
+    def from_dict(cls, state):
+        estimator = cls(state['quantile'], len(state['count']))
+        estimator.count = np.asarray(state['count'], dtype=np.int64)
+        estimator.heights = np.asarray(state['heights'], dtype=float)
+        estimator.positions = np.asarray(state['positions'], dtype=float)
+        estimator.desired = np.asarray(state['desired'], dtype=float)
+        return estimator
+
+
+def _nanquantile(data, quantile):
+    """ Row wise quantile that returns NaN for rows without observations instead of warning. """
+
+    result = np.full(data.shape[0], np.nan)
+    seen = ~np.isnan(data).all(axis=1)
+    if seen.any():
+        result[seen] = np.nanquantile(data[seen], quantile, axis=1)
+    return result
+
+
+def _sorted_quantiles(ordered, levels):
+    """ Returns the quantiles of sorted rows with the linear interpolation of np.quantile. """
+
+    position = levels * (ordered.shape[1] - 1)
+    lower = np.floor(position).astype(np.intp)
+    upper = np.minimum(lower + 1, ordered.shape[1] - 1)
+    fraction = position - lower
+    below, above = ordered[:, lower], ordered[:, upper]
+    difference = above - below
+    # Interpolating from the nearer neighbour like np.quantile gives the same rounding
+    return np.where(fraction < 0.5, below + difference * fraction, above - difference * (1 - fraction))
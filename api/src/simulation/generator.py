@@ -0,0 +1,171 @@
+# generator.py
+# Description: Seeded generator of large synthetic demand datasets, streamed in chunks.
+# Author: Joshua Stiller
+# Date: 18.10.26
+
+import numpy as np
+import pandas as pd
+
+
+class DemandGenerator:
+    """ Generates weekly sales of product and customer combinations with trend, seasonality, promotions and
+    intermittent demand. """
+
+    def __init__(self, num_products=100, num_customers=100, num_weeks=156, seed=0, start='2020-01-06',
+                 intermittent_share=0.4, promo_rate=0.03, promo_uplift=1.5, season_length=52):
+        """
+        Parameters
+        ----------
+        num_products: int,
+            The number of products.
+        num_customers: int,
+            The number of customers. Every product is sold to every customer.
+        num_weeks: int,
+            The number of weeks per series.
+        seed: int,
+            The seed. The same seed and chunk size give the same data.
+        start: str,
+            The first week.
+        intermittent_share: float,
+            The share of series with sporadic demand.
+        promo_rate: float,
+            The probability of a promotion in a week.
+        promo_uplift: float,
+            The mean relative uplift of the demand during a promotion.
+        season_length: int,
+            The number of weeks of a seasonal cycle.
+        """
+
+        self.num_products = num_products
+        self.num_customers = num_customers
+        self.num_weeks = num_weeks
+        self.seed = seed
+        self.weeks = pd.date_range(start, periods=num_weeks, freq='W-MON')
+        self.intermittent_share = intermittent_share
+        self.promo_rate = promo_rate
+        self.promo_uplift = promo_uplift
+        self.season_length = season_length
+
+    @property
+    def num_series(self):
+        return self.num_products * self.num_customers
+
+    def _simulate(self, rng, n):
+        """ Simulates n series as array of shape (n, num_weeks). """
+
+        t = np.arange(self.num_weeks)
+
+        # Level, relative trend per year and yearly seasonality per series
+        level = rng.lognormal(mean=2., sigma=1., size=(n, 1))
+        trend = rng.normal(0., 0.2, size=(n, 1)) * t / self.season_length
+        amplitude = rng.uniform(0., 0.6, size=(n, 1))
+        phase = rng.uniform(0., 2 * np.pi, size=(n, 1))
+        season = amplitude * np.sin(2 * np.pi * t / self.season_length + phase)
+        rate = level * np.maximum(1 + trend + season, 0.05)
+
+        # Promotions multiply the demand for single weeks
+        promo = rng.random((n, self.num_weeks)) < self.promo_rate
+        rate = np.where(promo, rate * (1 + rng.exponential(self.promo_uplift - 1, size=(n, 1))), rate)
+
+        # Intermittent series only have demand in some weeks, but larger orders when they do
+        intermittent = rng.random((n, 1)) < self.intermittent_share
+        probability = np.where(intermittent, rng.beta(1.5, 6., size=(n, 1)), 1.)
+        rate = np.where(intermittent, rate / np.maximum(probability, 0.05) ** 0.5, rate)
+        occurs = rng.random((n, self.num_weeks)) < probability
+
+        return np.where(occurs, rng.poisson(rate), 0).astype(np.int32)
+
+    def blocks(self, chunk_series=10_000):
+        """
+        Generates the sales in blocks of series.
+
+        Parameters
+        ----------
+        chunk_series: int,
+            The number of series per block.
+
+        Yields
+        ------
+        series: np.ndarray,
+            The numbers of the series of the block. Series i belongs to product i // num_customers and customer
+            i % num_customers.
+        values: np.ndarray,
+            The sales with shape (len(series), num_weeks).
+        """
+
+        seeds = np.random.SeedSequence(self.seed).spawn(-(-self.num_series // chunk_series))
+        for number, seed in enumerate(seeds):
+            start = number * chunk_series
+            series = np.arange(start, min(start + chunk_series, self.num_series))
+            yield series, self._simulate(np.random.default_rng(seed), len(series))
+
+    def frames(self, chunk_series=10_000, drop_zeros=False):
+        """
+        Generates the sales as long frames in the column schema of BaseData.
+
+        Parameters
+        ----------
+        chunk_series: int,
+            The number of series per frame.
+        drop_zeros: bool,
+            Whether to leave out weeks without sales, as in a sales table.
+
+        Yields
+        ------
+        data: pd.DataFrame,
+            The columns product_id, product, customer_id, customer, week and units_sold.
+        """
+
+        for series, values in self.blocks(chunk_series):
+            product_ids = np.repeat(series // self.num_customers, self.num_weeks)
+            customer_ids = np.repeat(series % self.num_customers, self.num_weeks)
+            data = pd.DataFrame({
+                'product_id': product_ids.astype(np.int32),
+                'product': _names('Product', product_ids),
+                'customer_id': customer_ids.astype(np.int32),
+                'customer': _names('Customer', customer_ids),
+                'week': np.tile(self.weeks.values, len(series)),
+                'units_sold': values.ravel(),
+            })
+            if drop_zeros:
+                data = data[data['units_sold'] > 0].reset_index(drop=True)
+            yield data
+
+    def to_parquet(self, path, chunk_series=10_000, drop_zeros=False, column_mapper=None):
+        """
+        Writes the sales to a Parquet file with one row group per chunk.
+
+        Parameters
+        ----------
+        path: str,
+            The location of the file.
+        chunk_series: int,
+            The number of series per row group.
+        drop_zeros: bool,
+            Whether to leave out weeks without sales.
+        column_mapper: dict or None,
+            Maps source to BaseData column names as passed to UserData. If given, the file uses the source
+            names, e.g. teil_id instead of product_id.
+        """
+
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        renames = {target: source for source, target in (column_mapper or {}).items()}
+        writer = None
+        try:
+            for data in self.frames(chunk_series, drop_zeros):
+                table = pa.Table.from_pandas(data.rename(columns=renames), preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(path, table.schema)
+                writer.write_table(table.cast(writer.schema))
+        finally:
+            if writer is not None:
+                writer.close()
+
+
+def _names(prefix, ids):
+    """ Returns the names of the ids as categorical with only the ids of the chunk as categories. """
+
+    uniques, codes = np.unique(ids, return_inverse=True)
+    return pd.Categorical.from_codes(codes, np.char.add(f'{prefix} ', uniques.astype(str)))
@@ -4,7 +4,6 @@
 # Date: 26.12.23
 
 
-import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 
@@ -75,7 +74,9 @@ class SimulatedData:
     def plot_products(self, product_id=0, forecast=None):
         """ Plots the sales of a product. """
 
-        melted_data = sim.data.reset_index().melt(id_vars='date', value_name='sales')
+        import matplotlib.pyplot as plt
+
+        melted_data = self.data.reset_index().melt(id_vars='date', value_name='sales')
         data = melted_data[melted_data['product_id'] == product_id][:40]
         plt.plot(data['date'], data['sales'])
         if forecast is not None:
@@ -83,5 +84,7 @@ class SimulatedData:
         plt.show()
 
 
-sim = SimulatedData(num_products=2, num_days=100)
-sim.plot_products()
+if __name__ == '__main__':
+    sim = SimulatedData(num_products=2, num_days=100)
+    sim.plot_products()
+
@@ -0,0 +1,29 @@
+# conftest.py
+# Description: Makes the api package importable in tests and provides the fake OpenAI clients as fixtures.
+# Author: Joshua Stiller
+# Date: 18.10.26
+
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from tests.fake_openai import FailingAsyncOpenAI, FakeAsyncOpenAI, FakeOpenAI  # noqa: E402
+
+
+@pytest.fixture
+def fake_client():
+    return FakeOpenAI()
+
+
+@pytest.fixture
+def fake_async_client():
+    return FakeAsyncOpenAI()
+
+
+@pytest.fixture
+def failing_async_client():
+    return FailingAsyncOpenAI()
@@ -0,0 +1,151 @@
+# fake_openai.py
+# Description: Offline stand-ins for the parts of the OpenAI client used by GPT3Model, shared by tests and benchmarks.
+# Author: Joshua Stiller
+# Date: 18.10.26
+
+import asyncio
+import re
+import time
+from types import SimpleNamespace
+
+
+class FakeOpenAI:
+    """ Answers chat completions with a fixed continuation and embeddings with a vector whose first value is the
+    length of the input and all others are constant. Every two characters of the continuation count as one token
+    and are one chunk of a stream. Packed prompts with labelled series get one labelled line per series. """
+
+    def __init__(self, content='1 2 , 1 3 , 1 4 , 1 5 , 1 6 , 1 7 , 1 8 , 1 9 , 2 0 , 2 1', dimensions=1536,
+                 latency=0.):
+        """
+        Parameters
+        ----------
+        content: str,
+            The message content of every completion.
+        dimensions: int,
+            The length of the embeddings.
+        latency: float,
+            The seconds every request takes.
+        """
+
+        self.content = content
+        self.dimensions = dimensions
+        self.latency = latency
+        self.calls = 0
+        self.streamed_chunks = 0
+        self.embedded = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._complete))
+        self.embeddings = SimpleNamespace(create=self._embed)
+
+    def _tokens(self, max_tokens=None):
+        tokens = [self.content[i:i + 2] for i in range(0, len(self.content), 2)]
+        return tokens if max_tokens is None else tokens[:max_tokens]
+
+    def _completion(self, messages, n=1, max_tokens=None):
+        prompt_tokens = sum(len(message['content']) for message in messages) // 2
+        labels = re.findall(r'^(S\d+): ', messages[-1]['content'], re.MULTILINE)
+        if labels:
+            content = '\n'.join(f'{label}: {self.content}' for label in labels)
+            tokens = [content[i:i + 2] for i in range(0, len(content), 2)]
+            full = len(tokens)
+            tokens = tokens if max_tokens is None else tokens[:max_tokens]
+        else:
+            tokens = self._tokens(max_tokens)
+            full = len(self._tokens())
+        finish_reason = 'length' if len(tokens) < full else 'stop'
+        choices = [SimpleNamespace(index=i, message=SimpleNamespace(role='assistant', content=''.join(tokens)),
+                                   finish_reason=finish_reason) for i in range(n)]
+        usage = SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=len(tokens),
+                                total_tokens=prompt_tokens + len(tokens))
+        return SimpleNamespace(choices=choices, usage=usage, model='fake')
+
+    def _chunks(self, max_tokens=None):
+        tokens = self._tokens(max_tokens)
+        for i, token in enumerate(tokens):
+            self.streamed_chunks += 1
+            finish_reason = None if i < len(tokens) - 1 else 'stop'
+            delta = SimpleNamespace(role='assistant', content=token)
+            yield SimpleNamespace(choices=[SimpleNamespace(index=0, delta=delta, finish_reason=finish_reason)])
+
+    def _complete(self, model, messages, n=1, stream=False, max_tokens=None, **kwargs):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if stream:
+            return _Stream(self._chunks(max_tokens))
+        return self._completion(messages, n, max_tokens)
+
+    def _embedding(self, input, model):
+        self.embedded.append(list(input))
+        data = [SimpleNamespace(index=i, embedding=[float(len(text))] + [0.01] * (self.dimensions - 1))
+                for i, text in enumerate(input)]
+        return SimpleNamespace(data=data, model=model)
+
+    def _embed(self, input, model, **kwargs):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return self._embedding(input, model)
+
+
+class FakeAsyncOpenAI(FakeOpenAI):
+    """ Asynchronous version of FakeOpenAI. """
+
+    async def _complete(self, model, messages, n=1, stream=False, max_tokens=None, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        if stream:
+            return _AsyncStream(self._chunks(max_tokens))
+        return self._completion(messages, n, max_tokens)
+
+    async def _embed(self, input, model, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        return self._embedding(input, model)
+
+
+class FailingAsyncOpenAI(FakeAsyncOpenAI):
+    """ Fails every chat completion like an unreachable API. """
+
+    async def _complete(self, model, messages, **kwargs):
+        import httpx
+        import openai
+
+        self.calls += 1
+        raise openai.APIConnectionError(request=httpx.Request('POST', 'https://api.openai.com/v1/chat/completions'))
+
+
+class _Stream:
+    """ Iterator over the chunks of a streamed completion that can be closed early. """
+
+    def __init__(self, chunks):
+        self._chunks = chunks
+        self.closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.closed:
+            raise StopIteration
+        return next(self._chunks)
+
+    def close(self):
+        self.closed = True
+        self._chunks.close()
+
+
+class _AsyncStream(_Stream):
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.closed:
+            raise StopAsyncIteration
+        try:
+            return next(self._chunks)
+        except StopIteration:
+            raise StopAsyncIteration
+
+    async def close(self):
+        super().close()
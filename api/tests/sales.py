@@ -0,0 +1,37 @@
+# sales.py
+# Description: Small synthetic sales frames for the tests.
+# Author: Joshua Stiller
+# Date: 18.10.26
+
+import numpy as np
+import pandas as pd
+
+from src.simulation.generator import DemandGenerator
+
+
+def sales_frame(rows, weeks=100, seed=0, **kwargs):
+    """
+    Returns a synthetic long sales frame with about the given number of rows.
+
+    Parameters
+    ----------
+    rows: int,
+        The number of rows, which sets the number of series together with weeks.
+    weeks: int,
+        The number of weeks per series.
+    seed: int,
+        The seed of the generator.
+    kwargs: dict,
+        Passed to DemandGenerator, e.g. intermittent_share.
+
+    Returns
+    -------
+    frame: pd.DataFrame,
+        The sales with the columns of BaseData.
+    """
+
+    n_series = max(rows // weeks, 1)
+    customers = int(np.ceil(np.sqrt(n_series)))
+    products = -(-n_series // customers)
+    generator = DemandGenerator(products, customers, min(weeks, rows), seed=seed, **kwargs)
+    return pd.concat(generator.frames(chunk_series=100_000), ignore_index=True).iloc[:rows]
@@ -0,0 +1,110 @@
+# test_api.py
+# Description: Tests of the API routes with FastAPI's TestClient, the fake OpenAI clients and small sales data.
+# Author: Joshua Stiller
+# Date: 18.10.26
+
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import index
+from src.data.base_data import BaseData
+from src.model.gpt3_model import GPT3Model
+from src.model.statistical_model import StatisticalModel
+from src.monitoring import metrics
+from tests.fake_openai import FailingAsyncOpenAI, FakeAsyncOpenAI, FakeOpenAI
+from tests.sales import sales_frame
+
+
+@pytest.fixture
+def data():
+    return BaseData(sales_frame(2000, weeks=40))
+
+
+@pytest.fixture
+def client(data):
+    index.app.dependency_overrides[index.get_data] = lambda: data
+    yield TestClient(index.app)
+    index.app.dependency_overrides.clear()
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    monkeypatch.setattr(index, 'registry', metrics.enable())
+    yield index.registry
+    metrics.disable()
+
+
+def _use_model(model):
+    index.app.dependency_overrides[index.get_model] = lambda: model
+
+
+def _lines(response):
+    return [json.loads(line) for line in response.text.splitlines() if line]
+
+
+def test_forecast_streams_one_line_per_series(client, data):
+    _use_model(GPT3Model(client=FakeOpenAI(), async_client=FakeAsyncOpenAI()))
+    keys = [[int(p), int(c)] for p, c in data.series_index.keys[:3]]
+
+    response = client.post('/api/forecast', json={'keys': keys, 'horizon': 4})
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('application/x-ndjson')
+
+    lines = _lines(response)
+    assert sorted([line['product_id'], line['customer_id']] for line in lines) == sorted(keys)
+    assert all(len(line['forecast']) == 4 and 'error' not in line for line in lines)
+
+
+def test_forecast_reports_unknown_series_in_its_line(client, data):
+    _use_model(GPT3Model(client=FakeOpenAI(), async_client=FakeAsyncOpenAI()))
+
+    lines = _lines(client.post('/api/forecast', json={'keys': [[999999, 999999]]}))
+    assert lines == [{'product_id': 999999, 'customer_id': 999999, 'error': 'Unknown series.'}]
+
+
+def test_forecast_falls_back_when_the_api_fails(client, data, registry):
+    async_client = FailingAsyncOpenAI()
+    _use_model(GPT3Model(client=FakeOpenAI(), async_client=async_client, fallback=StatisticalModel()))
+    keys = [[int(p), int(c)] for p, c in data.series_index.keys[:2]]
+
+    lines = _lines(client.post('/api/forecast', json={'keys': keys, 'horizon': 3}))
+    assert async_client.calls == 2
+    assert all(len(line['forecast']) == 3 and 'error' not in line for line in lines)
+
+    response = client.get('/metrics')
+    assert response.headers['content-type'].startswith('text/plain; version=0.0.4')
+    assert 'forecast_fallbacks_total{model="gpt-3.5-turbo"} 2' in response.text.splitlines()
+
+
+def test_metrics_are_disabled_by_default(client):
+    assert index.registry is None and metrics.get_sink() is None
+    assert client.get('/metrics').status_code == 404
+
+
+def test_forecast_without_fallback_reports_the_error(client, data):
+    _use_model(GPT3Model(client=FakeOpenAI(), async_client=FailingAsyncOpenAI()))
+    product_id, customer_id = data.series_index.keys[0]
+
+    lines = _lines(client.post('/api/forecast', json={'keys': [[int(product_id), int(customer_id)]]}))
+    assert 'APIConnectionError' in lines[0]['error']
+
+
+def test_forecast_validates_the_request(client):
+    assert client.post('/api/forecast', json={'keys': []}).status_code == 422
+    assert client.post('/api/forecast', json={'keys': [[1, 1]], 'horizon': 0}).status_code == 422
+
+
+def test_neighbours(client, data):
+    product_id, customer_id = (int(key) for key in data.series_index.keys[0])
+
+    response = client.get(f'/api/neighbours/{product_id}/{customer_id}', params={'k': 3})
+    assert response.status_code == 200
+    assert len(response.json()['neighbours']) == 3
+    assert client.get('/api/neighbours/999999/999999').status_code == 404
+
+
+def test_precomputed_forecast_without_job_is_not_found(client, monkeypatch):
+    monkeypatch.setattr(index, 'FORECASTS', None)
+    assert client.get('/api/forecast/1/1').status_code == 404
@@ -0,0 +1,92 @@
+# test_backtest.py
+# Description: Tests of resuming rolling origin backtests.
+# Author: Joshua Stiller
+# Date: 18.10.26
+
+import numpy as np
+import pandas as pd
+
+from src.data.base_data import BaseData
+from src.evaluation.backtest import Backtest
+from tests.sales import sales_frame
+
+
+class CountingModel:
+    """ Forecasts the last value and fails while failing is set. """
+
+    def __init__(self, failing=False):
+        self.failing = failing
+        self.calls = 0
+
+    def predict(self, history, predict_frame=10):
+        self.calls += 1
+        if self.failing:
+            raise RuntimeError('failed')
+        return np.full(predict_frame, float(history[-1])), None
+
+
+def _backtest(model, data, output):
+    return Backtest(model, data, horizon=4, n_folds=3, step=1, output=str(output), executor='serial',
+                    unit_size=10)
+
+
+def test_failed_folds_are_run_again(tmp_path):
+    data = BaseData(sales_frame(1000, weeks=40))
+    n_folds = 3 * len(data.series_index)
+
+    folds = _backtest(CountingModel(failing=True), data, tmp_path).run()
+    assert len(folds) == n_folds and folds['error'].notna().all()
+
+    model = CountingModel()
+    folds = _backtest(model, data, tmp_path).run()
+    assert model.calls == n_folds
+    assert len(folds) == n_folds and folds['error'].isna().all()
+
+    model = CountingModel()
+    _backtest(model, data, tmp_path).run()
+    assert model.calls == 0
+
+
+def test_resume_after_new_weeks_keys_folds_by_cutoff(tmp_path):
+    frame = sales_frame(1000, weeks=40)
+    data = BaseData(frame)
+    n_series = len(data.series_index)
+    _backtest(CountingModel(), data, tmp_path).run()
+
+    # One more week moves every origin by one week, so only the latest fold of every series is new
+    new = frame[frame['week'] == frame['week'].max()].assign(week=frame['week'].max() + pd.Timedelta(days=7))
+    data.append(new)
+    model = CountingModel()
+    folds = _backtest(model, data, tmp_path).run()
+    assert model.calls == n_series
+    assert len(folds) == 3 * n_series
+
+    weeks = np.sort(data.data['week'].unique())
+    expected = {pd.Timestamp(weeks[len(weeks) - 4 - fold - 1]) for fold in range(3)}
+    assert set(folds['cutoff']) == expected
+
+    fresh = Backtest(CountingModel(), data, horizon=4, n_folds=3, step=1, executor='serial').run()
+    columns = ['product_id', 'customer_id', 'cutoff', 'fold', 'mae']
+    pd.testing.assert_frame_equal(folds[columns].sort_values(columns[:3]).reset_index(drop=True),
+                                  fresh[columns].sort_values(columns[:3]).reset_index(drop=True),
+                                  check_dtype=False)
+
+
+def test_folds_count_calendar_weeks():
+    # Sales in every third week only, exports have no rows for the weeks between
+    weeks = pd.date_range('2024-01-01', periods=58, freq='7D')
+    history = np.zeros(58)
+    history[::3] = np.arange(1, 21)
+    frame = pd.DataFrame({'product_id': 1, 'product': 'p', 'customer_id': 2, 'customer': 'c',
+                          'week': weeks[::3], 'units_sold': history[::3]})
+
+    folds = Backtest(CountingModel(), BaseData(frame), horizon=4, n_folds=3, step=4, executor='serial').run()
+    folds = folds.sort_values('fold')
+    assert folds['origin'].tolist() == [54, 50, 46]
+    assert folds['cutoff'].tolist() == [weeks[53], weeks[49], weeks[45]]
+
+    # The last value forecast over four calendar weeks with one sale, scaled by the naive errors of all weeks
+    latest = folds.iloc[0]
+    expected = np.abs(history[53] - history[54:]).mean()
+    assert latest['mae'] == expected
+    assert latest['mase'] == expected / np.abs(np.diff(history[:54])).mean()
@@ -0,0 +1,65 @@
+# test_base_data.py
+# Description: Tests of appending sales to BaseData against loading all of them at once.
+# Author: Joshua Stiller
+# Date: 18.10.26
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.data import aggregates
+from src.data.base_data import BaseData
+from tests.sales import sales_frame
+
+
+def _split(frame, n_parts):
+    """ Splits the sales by week into consecutive parts. """
+
+    weeks = np.sort(frame['week'].unique())
+    bounds = np.linspace(0, len(weeks), n_parts + 1).astype(int)
+    return [frame[frame['week'].isin(weeks[start:end])] for start, end in zip(bounds[:-1], bounds[1:])]
+
+
+def _assert_same(data, full):
+    pd.testing.assert_frame_equal(data.get_data(), full.get_data())
+    for key in list(full.series_index.keys)[::7]:
+        product_id, customer_id = key
+        pd.testing.assert_frame_equal(data.get_data(product_id, customer_id), full.get_data(product_id, customer_id))
+        assert data.get_serialized_data(product_id, customer_id) == full.get_serialized_data(product_id, customer_id)
+        assert (data.get_serialized_data(product_id, customer_id, 3, 10)
+                == full.get_serialized_data(product_id, customer_id, 3, 10))
+    for product_id in full.product_ids[:5].tolist():
+        pd.testing.assert_frame_equal(data.get_data(product_ids=product_id), full.get_data(product_ids=product_id))
+    for customer_id in full.customer_ids[:5].tolist():
+        pd.testing.assert_frame_equal(data.get_data(customer_ids=customer_id),
+                                      full.get_data(customer_ids=customer_id))
+
+
+@pytest.mark.parametrize('compact', [False, True])
+def test_appends_equal_a_full_load(compact, monkeypatch):
+    # Few logs per aggregate, so the appends are compacted in between
+    monkeypatch.setattr(aggregates, 'MAX_LOGS', 3)
+    frame = sales_frame(3000, weeks=30)
+    parts = _split(frame, 8)
+
+    data = BaseData(parts[0].copy(), compact=compact)
+    # Build the aggregates before the appends, so they are updated instead of rebuilt
+    data.get_data(), data.get_data(product_ids=int(frame['product_id'].iloc[0]))
+    data.get_data(customer_ids=int(frame['customer_id'].iloc[0]))
+    data.get_data(int(frame['product_id'].iloc[0]), int(frame['customer_id'].iloc[0]))
+    for part in parts[1:]:
+        data.append(part.copy())
+
+    full = BaseData(frame.copy(), compact=compact)
+    _assert_same(data, full)
+    pd.testing.assert_frame_equal(data.data, full.data)
+
+
+def test_append_of_existing_weeks_adds_them_up():
+    frame = sales_frame(600, weeks=30)
+    data = BaseData(frame.copy())
+    data.get_data(), data.get_data(1, 1)
+    data.append(frame.iloc[:40].copy())
+
+    full = BaseData(pd.concat([frame, frame.iloc[:40]], ignore_index=True))
+    _assert_same(data, full)
@@ -0,0 +1,79 @@
+# test_cache.py
+# Description: Tests of the cache keys of model requests and of the disk cache.
+# Author: Joshua Stiller
+# Date: 18.10.26
+
+import pickle
+
+from src.model.cache import DiskCache, describe_scaler, make_key
+from src.preprocessing.scaler import QuantileScaler
+
+
+class PlainScaler:
+    """ A scaler without get_params and with the default repr. """
+
+    def __init__(self, factor=2.):
+        self.factor = factor
+        self._state = object()
+
+
+def test_scalers_with_the_same_configuration_share_a_key():
+    assert make_key(scaler=describe_scaler(PlainScaler())) == make_key(scaler=describe_scaler(PlainScaler()))
+    assert make_key(scaler=describe_scaler(PlainScaler())) != make_key(scaler=describe_scaler(PlainScaler(3.)))
+    assert describe_scaler(PlainScaler())['params'] == {'factor': 2.}
+
+
+def test_scaler_parameters_are_part_of_the_key():
+    assert describe_scaler(QuantileScaler(upper_quant=.9)) == describe_scaler(QuantileScaler(upper_quant=.9))
+    assert describe_scaler(QuantileScaler(upper_quant=.9)) != describe_scaler(QuantileScaler(upper_quant=.5))
+    assert describe_scaler(None) is None
+
+
+class Clock:
+    """ A clock that advances by one second per call. """
+
+    def __init__(self):
+        self.now = 0.
+
+    def __call__(self):
+        self.now += 1.
+        return self.now
+
+
+def _size(value):
+    return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def test_disk_cache_evicts_the_least_recently_used(tmp_path):
+    value = 'x' * 100
+    cache = DiskCache(str(tmp_path / 'cache.sqlite'), max_bytes=3 * _size(value), clock=Clock())
+    for key in 'abc':
+        cache.set(key, value)
+    assert cache.get('a') == value
+
+    cache.set('d', value)
+    assert cache.get('b') is None
+    assert [cache.get(key) for key in 'acd'] == [value] * 3
+    assert cache.stats.evictions == 1
+
+    # A large value evicts as many entries as needed at once
+    cache.set('e', 'y' * 250)
+    assert len(cache) == 1 and cache.stats.evictions == 4
+    assert cache._total == cache._size() <= cache.max_bytes
+
+
+def test_disk_cache_counts_replaced_and_expired_entries(tmp_path):
+    path = str(tmp_path / 'cache.sqlite')
+    cache = DiskCache(path, max_bytes=None, ttl=5., clock=Clock())
+    cache.set('a', 'x' * 100)
+    cache.set('a', 'x' * 10)
+    cache.set('b', 'x' * 20)
+    assert cache._total == cache._size() == _size('x' * 10) + _size('x' * 20)
+
+    cache._clock.now += 10.
+    assert cache.get('a') is None
+    assert cache._total == cache._size() == _size('x' * 20)
+    cache.close()
+
+    # The total of an existing file is counted when it is opened
+    assert DiskCache(path)._total == _size('x' * 20)
@@ -0,0 +1,112 @@
+# test_codec.py
+# Description: Round trip properties of encoding arrays as prompt text and decoding them from completions.
+# Author: Joshua Stiller
+# Date: 18.10.26
+
+import numpy as np
+import pytest
+
+from src.model.codec import decode, decode_many, encode
+
+SEEDS = range(20)
+
+# Pairs of digit and number separators that keep numbers apart
+SEPARATORS = [(' ', ' , '), ('', ','), ('', ' '), (' ', ' ; '), ('', '\n'), ('|', '|,|')]
+
+
+def _values(seed, shape=None, precision=2):
+    """ Random values of mixed magnitude and sign, including zeros, rounded to the precision. """
+
+    generator = np.random.default_rng(seed)
+    shape = shape or (int(generator.integers(1, 200)),)
+    magnitude = 10. ** generator.integers(-2, 7, size=shape)
+    values = generator.normal(size=shape) * magnitude
+    values[generator.random(shape) < 0.1] = 0.
+    return np.round(values, precision)
+
+
+def _tolerance(precision):
+    return 0.5 * 10. ** -precision + 1e-9
+
+
+@pytest.mark.parametrize('digit_sep, num_sep', SEPARATORS)
+@pytest.mark.parametrize('precision', [0, 1, 2, 3])
+def test_round_trip_with_every_separator_and_precision(digit_sep, num_sep, precision):
+    for seed in SEEDS:
+        values = _values(seed, precision=precision)
+        text = encode(values, precision=precision, digit_sep=digit_sep, num_sep=num_sep)
+        np.testing.assert_allclose(decode(text, digit_sep=digit_sep), values, rtol=0, atol=_tolerance(precision))
+
+
+@pytest.mark.parametrize('precision', [None, 0, 2, 4])
+def test_round_trip_of_unrounded_values(precision):
+    for seed in SEEDS:
+        values = np.random.default_rng(seed).normal(size=50) * 100
+        resolved = 2 if precision is None else precision
+        np.testing.assert_allclose(decode(encode(values, precision=precision)), values, rtol=0,
+                                   atol=_tolerance(resolved))
+
+
+def test_round_trip_of_integers_is_exact():
+    for seed in SEEDS:
+        values = np.random.default_rng(seed).integers(-10 ** 6, 10 ** 6, size=100)
+        assert np.array_equal(decode(encode(values)), values)
+        assert ' . ' not in encode(values)
+
+
+@pytest.mark.parametrize('digit_sep, num_sep', SEPARATORS)
+def test_round_trip_of_rows(digit_sep, num_sep):
+    for seed in SEEDS:
+        values = _values(seed, shape=(5, 17))
+        texts = encode(values, precision=2, digit_sep=digit_sep, num_sep=num_sep)
+        assert len(texts) == values.shape[0]
+        decoded = np.array([decode(text, digit_sep=digit_sep) for text in texts])
+        np.testing.assert_allclose(decoded, values, rtol=0, atol=_tolerance(2))
+        np.testing.assert_allclose(decode_many(texts, values.shape[1], digit_sep=digit_sep), values, rtol=0,
+                                   atol=_tolerance(2))
+
+
+@pytest.mark.parametrize('precision', [1, 2, 3])
+def test_round_trip_without_decimal_point(precision):
+    for seed in SEEDS:
+        values = _values(seed, precision=precision)
+        text = encode(values, precision=precision, point='')
+        assert '.' not in text
+        np.testing.assert_allclose(decode(text, implied_decimals=precision), values, rtol=0,
+                                   atol=_tolerance(precision))
+        np.testing.assert_allclose(decode(text, n=len(values), implied_decimals=precision), values, rtol=0,
+                                   atol=_tolerance(precision))
+
+
+def test_n_and_out_bound_the_decoded_values():
+    for seed in SEEDS:
+        values = _values(seed)
+        text = encode(values, precision=2)
+        n = len(values) // 2 + 1
+        np.testing.assert_allclose(decode(text, n=n), values[:n], rtol=0, atol=_tolerance(2))
+
+        out = np.full(len(values) + 3, np.nan)
+        decoded = decode(text, out=out)
+        assert np.shares_memory(decoded, out)
+        np.testing.assert_allclose(out[:len(values)], values, rtol=0, atol=_tolerance(2))
+        assert np.isnan(out[len(values):]).all()
+
+        short = np.empty(n)
+        np.testing.assert_allclose(decode(text, out=short), values[:n], rtol=0, atol=_tolerance(2))
+        np.testing.assert_allclose(decode(text, n=2, out=out), values[:2], rtol=0, atol=_tolerance(2))
+
+
+def test_decode_skips_text_around_numbers():
+    for seed in SEEDS:
+        values = _values(seed)
+        text = f"Sure, here is the forecast: {encode(values, precision=2)}\nLet me know if you need more."
+        np.testing.assert_allclose(decode(text, n=len(values)), values, rtol=0, atol=_tolerance(2))
+
+
+def test_encode_rejects_invalid_input():
+    with pytest.raises(ValueError):
+        encode(np.zeros((2, 2, 2)))
+    with pytest.raises(ValueError):
+        encode([1., np.nan])
+    assert encode([]) == ''
+    assert encode(np.zeros((3, 0))) == ['', '', '']
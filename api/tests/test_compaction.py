@@ -0,0 +1,87 @@
+# test_compaction.py
+# Description: Tests of the compact dtypes of sales frames and their memory report.
+# Author: Joshua Stiller
+# Date: 18.10.26
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.data.compaction import compact_frame, memory_usage, memory_usage_report, normalize_ids, parse_weeks
+
+
+def _sales():
+    return pd.DataFrame({
+        'product': ['a', 'b', 'a', 'c'],
+        'product_id': [1, 2, 1, 40_000],
+        'customer': ['x', 'x', 'y', 'y'],
+        'customer_id': ['7', '8', '9', '10'],
+        'week': ['2024-01-03', '2024-01-08', '2024-01-14', '2024-01-15'],
+        'units_sold': [3., -2., 0., 120.],
+    })
+
+
+def test_compact_dtypes_keep_the_values():
+    data = _sales()
+    compact = compact_frame(data)
+
+    assert compact['product'].dtype == 'category' and compact['customer'].dtype == 'category'
+    assert compact['product_id'].dtype == np.int32
+    assert compact['customer_id'].dtype == np.int8
+    assert compact['units_sold'].dtype == np.int8
+    assert compact['product'].tolist() == data['product'].tolist()
+    assert compact['product_id'].tolist() == data['product_id'].tolist()
+    assert compact['customer_id'].tolist() == [7, 8, 9, 10]
+    assert compact['units_sold'].tolist() == data['units_sold'].tolist()
+
+    # The given frame is not changed
+    assert data['customer_id'].tolist() == ['7', '8', '9', '10']
+
+
+def test_quantities_that_do_not_fit_keep_their_precision():
+    data = _sales().assign(units_sold=[0.1, 2.5, np.nan, 1e6 + 0.25], product_id=[1, 2, 1, 2 ** 40])
+    compact = compact_frame(data)
+
+    assert compact['product_id'].dtype == np.int64
+    assert compact['units_sold'].dtype == np.float64
+    np.testing.assert_array_equal(compact['units_sold'], data['units_sold'])
+
+    halves = compact_frame(data.assign(units_sold=[0.5, 2.5, 1.25, 3.]))
+    assert halves['units_sold'].dtype == np.float32
+    assert halves['units_sold'].tolist() == [0.5, 2.5, 1.25, 3.]
+
+
+def test_text_ids_that_are_not_numbers_become_categories():
+    data = _sales().assign(customer_id=['A-1', 'A-2', 'A-1', '10'])
+    compact = compact_frame(data)
+    assert compact['customer_id'].dtype == 'category'
+    assert compact['customer_id'].tolist() == data['customer_id'].tolist()
+    assert normalize_ids(data) is data
+
+
+@pytest.mark.parametrize('weeks, expected', [
+    (['2024-01-03', '2024-01-08', '2024-01-14'], ['2024-01-01', '2024-01-08', '2024-01-08']),
+    (['2024-02', '2024-W10', '2023-52'], ['2024-01-08', '2024-03-04', '2023-12-25']),
+])
+def test_weeks_become_their_monday(weeks, expected):
+    parsed = parse_weeks(pd.Series(weeks))
+    assert parsed.dt.strftime('%Y-%m-%d').tolist() == expected
+
+
+def test_other_weeks_are_downcast_or_categories():
+    assert parse_weeks(pd.Series([1, 52, 104])).dtype == np.int8
+    assert parse_weeks(pd.Series(['early', 'late'])).dtype == 'category'
+
+
+def test_memory_report_compares_every_column_and_the_total():
+    data = _sales()
+    before, after = memory_usage(data), memory_usage(compact_frame(data))
+    report = memory_usage_report(before, after)
+
+    assert report.index.tolist() == list(data.columns) + ['total']
+    assert report.loc['units_sold', 'dtype_before'] == 'float64' and report.loc['units_sold', 'dtype_after'] == 'int8'
+    assert report.loc['units_sold', 'bytes_before'] == 4 * 8 and report.loc['units_sold', 'bytes_after'] == 4
+    assert report.loc['units_sold', 'ratio'] == 8.
+    assert report.loc['total', 'bytes_before'] == data.memory_usage(index=False, deep=True).sum()
+    assert report.loc['total', 'bytes_after'] == after['bytes'].sum()
+    assert report.loc['total', 'ratio'] == pytest.approx(before['bytes'].sum() / after['bytes'].sum())
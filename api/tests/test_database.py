@@ -0,0 +1,73 @@
+# test_database.py
+# Description: Tests of DatabaseData with a local SQLite copy of the sales table.
+# Author: Joshua Stiller
+# Date: 18.10.26
+
+import sqlite3
+
+import pytest
+
+from src.data.database import sqlite_pool
+from src.data.database_data import DatabaseData
+
+# A sales table without ids, so they are numbered by the reader
+COLUMNS = {'teil_name': 'product', 'kunde_name': 'customer', 'woche': 'week', 'menge': 'units_sold'}
+
+
+def _insert(path, rows):
+    with sqlite3.connect(path) as connection:
+        connection.executemany('INSERT INTO sales VALUES (?, ?, ?, ?, ?)', rows)
+
+
+@pytest.fixture
+def path(tmp_path):
+    location = str(tmp_path / 'sales.db')
+    with sqlite3.connect(location) as connection:
+        connection.execute('CREATE TABLE sales (user_id TEXT, teil_name TEXT, kunde_name TEXT, woche TEXT, '
+                           'menge INTEGER)')
+    _insert(location, [('a', 'bolt', 'acme', '2024-01-01', 3), ('a', 'nut', 'acme', '2024-01-01', 5),
+                       ('a', 'bolt', 'globex', '2024-01-08', 2), ('b', 'screw', 'initech', '2024-01-08', 7)])
+    return location
+
+
+def _ids(data):
+    """ Returns the ids of every product and customer name. """
+
+    frame = data.data
+    products = dict(zip(frame['product'].astype(str), frame['product_id'].tolist()))
+    customers = dict(zip(frame['customer'].astype(str), frame['customer_id'].tolist()))
+    return products, customers
+
+
+def test_initial_load_reads_the_sales_of_the_tenant(path):
+    data = DatabaseData(sqlite_pool(path), 'a', column_mapper=COLUMNS, chunksize=2)
+
+    assert data.data.shape[0] == 3
+    assert sorted(data.data['units_sold'].tolist()) == [2, 3, 5]
+    assert data.last_week == '2024-01-08'
+    assert _ids(data) == ({'bolt': 0, 'nut': 1}, {'acme': 0, 'globex': 1})
+
+
+def test_refresh_keeps_ids_and_adds_new_names(path):
+    data = DatabaseData(sqlite_pool(path), 'a', column_mapper=COLUMNS, chunksize=2)
+    products, customers = _ids(data)
+    assert data.refresh() == 0
+
+    _insert(path, [('a', 'washer', 'acme', '2024-01-15', 4), ('a', 'bolt', 'umbrella', '2024-01-15', 1),
+                   ('a', 'nut', 'acme', '2024-01-15', 6)])
+    assert data.refresh() == 3
+    assert data.last_week == '2024-01-15'
+    assert data.data.shape[0] == 6
+
+    new_products, new_customers = _ids(data)
+    assert new_products == {**products, 'washer': 2}
+    assert new_customers == {**customers, 'umbrella': 2}
+
+
+def test_refresh_skips_rows_of_loaded_weeks(path):
+    data = DatabaseData(sqlite_pool(path), 'a', column_mapper=COLUMNS)
+
+    # Late rows of a week that was loaded already are only read by a full reload
+    _insert(path, [('a', 'nut', 'globex', '2024-01-08', 9)])
+    assert data.refresh() == 0
+    assert DatabaseData(sqlite_pool(path), 'a', column_mapper=COLUMNS).data.shape[0] == 4
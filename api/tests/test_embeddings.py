@@ -0,0 +1,82 @@
+# test_embeddings.py
+# Description: Tests of the embedding store and its blocked top-k search.
+# Author: Joshua Stiller
+# Date: 18.10.26
+
+import numpy as np
+import pytest
+
+from src.data.embeddings import EmbeddingStore
+
+
+def _store(n=50, dimensions=8, block_size=7, seed=0):
+    vectors = np.random.default_rng(seed).normal(size=(n, dimensions))
+    return EmbeddingStore(vectors, np.arange(n) // 5, np.arange(n) % 5, block_size=block_size), vectors
+
+
+def _brute_force(vectors, queries, k, exclude=None):
+    vectors = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+    similarity = queries @ vectors.T
+    if exclude is not None:
+        similarity[np.arange(len(queries)), exclude] = -np.inf
+    return np.argsort(-similarity, axis=1, kind='stable')[:, :k]
+
+
+@pytest.mark.parametrize('block_size', [1, 7, 50, 1000])
+def test_blockwise_search_matches_a_full_search(block_size):
+    store, vectors = _store(block_size=block_size)
+    queries = np.random.default_rng(1).normal(size=(6, 8))
+
+    rows, similarities = store.top_k(queries, k=4)
+    np.testing.assert_array_equal(rows, _brute_force(vectors, queries, 4))
+    assert rows.shape == similarities.shape == (6, 4)
+    assert np.all(np.diff(similarities, axis=1) <= 0)
+
+    exclude = _brute_force(vectors, queries, 1)[:, 0]
+    rows, _ = store.top_k(queries, k=4, exclude=exclude)
+    np.testing.assert_array_equal(rows, _brute_force(vectors, queries, 4, exclude))
+    assert not np.any(rows == exclude[:, None])
+
+
+def test_single_queries_and_large_k():
+    store, vectors = _store(n=5, block_size=2)
+    rows, similarities = store.top_k(vectors[2] * 3., k=10, exclude=[2])
+
+    assert rows.shape == (4,) and 2 not in rows
+    np.testing.assert_array_equal(rows, _brute_force(vectors, vectors[2:3], 4, [2])[0])
+
+    rows, similarities = store.top_k(vectors[2], k=10)
+    assert rows[0] == 2 and similarities[0] == pytest.approx(1.)
+    assert store.top_k(vectors[:2], k=0)[0].shape == (2, 0)
+
+
+def test_nearest_excludes_the_series_itself():
+    store, vectors = _store()
+    neighbours = store.nearest(3, 1, k=3)
+
+    row = store.row(3, 1)
+    expected = _brute_force(vectors, vectors[row:row + 1], 3, [row])[0]
+    assert [(product_id, customer_id) for product_id, customer_id, _ in neighbours] == \
+        [(i // 5, i % 5) for i in expected.tolist()]
+    with pytest.raises(KeyError):
+        store.nearest(99, 0)
+
+
+def test_saved_stores_are_loaded_memory_mapped(tmp_path):
+    store, _ = _store()
+    store.save(str(tmp_path))
+    loaded = EmbeddingStore.load(str(tmp_path), block_size=9)
+
+    assert isinstance(loaded.vectors, np.memmap)
+    np.testing.assert_array_equal(loaded.vectors, store.vectors)
+    assert loaded.nearest(3, 1) == store.nearest(3, 1)
+
+
+def test_added_embeddings_replace_existing_keys():
+    store, _ = _store(n=10)
+    store.add([(0, 1), (9, 9)], [[1.] + [0.] * 7, [0., 2.] + [0.] * 6])
+
+    assert len(store) == 11 and store.row(9, 9) == 10
+    np.testing.assert_array_equal(store.vector(0, 1), [1.] + [0.] * 7)
+    np.testing.assert_array_equal(store.vector(9, 9), [0., 1.] + [0.] * 6)
@@ -0,0 +1,144 @@
+# test_forecast_job.py
+# Description: Tests of resuming ForecastJob runs and serving their results.
+# Author: Joshua Stiller
+# Date: 18.10.26
+
+import asyncio
+
+import numpy as np
+import pandas as pd
+from fastapi.testclient import TestClient
+
+import index
+from src.data.base_data import BaseData
+from src.jobs.forecast_job import ForecastJob, min_weeks, read_forecasts
+from src.model.bulk import ForecastResult
+from src.model.gpt3_model import GPT3Model
+from src.model.routing import RoutedModel
+from src.simulation.generator import DemandGenerator
+from tests.fake_openai import FakeAsyncOpenAI, FakeOpenAI
+from tests.sales import sales_frame
+
+
+class CountingModel:
+    """ Forecasts the last value and fails for series whose history has a length in fail_lengths. """
+
+    def __init__(self, fail_lengths=()):
+        self.fail_lengths = set(fail_lengths)
+        self.calls = 0
+
+    def predict(self, history, predict_frame=10):
+        self.calls += 1
+        if len(history) in self.fail_lengths:
+            raise RuntimeError('failed')
+        return np.full(predict_frame, float(history[-1])), None
+
+    async def apredict_many(self, histories, predict_frame=10, **kwargs):
+        results = []
+        for index, history in enumerate(histories):
+            forecast, _ = self.predict(history, predict_frame)
+            results.append(ForecastResult(index, forecast=forecast))
+        return results
+
+
+def _next_week(frame):
+    """ Returns one new week of the first series. """
+
+    new = frame.iloc[[0]].copy()
+    new['week'] = frame['week'].max() + pd.Timedelta(days=7)
+    return new
+
+
+def test_resume_retries_failed_and_outdated_series(tmp_path):
+    frame = sales_frame(2000, weeks=40)
+    data = BaseData(frame)
+    n_series = len(data.series_index)
+
+    first = ForecastJob(CountingModel(fail_lengths={40}), data, str(tmp_path), horizon=3, executor='serial',
+                        unit_size=7)
+    forecasts = first.run()
+    assert len(forecasts) == n_series
+    assert forecasts['error'].notna().all()
+
+    # Failed series are retried
+    model = CountingModel()
+    forecasts = ForecastJob(model, data, str(tmp_path), horizon=3, executor='serial', unit_size=7).run()
+    assert model.calls == n_series
+    assert forecasts['error'].isna().all()
+
+    # Finished series are skipped
+    model = CountingModel()
+    ForecastJob(model, data, str(tmp_path), horizon=3, executor='serial').run()
+    assert model.calls == 0
+
+    # A new week of any series moves the forecast origin of all series
+    new = _next_week(frame)
+    data.append(new)
+    model = CountingModel()
+    forecasts = ForecastJob(model, data, str(tmp_path), horizon=3, executor='serial').run()
+    assert model.calls == n_series
+    assert (forecasts['last_week'] == new['week'].iloc[0]).all()
+    key = (new['product_id'].iloc[0], new['customer_id'].iloc[0])
+    row = forecasts.set_index(['product_id', 'customer_id']).loc[key]
+    assert row['last_week'] == new['week'].iloc[0]
+
+
+def test_min_weeks_selects_series_with_enough_weeks(tmp_path):
+    data = BaseData(sales_frame(2000, weeks=40))
+    assert len(min_weeks(40)(data)) == len(data.series_index)
+    assert min_weeks(41)(data) == set()
+
+    forecasts = ForecastJob(CountingModel(), data, str(tmp_path), select=min_weeks(41), executor='serial').run()
+    assert forecasts.empty
+
+
+def test_async_run_from_a_running_event_loop(tmp_path):
+    data = BaseData(sales_frame(2000, weeks=40))
+    job = ForecastJob(CountingModel(), data, str(tmp_path), horizon=3, executor='async', unit_size=7)
+
+    async def run():
+        return job.run()
+
+    forecasts = asyncio.run(run())
+    assert len(forecasts) == len(data.series_index)
+    assert forecasts['error'].isna().all()
+
+
+def test_intermittent_series_take_their_routes(tmp_path):
+    # Exports only have rows for weeks with sales
+    generator = DemandGenerator(20, 10, 120, intermittent_share=0.5)
+    data = BaseData(pd.concat(generator.frames(drop_zeros=True), ignore_index=True))
+    routes = data.routes()
+    assert (routes['class'] == 'intermittent').sum() > 50
+    assert (routes['route'] == 'constant').sum() > 0
+
+    model = RoutedModel(GPT3Model(client=FakeOpenAI(), async_client=FakeAsyncOpenAI()))
+    forecasts = ForecastJob(model, data, str(tmp_path), horizon=3).run()
+    forecasts = forecasts.set_index(['product_id', 'customer_id']).loc[routes.index]
+    assert forecasts['route'].tolist() == routes['route'].tolist()
+
+    # Inactive series are forecast as zero
+    inactive = (routes['route'] == 'constant') & (routes['level'] == 0)
+    assert inactive.any()
+    assert all(forecast.tolist() == [0.] * 3 for forecast in forecasts.loc[inactive.to_numpy(), 'forecast'])
+
+
+def test_api_serves_the_latest_results(tmp_path, monkeypatch):
+    frame = sales_frame(2000, weeks=40)
+    data = BaseData(frame)
+    monkeypatch.setattr(index, 'FORECASTS', str(tmp_path))
+    client = TestClient(index.app)
+    product_id, customer_id = (int(key) for key in data.series_index.keys[0])
+
+    assert client.get(f'/api/forecast/{product_id}/{customer_id}').status_code == 404
+    ForecastJob(CountingModel(), data, str(tmp_path), horizon=3, executor='serial').run()
+    response = client.get(f'/api/forecast/{product_id}/{customer_id}')
+    assert response.status_code == 200
+    assert len(response.json()['forecast']) == 3
+    assert client.get('/api/forecast/999999/999999').status_code == 404
+
+    # A later run is served without restarting the process
+    data.append(_next_week(frame).assign(product_id=product_id, customer_id=customer_id))
+    ForecastJob(CountingModel(), data, str(tmp_path), horizon=3, executor='serial').run()
+    last_week = read_forecasts(str(tmp_path), product_id)['last_week'].max()
+    assert client.get(f'/api/forecast/{product_id}/{customer_id}').json()['last_week'] == last_week.isoformat()
@@ -0,0 +1,202 @@
+# test_gpt3_model.py
+# Description: Tests of GPT3Model with the offline fake clients.
+# Author: Joshua Stiller
+# Date: 18.10.26
+
+import asyncio
+import threading
+
+import numpy as np
+
+from src.model.cache import MemoryCache
+from src.model.gpt3_model import GPT3Model
+from src.model.statistical_model import StatisticalModel
+from src.preprocessing.scaler import QuantileScaler
+from tests.fake_openai import FailingAsyncOpenAI, FakeAsyncOpenAI, FakeOpenAI
+
+
+def test_predict_from_threads_keeps_the_scale_of_every_series():
+    histories = [np.full(30, 10.), np.full(30, 1000.)]
+    expected = [GPT3Model(scaler=QuantileScaler(), client=FakeOpenAI()).predict(history, 3)[0]
+                for history in histories]
+
+    # Both requests are in flight at the same time, so both fits happen before either forecast is parsed
+    model = GPT3Model(scaler=QuantileScaler(), client=FakeOpenAI(latency=0.05))
+    results = [None, None]
+
+    def predict(i):
+        results[i] = model.predict(histories[i], 3)[0]
+
+    threads = [threading.Thread(target=predict, args=(i,)) for i in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for result, forecast in zip(results, expected):
+        np.testing.assert_allclose(np.ravel(result), np.ravel(forecast))
+    assert np.ravel(results[1]).min() > 10 * np.ravel(results[0]).max()
+
+
+def test_predict_samples_from_threads_keeps_the_scale_of_every_series():
+    histories = [np.full(30, 10.), np.full(30, 1000.)]
+    model = GPT3Model(scaler=QuantileScaler(), client=FakeOpenAI(latency=0.05))
+    results = [None, None]
+
+    def predict(i):
+        results[i] = model.predict_samples(histories[i], 3, n_samples=2)[0]
+
+    threads = [threading.Thread(target=predict, args=(i,)) for i in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert np.nanmin(results[1].median) > 10 * np.nanmax(results[0].median)
+
+
+def test_async_requests_fall_back_when_the_api_fails():
+    history = np.arange(30.)
+    model = GPT3Model(client=FakeOpenAI(), async_client=FailingAsyncOpenAI(), fallback=StatisticalModel())
+    expected, _ = StatisticalModel().predict(history, 4)
+
+    forecast, _ = asyncio.run(model.apredict(history, 4))
+    np.testing.assert_allclose(np.ravel(forecast), np.ravel(expected))
+
+    samples, _ = asyncio.run(model.apredict_samples(history, 4, n_samples=3))
+    assert samples.n_samples == 1
+    np.testing.assert_allclose(samples.median, np.ravel(expected))
+
+
+def test_bulk_requests_report_failures_with_the_fallback_forecast():
+    model = GPT3Model(client=FakeOpenAI(), async_client=FailingAsyncOpenAI(), fallback=StatisticalModel())
+    results = model.predict_many([np.arange(30.), np.ones(30)], 4, max_retries=0)
+    assert all(not result.ok and result.fallback and len(result.forecast) == 4 for result in results)
+
+
+def test_bulk_requests_from_a_running_event_loop(fake_client, fake_async_client):
+    model = GPT3Model(client=fake_client, async_client=fake_async_client)
+    histories = [np.arange(30.), np.ones(30)]
+
+    async def call():
+        # E.g. a notebook cell, where blocking code runs inside the loop of the kernel
+        return model.predict_many(histories, 4)
+
+    results = asyncio.run(call())
+    assert [result.index for result in results] == [0, 1]
+    assert all(result.ok and len(np.ravel(result.forecast)) == 4 for result in results)
+
+
+def test_packed_requests_match_single_requests(fake_client, fake_async_client):
+    histories = [np.arange(30.) + i for i in range(4)]
+    expected = GPT3Model(client=FakeOpenAI(), async_client=FakeAsyncOpenAI()).predict_many(histories, 3)
+
+    model = GPT3Model(client=fake_client, async_client=fake_async_client, cache=MemoryCache())
+    results = model.predict_many(histories, 3, pack_budget=10_000)
+
+    assert fake_async_client.calls == 1
+    assert [result.index for result in results] == [0, 1, 2, 3]
+    for result, single in zip(results, expected):
+        assert result.ok and result.attempts == 1
+        np.testing.assert_array_equal(np.ravel(result.forecast), np.ravel(single.forecast))
+
+    # The forecasts of the pack are cached per series
+    assert model.predict_many(histories[1:3], 3, pack_budget=10_000)[1].ok
+    assert fake_async_client.calls == 1
+
+
+def test_series_cut_off_by_max_tokens_are_requeued_one_by_one(fake_client, fake_async_client):
+    # The fake answers ten values per series, so a pack asking for one value runs out of tokens in the third line
+    histories = [np.arange(30.) + i for i in range(4)]
+    model = GPT3Model(client=fake_client, async_client=fake_async_client)
+    results = model.predict_many(histories, 1, pack_budget=10_000)
+
+    assert fake_async_client.calls == 3
+    assert all(result.ok for result in results)
+    assert [np.ravel(result.forecast).tolist() for result in results] == [[12.]] * 4
+    assert results[0].completion.choices[0].finish_reason == 'length'
+    assert results[0].completion.choices[0].message.content.startswith('S1: ')
+    assert [result.completion.choices[0].message.content[:3] for result in results[2:]] == ['1 2'] * 2
+
+
+def test_packs_without_an_answer_are_requeued(fake_client, fake_async_client):
+    fake_async_client.content = 'no numbers'
+    histories = [np.arange(30.), np.ones(30)]
+    model = GPT3Model(client=fake_client, async_client=fake_async_client)
+    results = model.predict_many(histories, 2, pack_budget=10_000)
+
+    # One packed and two single requests, whose forecasts are empty
+    assert fake_async_client.calls == 3
+    assert [result.index for result in results] == [0, 1]
+    assert all(len(np.ravel(result.forecast)) == 0 for result in results)
+
+
+def _lengths(model, histories):
+    return [float(len(model._embedding_input(np.asarray(history)))) for history in histories]
+
+
+def test_embeddings_are_batched_in_input_order(fake_client):
+    histories = [np.arange(n + 1.) for n in range(5)]
+    model = GPT3Model(client=fake_client)
+    embeddings = model.embed_many(histories, batch_size=2)
+
+    assert [len(batch) for batch in fake_client.embedded] == [2, 2, 1]
+    assert embeddings.shape == (5, fake_client.dimensions) and embeddings.dtype == np.float32
+    assert embeddings[:, 0].tolist() == _lengths(model, histories)
+    np.testing.assert_array_equal(embeddings[3], np.float32(model.embed(histories[3])))
+
+    # The token limit splits the batches as well, every input is about half its length in tokens
+    fake_client.embedded.clear()
+    model.embed_many(histories, max_batch_tokens=12)
+    assert [len(batch) for batch in fake_client.embedded] == [3, 1, 1]
+
+
+def test_embeddings_of_a_shuffled_response_keep_their_series(fake_client):
+    class ShuffledOpenAI(FakeOpenAI):
+        def _embed(self, input, model, **kwargs):
+            response = super()._embed(input, model, **kwargs)
+            response.data.reverse()
+            return response
+
+    histories = [np.arange(n + 1.) for n in range(4)]
+    model = GPT3Model(client=ShuffledOpenAI())
+    assert model.embed_many(histories)[:, 0].tolist() == _lengths(model, histories)
+
+
+def test_cached_embeddings_are_not_requested_again(fake_client):
+    histories = [np.arange(n + 1.) for n in range(4)]
+    model = GPT3Model(client=fake_client, cache=MemoryCache())
+    model.embed_many(histories[:2])
+    embeddings = model.embed_many(histories[::-1])
+
+    assert fake_client.embedded[1] == [model._embedding_input(history) for history in histories[:1:-1]]
+    assert embeddings[:, 0].tolist() == _lengths(model, histories[::-1])
+    model.embed(histories[0])
+    assert fake_client.calls == 2
+
+
+def test_samples_have_one_row_per_choice(fake_client, fake_async_client):
+    history = np.arange(30.)
+    model = GPT3Model(scaler=QuantileScaler(), client=fake_client, async_client=fake_async_client)
+    samples, completion = model.predict_samples(history, 4, n_samples=3)
+    async_samples, _ = asyncio.run(model.apredict_samples(history, 4, n_samples=3))
+
+    assert samples.n_samples == len(completion.choices) == 3
+    expected, _ = model.predict(history, 4)
+    np.testing.assert_allclose(samples.samples, np.tile(np.ravel(expected), (3, 1)))
+    np.testing.assert_array_equal(async_samples.samples, samples.samples)
+
+
+def test_samples_are_cached_by_their_count_and_temperature(fake_client, fake_async_client):
+    history = np.arange(30.)
+    model = GPT3Model(client=fake_client, async_client=fake_async_client, cache=MemoryCache())
+
+    first = model.predict_samples(history, 4, n_samples=3)
+    assert model.predict_samples(history, 4, n_samples=3) is first
+    assert asyncio.run(model.apredict_samples(history, 4, n_samples=3)) is first
+    assert fake_client.calls == 1 and fake_async_client.calls == 0
+
+    model.predict_samples(history, 4, n_samples=4)
+    model.predict_samples(history, 4, n_samples=3, temperature=0.5)
+    model.predict(history, 4)
+    assert fake_client.calls == 4
@@ -0,0 +1,116 @@
+# test_ingestion.py
+# Description: Tests of reading sales exports and their Parquet sidecar.
+# Author: Joshua Stiller
+# Date: 18.10.26
+
+import os
+
+import pandas as pd
+
+from src.data import ingestion
+from src.data.base_data import BaseData
+from src.data.ingestion import read_sales_csv, sidecar_path
+from src.data.user_data import UserData
+
+
+def _export(path, product_ids, notes=None):
+    """ Writes a sales export with the column names of the app. """
+
+    n = len(product_ids)
+    frame = pd.DataFrame({
+        'teil_id': product_ids,
+        'teil_name': [f'product {i}' for i in range(n)],
+        'kunde_id': range(n),
+        'kunde_name': [f'customer {i}' for i in range(n)],
+        'woche': ['2024-01-01'] * n,
+        'menge': range(n),
+    })
+    if notes is not None:
+        frame['notiz'] = notes
+    frame.to_csv(path, index=False)
+    return str(path)
+
+
+MAPPER = {'teil_id': 'product_id', 'teil_name': 'product', 'kunde_id': 'customer_id', 'kunde_name': 'customer',
+          'woche': 'week', 'menge': 'units_sold'}
+
+
+def test_numeric_ids_and_quantities_are_integers_and_cached(tmp_path):
+    path = _export(tmp_path / 'sales.csv', range(10))
+    data = read_sales_csv(path, MAPPER, chunksize=3)
+
+    assert data['product_id'].dtype == 'int64'
+    assert data['units_sold'].dtype == 'int64'
+    assert os.path.exists(sidecar_path(path))
+    pd.testing.assert_frame_equal(read_sales_csv(path, MAPPER), data, check_dtype=False)
+    assert read_sales_csv(path, MAPPER)['units_sold'].dtype == 'int64'
+
+
+def test_large_ids_are_not_wrapped(tmp_path):
+    path = _export(tmp_path / 'sales.csv', [1, 9_999_999_999, 2 ** 70])
+    data = read_sales_csv(path, MAPPER)
+    assert data['product_id'].tolist() == ['1', '9999999999', str(2 ** 70)]
+
+    path = _export(tmp_path / 'other.csv', [1, 9_999_999_999])
+    assert read_sales_csv(path, MAPPER)['product_id'].tolist() == [1, 9_999_999_999]
+
+
+def test_decimal_and_missing_quantities_are_floats(tmp_path):
+    path = _export(tmp_path / 'sales.csv', range(4))
+    frame = pd.read_csv(path)
+    frame.assign(menge=[1, 2.5, 3, 4]).to_csv(path, index=False)
+    data = read_sales_csv(path, MAPPER, chunksize=3)
+    assert data['units_sold'].dtype == 'float64' and data['units_sold'].tolist() == [1, 2.5, 3, 4]
+
+    path = str(tmp_path / 'missing.csv')
+    frame.assign(menge=[1, None, 3, 4]).to_csv(path, index=False)
+    for data in (read_sales_csv(path, MAPPER), read_sales_csv(path, MAPPER)):
+        assert data['units_sold'].dtype == 'float64'
+        assert data['units_sold'].isna().tolist() == [False, True, False, False]
+
+
+def test_prompts_match_a_plain_read(tmp_path):
+    path = _export(tmp_path / 'sales.csv', [3, 3, 5, 5, 5])
+    frame = pd.read_csv(path).assign(woche=['2024-01-01', '2024-01-08', '2024-01-01', '2024-01-08', '2024-01-15'],
+                                      kunde_id=[1, 1, 2, 2, 2])
+    frame.to_csv(path, index=False)
+
+    data = UserData(path, MAPPER)
+    plain = BaseData(pd.read_csv(path).rename(columns=MAPPER))
+    pd.testing.assert_frame_equal(data.get_data(), plain.get_data())
+    assert data.get_serialized_data(5, 2) == plain.get_serialized_data(5, 2) == '2 , 3 , 4'
+
+
+def test_text_ids_are_read_as_text(tmp_path):
+    path = _export(tmp_path / 'sales.csv', [str(i) for i in range(8)] + ['A-1', 'A-2'])
+    data = read_sales_csv(path, MAPPER, chunksize=3)
+
+    assert data['product_id'].tolist()[-2:] == ['A-1', 'A-2']
+    assert data['customer_id'].tolist() == [str(i) for i in range(10)]
+    assert not os.path.exists(f'{sidecar_path(path)}.partial')
+
+    # The sidecar of the second attempt is found again
+    cached = read_sales_csv(path, MAPPER)
+    assert cached['product_id'].tolist() == data['product_id'].tolist()
+
+
+def test_unwritable_sidecar_is_skipped(tmp_path, monkeypatch):
+    path = _export(tmp_path / 'sales.csv', range(10))
+
+    def fail(*args, **kwargs):
+        raise PermissionError('read-only')
+
+    monkeypatch.setattr(ingestion, '_write_chunk', fail)
+    data = read_sales_csv(path, MAPPER, chunksize=3)
+
+    assert data.shape[0] == 10
+    assert not os.path.exists(sidecar_path(path))
+
+
+def test_unmapped_columns_have_one_schema(tmp_path):
+    path = _export(tmp_path / 'sales.csv', range(10), notes=[1, 2, 3, 4, 5, 6, 'late', None, 'x', 10])
+    data = read_sales_csv(path, MAPPER, chunksize=3)
+
+    assert data['notiz'].tolist()[6] == 'late'
+    assert os.path.exists(sidecar_path(path))
+    assert read_sales_csv(path, MAPPER)['notiz'].tolist()[6] == 'late'
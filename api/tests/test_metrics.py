@@ -0,0 +1,79 @@
+# test_metrics.py
+# Description: Tests of the instrumentation hooks and the Prometheus text format of the registry.
+# Author: Joshua Stiller
+# Date: 18.10.26
+
+import pytest
+
+from src.monitoring import metrics
+from src.monitoring.metrics import Registry
+
+
+@pytest.fixture
+def registry():
+    yield metrics.enable(Registry(buckets=(0.1, 1.)))
+    metrics.disable()
+
+
+def test_counters_are_rendered_with_help_type_and_labels(registry):
+    metrics.increment('cache_total', result='hit')
+    metrics.increment('cache_total', 2, result='miss')
+    metrics.increment('cache_total', result='hit')
+    metrics.increment('custom_total', 1.5)
+
+    assert registry.render().splitlines() == [
+        '# HELP forecast_cache_total Lookups of the completion and embedding cache by result.',
+        '# TYPE forecast_cache_total counter',
+        'forecast_cache_total{result="hit"} 2',
+        'forecast_cache_total{result="miss"} 2',
+        '# HELP forecast_custom_total Custom total.',
+        '# TYPE forecast_custom_total counter',
+        'forecast_custom_total 1.5',
+    ]
+
+
+def test_histograms_have_cumulative_buckets_sum_and_count(registry):
+    for value in (0.05, 0.1, 0.5, 3.):
+        metrics.observe('stage_seconds', value, stage='openai')
+
+    assert registry.render().splitlines() == [
+        '# HELP forecast_stage_seconds Duration of a stage in seconds.',
+        '# TYPE forecast_stage_seconds histogram',
+        'forecast_stage_seconds_bucket{stage="openai",le="0.1"} 2',
+        'forecast_stage_seconds_bucket{stage="openai",le="1.0"} 3',
+        'forecast_stage_seconds_bucket{stage="openai",le="+Inf"} 4',
+        'forecast_stage_seconds_sum{stage="openai"} 3.65',
+        'forecast_stage_seconds_count{stage="openai"} 4',
+    ]
+
+
+def test_label_values_are_escaped(registry):
+    metrics.increment('errors_total', error='Bad "quote"\\path\nline', stage='parse')
+    assert 'forecast_errors_total{error="Bad \\"quote\\"\\\\path\\nline",stage="parse"} 1' in \
+        registry.render().splitlines()
+
+
+def test_timers_count_errors_by_type(registry):
+    with pytest.raises(ValueError):
+        with metrics.timer('openai', model='fake'):
+            raise ValueError
+
+    @metrics.timed('parse')
+    def parse():
+        return 1
+
+    assert parse() == 1
+    snapshot = registry.snapshot()
+    assert snapshot['counters'] == {'errors_total{error="ValueError",model="fake",stage="openai"}': 1}
+    assert snapshot['histograms']['stage_seconds{model="fake",stage="openai"}']['count'] == 1
+    assert snapshot['histograms']['stage_seconds{stage="parse"}']['count'] == 1
+
+
+def test_hooks_do_nothing_when_disabled(registry):
+    metrics.disable()
+    metrics.increment('cache_total', result='hit')
+    with metrics.timer('openai'):
+        pass
+
+    assert metrics.get_sink() is None
+    assert registry.render() == '\n'
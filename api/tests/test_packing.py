@@ -0,0 +1,51 @@
+# test_packing.py
+# Description: Tests of packing several series into one request and parsing the labelled answer.
+# Author: Joshua Stiller
+# Date: 18.10.26
+
+import numpy as np
+
+from src.model.packing import build_packed_messages, pack_series, parse_packed
+
+
+def test_series_are_packed_in_order_within_the_budget():
+    assert pack_series([3, 3, 3, 9, 1], budget=8, overhead=2) == [[0, 1], [2], [3], [4]]
+    assert pack_series([], budget=8) == []
+
+
+def test_packed_messages_label_every_series():
+    messages = build_packed_messages([('S1', '1 , 2'), ('S2', '3 , 4')], 5)
+    assert messages[-1]['content'].endswith('Sequences:\nS1: 1 , 2\nS2: 3 , 4')
+    assert 'for 5 values' in messages[-1]['content']
+
+
+def test_labelled_lines_are_parsed():
+    content = 'Here you go:\n- S1: 1 2 , 1 3\n* s2 = 2 . 5 , 3\nS3) 7 , 8 , 9\n'
+    forecasts = parse_packed(content, ['S1', 'S2', 'S3'], 2)
+
+    assert list(forecasts) == ['S1', 'S2', 'S3']
+    np.testing.assert_array_equal(forecasts['S1'], [12, 13])
+    np.testing.assert_array_equal(forecasts['S2'], [2.5, 3])
+    np.testing.assert_array_equal(forecasts['S3'], [7, 8])
+
+
+def test_missing_short_and_unknown_labels_are_left_out():
+    content = 'S1: 1 , 2\nS3: 5\nS9: 1 , 2\nS4 no values'
+    assert list(parse_packed(content, ['S1', 'S2', 'S3', 'S4'], 2)) == ['S1']
+    assert parse_packed(None, ['S1'], 2) == {}
+
+
+def test_duplicated_labels_keep_the_first_line():
+    forecasts = parse_packed('S1: 1 , 2\nS1: 3 , 4', ['S1'], 2)
+    np.testing.assert_array_equal(forecasts['S1'], [1, 2])
+
+
+def test_truncated_answers_drop_their_last_line():
+    content = 'S1: 1 2 , 3 4\nS2: 1 2 , 3'
+    assert list(parse_packed(content, ['S1', 'S2'], 2)) == ['S1', 'S2']
+
+    # Cut off at max_tokens, the 3 may be the start of a longer number
+    forecasts = parse_packed(content, ['S1', 'S2'], 2, truncated=True)
+    assert list(forecasts) == ['S1']
+    np.testing.assert_array_equal(forecasts['S1'], [12, 34])
+    assert parse_packed('S1: 1 2 , 3', ['S1'], 2, truncated=True) == {}
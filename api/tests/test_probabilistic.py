@@ -0,0 +1,34 @@
+# test_probabilistic.py
+# Description: Tests of the quantiles and intervals of sampled forecasts.
+# Author: Joshua Stiller
+# Date: 18.10.26
+
+import numpy as np
+
+from src.model.probabilistic import SampledForecast
+
+
+def test_quantiles_are_taken_per_step():
+    samples = np.array([[1., 10.], [2., 20.], [3., 30.], [4., 40.], [5., 50.]])
+    forecast = SampledForecast(samples)
+
+    assert forecast.n_samples == 5 and len(forecast) == 2
+    np.testing.assert_allclose(forecast.median, [3., 30.])
+    np.testing.assert_allclose(forecast.quantiles([0.25, 0.75]), [[2., 20.], [4., 40.]])
+    np.testing.assert_allclose(forecast.interval(0.5), ([2., 20.], [4., 40.]))
+    np.testing.assert_allclose(forecast.mean, [3., 30.])
+    np.testing.assert_allclose(np.asarray(forecast), forecast.median)
+
+
+def test_short_and_empty_samples():
+    samples = np.array([[1., 2., np.nan], [3., np.nan, np.nan], [np.nan, np.nan, np.nan]])
+    forecast = SampledForecast(samples)
+
+    assert forecast.n_samples == 2
+    assert forecast.counts.tolist() == [2, 1, 0]
+    np.testing.assert_allclose(forecast.median, [2., 2., np.nan])
+
+    empty = SampledForecast(np.full((2, 3), np.nan))
+    assert empty.n_samples == 0
+    assert empty.quantiles([0.1, 0.9]).shape == (2, 3)
+    assert np.all(np.isnan(empty.mean))
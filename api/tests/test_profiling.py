@@ -0,0 +1,35 @@
+# test_profiling.py
+# Description: Tests of the incremental demand profile of BaseData.
+# Author: Joshua Stiller
+# Date: 18.10.26
+
+import pandas as pd
+import pytest
+
+from src.data.base_data import BaseData
+from tests.sales import sales_frame
+
+
+def _later_weeks(frame, n_weeks):
+    """ Returns n_weeks new weeks of the first series after the last week of the data. """
+
+    key = frame[['product_id', 'customer_id']].iloc[0]
+    series = frame[(frame['product_id'] == key['product_id']) & (frame['customer_id'] == key['customer_id'])]
+    new = series.iloc[-n_weeks:].copy()
+    new['week'] = frame['week'].max() + pd.to_timedelta(7 * (1 + pd.RangeIndex(n_weeks)), unit='D')
+    return new
+
+
+@pytest.mark.parametrize('weeks, n_new', [(60, 3), (100, 10)])
+def test_incremental_profile_equals_full_profile(weeks, n_new):
+    frame = sales_frame(40 * weeks, weeks=weeks)
+    new = _later_weeks(frame, n_new)
+
+    data = BaseData(frame)
+    data.profile()
+    data.routes()
+    data.append(new)
+
+    full = BaseData(pd.concat([frame, new], ignore_index=True))
+    pd.testing.assert_frame_equal(data.profile(), full.profile(), check_dtype=False, check_index_type=False)
+    pd.testing.assert_frame_equal(data.routes(), full.routes(), check_index_type=False)
@@ -0,0 +1,52 @@
+# test_routing.py
+# Description: Tests of routing series by their demand profile.
+# Author: Joshua Stiller
+# Date: 18.10.26
+
+import numpy as np
+
+from src.model.gpt3_model import GPT3Model
+from src.model.routing import RoutedModel, RoutingPolicy
+from src.model.statistical_model import StatisticalModel
+from tests.fake_openai import FakeAsyncOpenAI, FakeOpenAI
+
+
+def _sparse(n_weeks=60, every=4):
+    """ Returns a series with a sale in every fourth week and zeros in between. """
+
+    history = np.zeros(n_weeks)
+    history[::every] = np.tile([5., 3., 4., 6.], n_weeks)[:len(history[::every])]
+    return history
+
+
+def test_sparse_series_is_routed_to_sba():
+    routes = RoutingPolicy().route_histories([_sparse(), np.full(60, 5.) + np.arange(60) % 3])
+    assert routes['class'].tolist() == ['intermittent', 'smooth']
+    assert routes['route'].tolist() == ['local', 'local']
+    assert routes['method'].tolist() == ['sba', 'ses']
+
+    # The same sales without the weeks between them look smooth
+    gap_free = RoutingPolicy().route_histories([_sparse()[::4]])
+    assert gap_free['class'].tolist() == ['smooth']
+
+
+def test_inactive_series_is_forecast_as_zero():
+    history = _sparse()
+    history[-30:] = 0.
+    route = RoutingPolicy().route_histories([history]).iloc[0]
+    assert route['route'] == 'constant' and route['level'] == 0.
+
+
+def test_routed_model_forecasts_sparse_series_locally():
+    client = FakeOpenAI()
+    model = RoutedModel(GPT3Model(client=client, async_client=FakeAsyncOpenAI()))
+    history = _sparse()
+
+    forecast, completion = model.predict(history, 4)
+    expected, _ = StatisticalModel('sba').predict(history, 4)
+    np.testing.assert_allclose(forecast, expected)
+    assert completion is None and client.calls == 0
+
+    results = model.predict_many([history, history], 4)
+    assert [result.route for result in results] == ['local', 'local']
+    np.testing.assert_allclose(results[1].forecast, expected)
@@ -0,0 +1,82 @@
+# test_scaler.py
+# Description: Tests of fitting the QuantileScaler in batches and from streams.
+# Author: Joshua Stiller
+# Date: 18.10.26
+
+import numpy as np
+import pytest
+
+from src.preprocessing.scaler import QuantileScaler
+
+
+@pytest.mark.parametrize('seed', range(5))
+@pytest.mark.parametrize('axis', [None, 0, 1])
+def test_partial_fit_after_fit_is_close_to_fit_of_all_data(seed, axis):
+    generator = np.random.default_rng(seed)
+    history = generator.gamma(2., 30., size=(8, 200))
+    new = generator.gamma(2., 40., size=(8, 30))
+    if axis == 0:
+        history, new = history.T, new.T
+
+    scaler = QuantileScaler(axis=axis)
+    scaler.fit(history)
+    scaler.partial_fit(new)
+
+    full = QuantileScaler(axis=axis)
+    full.fit(np.concatenate([history, new], axis=1 if axis != 0 else 0))
+    np.testing.assert_allclose(scaler.upper_quantile, full.upper_quantile, rtol=0.1)
+
+
+def test_partial_fit_after_fit_does_not_forget_the_history():
+    scaler = QuantileScaler()
+    scaler.fit(np.arange(60., 65.).repeat(10).reshape(-1, 1))
+    scaler.partial_fit([[1.], [1.], [1.]])
+    assert scaler.upper_quantile > 60
+
+
+def test_partial_fit_from_scratch_matches_quantile():
+    data = np.random.default_rng(0).gamma(2., 30., size=(4, 2000))
+    scaler = QuantileScaler(axis=1)
+    for start in range(0, data.shape[1], 100):
+        scaler.partial_fit(data[:, start:start + 100])
+    np.testing.assert_allclose(scaler.upper_quantile, np.quantile(data, 0.95, axis=1, keepdims=True), rtol=0.05)
+
+
+def test_state_round_trip_keeps_the_fitted_history():
+    data = np.random.default_rng(1).gamma(2., 30., size=(3, 100))
+    scaler = QuantileScaler(axis=1)
+    scaler.fit(data)
+    restored = QuantileScaler.from_dict(scaler.to_dict())
+    np.testing.assert_allclose(restored.upper_quantile, scaler.upper_quantile)
+
+    new = data[:, :10] * 2
+    scaler.partial_fit(new)
+    restored.partial_fit(new)
+    np.testing.assert_allclose(restored.upper_quantile, scaler.upper_quantile)
+
+
+@pytest.mark.parametrize('axis', [None, 0, 1])
+def test_fit_equals_quantile_and_keeps_no_reference(axis):
+    data = np.random.default_rng(2).gamma(2., 30., size=(6, 300))
+    if axis == 0:
+        data = data.T
+    scaler = QuantileScaler(axis=axis)
+    scaler.fit(data)
+    np.testing.assert_array_equal(scaler.upper_quantile,
+                                  np.quantile(data, 0.95, axis=axis, keepdims=axis is not None))
+
+    # Changing the data afterwards does not change the state the next partial_fit continues from
+    expected = QuantileScaler(axis=axis)
+    expected.fit(data.copy())
+    data[:] = 0.
+    state = scaler.to_dict()
+    assert state == expected.to_dict()
+    assert np.asarray(state['estimator']['heights']).shape == (1 if axis is None else 6, 5)
+
+
+def test_fit_skips_missing_values():
+    data = np.random.default_rng(3).gamma(2., 30., size=(2, 50))
+    data[0, ::5] = np.nan
+    scaler = QuantileScaler(axis=1)
+    scaler.fit(data)
+    np.testing.assert_allclose(scaler.upper_quantile[:, 0], np.nanquantile(data, 0.95, axis=1))
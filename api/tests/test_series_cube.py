@@ -0,0 +1,81 @@
+# test_series_cube.py
+# Description: Tests of the dense series x week matrix and its memory-mapped files.
+# Author: Joshua Stiller
+# Date: 18.10.26
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.data.base_data import BaseData
+from src.data.series_cube import SeriesCube, week_grid
+
+
+def _frame(rows):
+    """ Returns sales of (product_id, customer_id, week, units_sold) rows with the columns of BaseData. """
+
+    frame = pd.DataFrame(rows, columns=['product_id', 'customer_id', 'week', 'units_sold'])
+    frame['week'] = pd.to_datetime(frame['week'])
+    frame['product'] = 'product ' + frame['product_id'].astype(str)
+    frame['customer'] = 'customer ' + frame['customer_id'].astype(str)
+    return frame
+
+
+SALES = _frame([
+    (2, 1, '2024-01-01', 3), (1, 2, '2024-01-15', 1), (1, 1, '2024-01-22', 4),
+    (2, 1, '2024-01-22', 2), (1, 1, '2024-01-01', 5), (1, 1, '2024-01-01', 1),
+])
+
+
+def test_weeks_without_sales_get_zero_columns():
+    cube = SeriesCube.from_data(BaseData(SALES))
+
+    # No series sold in the week of 2024-01-08, it is a column of zeros nevertheless
+    np.testing.assert_array_equal(cube.weeks, pd.date_range('2024-01-01', periods=4, freq='7D').values)
+    assert list(zip(cube.product_ids.tolist(), cube.customer_ids.tolist())) == [(1, 1), (1, 2), (2, 1)]
+    np.testing.assert_array_equal(cube.values, [[6, 0, 0, 4], [0, 0, 1, 0], [3, 0, 0, 2]])
+    assert cube.values.dtype == np.int32
+    assert SeriesCube.from_data(BaseData(SALES.astype({'units_sold': float}))).values.dtype == np.float32
+
+
+def test_week_grid_fills_whole_weeks_only():
+    weeks = np.array(['2024-01-15', '2024-01-01', '2024-01-29'], dtype='datetime64[D]')
+    assert week_grid(weeks).tolist() == list(np.arange('2024-01-01', '2024-02-05', 7, dtype='datetime64[D]'))
+
+    # Dates that are not whole weeks apart and week numbers keep the weeks with sales
+    days = np.array(['2024-01-01', '2024-01-04'], dtype='datetime64[D]')
+    assert week_grid(days).tolist() == days.tolist()
+    assert week_grid(np.array([5, 1, 3, 1])).tolist() == [1, 3, 5]
+    assert week_grid(days[:1]).tolist() == days[:1].tolist()
+
+
+def test_series_are_looked_up_by_product_and_customer():
+    cube = SeriesCube.from_data(BaseData(SALES))
+
+    assert cube.row(1, 2) == 1 and cube.row(3, 3) is None
+    assert cube.rows([(2, 1), (1, 1)]).tolist() == [2, 0]
+    np.testing.assert_array_equal(cube.series(2, 1), [3, 0, 0, 2])
+    with pytest.raises(KeyError):
+        cube.series(3, 3)
+
+    values, customer_ids = cube.product(1)
+    assert customer_ids.tolist() == [1, 2] and np.shares_memory(values, cube.values)
+    np.testing.assert_array_equal(values, cube.values[:2])
+
+    # Consecutive rows are returned as a view, others as a copy in the order of the keys
+    assert np.shares_memory(cube.select([(1, 2), (2, 1)]), cube.values)
+    np.testing.assert_array_equal(cube.select([(2, 1), (1, 1)], slice(0, 2)), [[3, 0], [6, 0]])
+
+
+def test_saved_cubes_are_loaded_memory_mapped(tmp_path):
+    sales = SALES.assign(customer_id=SALES['customer_id'].map({1: 'A-1', 2: 'B-2'}).astype(object))
+    cube = SeriesCube.from_data(BaseData(sales))
+    cube.save(str(tmp_path))
+    loaded = SeriesCube.load(str(tmp_path))
+
+    assert isinstance(loaded.values, np.memmap)
+    np.testing.assert_array_equal(loaded.values, cube.values)
+    np.testing.assert_array_equal(loaded.weeks, cube.weeks)
+    assert loaded.customer_ids.dtype.kind == 'U'
+    np.testing.assert_array_equal(loaded.series(1, 'B-2'), cube.series(1, 'B-2'))
+    assert not isinstance(SeriesCube.load(str(tmp_path), mmap_mode=None).values, np.memmap)
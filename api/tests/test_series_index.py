@@ -0,0 +1,83 @@
+# test_series_index.py
+# Description: Tests of the index from series keys to row positions and of its use by BaseData and StoreData.
+# Author: Joshua Stiller
+# Date: 18.10.26
+
+import numpy as np
+import pandas as pd
+
+from src.data.base_data import BaseData
+from src.data.series_index import SeriesIndex
+from src.data.store_data import StoreData
+from src.model.utils import serialize_volume
+from tests.sales import sales_frame
+
+
+def _stores(seed=0):
+    """ Returns store sales in random row order. """
+
+    rng = np.random.default_rng(seed)
+    n = 60
+    return pd.DataFrame({'sku_id': rng.integers(0, 4, n), 'store_id': rng.integers(0, 3, n),
+                         'day': np.arange(n), 'units_sold': rng.poisson(5, n)})
+
+
+def test_keys_of_an_unsorted_frame_map_to_their_rows_in_frame_order():
+    frame = _stores()
+    index = SeriesIndex(frame, ['sku_id', 'store_id'])
+
+    expected = frame.groupby(['sku_id', 'store_id']).indices
+    assert index.keys == sorted(expected)
+    assert index.order is not None
+    assert np.diff(index.offsets).tolist() == [len(expected[key]) for key in index.keys]
+    for key, positions in index:
+        assert positions.tolist() == expected[key].tolist()
+
+    assert index.positions((9, 9)) == slice(0, 0) and (9, 9) not in index
+    assert index.take([(3, 2), (9, 9), (0, 1)]).tolist() == sorted([*expected[(3, 2)], *expected[(0, 1)]])
+
+
+def test_keys_of_a_sorted_frame_are_slices():
+    frame = _stores().sort_values(['sku_id', 'store_id'], kind='stable').reset_index(drop=True)
+    index = SeriesIndex(frame, ['sku_id', 'store_id'])
+
+    assert index.order is None
+    for key, positions in index:
+        assert isinstance(positions, slice)
+        assert frame.iloc[positions][['sku_id', 'store_id']].drop_duplicates().values.tolist() == [list(key)]
+
+    # A single key column has plain keys, text ids are sorted like any other
+    single = SeriesIndex(pd.DataFrame({'id': ['b', 'a', 'b', 'c']}), ['id'])
+    assert single.keys == ['a', 'b', 'c']
+    assert single.positions('b').tolist() == [0, 2]
+
+
+def test_base_data_rows_are_sorted_by_product_customer_and_week():
+    frame = sales_frame(600, weeks=30).sample(frac=1., random_state=0)
+    data = BaseData(frame)
+    sorted_frame = data.data
+    index = data.series_index
+
+    assert index.order is None
+    assert index.keys == sorted(index.keys)
+    assert index.offsets[0] == 0 and index.offsets[-1] == len(sorted_frame)
+    for (product_id, customer_id), positions in index:
+        rows = sorted_frame.iloc[positions]
+        assert (rows['product_id'] == product_id).all() and (rows['customer_id'] == customer_id).all()
+        assert rows['week'].is_monotonic_increasing
+
+
+def test_store_data_keeps_the_original_row_order(tmp_path):
+    frame = _stores()
+    frame.to_csv(tmp_path / 'stores.csv', index=False)
+    data = StoreData(str(tmp_path / 'stores.csv'))
+
+    # The former selection by masks
+    expected = frame[frame['sku_id'].isin([1, 3]) & frame['store_id'].isin([0, 2])]
+    pd.testing.assert_frame_equal(data.get_data([1, 3], [0, 2]), expected[['store_id', 'sku_id', 'units_sold']])
+    assert data.get_data(1, 0).index.tolist() == frame.index[(frame['sku_id'] == 1) & (frame['store_id'] == 0)].tolist()
+    assert data.get_data(9, 9).shape[0] == 0
+
+    units = frame.loc[(frame['sku_id'] == 2) & (frame['store_id'] == 1), 'units_sold'].to_numpy()
+    assert data.get_serialized_data(2, 1) == serialize_volume(units)
+    assert data.get_serialized_data(2, 1, 1, 3) == serialize_volume(units[1:3])
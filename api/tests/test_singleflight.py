@@ -0,0 +1,93 @@
+# test_singleflight.py
+# Description: Tests of sharing and cancelling calls of SingleFlight.
+# Author: Joshua Stiller
+# Date: 18.10.26
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from src.model.singleflight import SingleFlight
+
+
+def test_concurrent_calls_are_collapsed():
+    flight = SingleFlight()
+    calls = []
+
+    async def call():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return 42
+
+    async def main():
+        return await asyncio.gather(*[flight.ado('key', call) for _ in range(5)])
+
+    assert asyncio.run(main()) == [42] * 5
+    assert len(calls) == 1
+    assert len(flight) == 0
+
+
+def test_errors_are_shared():
+    flight = SingleFlight()
+
+    async def call():
+        await asyncio.sleep(0.01)
+        raise ValueError('failed')
+
+    async def main():
+        return await asyncio.gather(*[flight.ado('key', call) for _ in range(3)], return_exceptions=True)
+
+    assert all(isinstance(result, ValueError) for result in asyncio.run(main()))
+
+
+def test_cancelled_leader_does_not_cancel_follower():
+    flight = SingleFlight()
+    calls = []
+
+    async def call():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return len(calls)
+
+    async def main():
+        leader = asyncio.create_task(flight.ado('key', call))
+        await asyncio.sleep(0.01)
+        follower = asyncio.create_task(flight.ado('key', call))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    # The follower executes the call again as the new leader
+    assert asyncio.run(main()) == 2
+    assert len(flight) == 0
+
+
+def test_interrupted_thread_leader_hands_over():
+    flight = SingleFlight()
+    started = threading.Event()
+    results = []
+
+    def leader_call():
+        started.set()
+        time.sleep(0.05)
+        raise KeyboardInterrupt
+
+    def leader():
+        try:
+            flight.do('key', leader_call)
+        except KeyboardInterrupt:
+            pass
+
+    thread = threading.Thread(target=leader)
+    thread.start()
+    started.wait()
+    follower = threading.Thread(target=lambda: results.append(flight.do('key', lambda: 'fresh')))
+    follower.start()
+    thread.join()
+    follower.join()
+
+    assert results == ['fresh']
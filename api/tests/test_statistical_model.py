@@ -0,0 +1,58 @@
+# test_statistical_model.py
+# Description: Tests of the local forecasting baselines against hand-computed forecasts.
+# Author: Joshua Stiller
+# Date: 18.10.26
+
+import numpy as np
+import pytest
+
+from src.model.statistical_model import StatisticalModel
+
+# Sales in three of nine weeks, with zeros for the weeks between
+INTERMITTENT = [0., 0., 4., 0., 0., 0., 2., 0., 6.]
+
+
+def test_croston_smooths_demand_sizes_and_intervals():
+    # Sizes 4, 3, 4.5 and intervals 3, 3.5, 2.75 with alpha 0.5, the first interval counts from the first week
+    forecast, completion = StatisticalModel('croston', alpha=.5).predict(INTERMITTENT, 3)
+    np.testing.assert_allclose(forecast, np.full(3, 4.5 / 2.75))
+    assert completion is None
+
+
+def test_sba_corrects_the_bias_of_croston():
+    forecast, _ = StatisticalModel('sba', alpha=.5).predict(INTERMITTENT, 2)
+    np.testing.assert_allclose(forecast, np.full(2, (1 - .5 / 2) * 4.5 / 2.75))
+
+
+def test_croston_of_a_batch_equals_single_series():
+    batch = np.array([INTERMITTENT, INTERMITTENT[::-1], np.zeros(9)])
+    forecast, _ = StatisticalModel('croston', alpha=.5).predict(batch, 2)
+    for row, history in zip(forecast, batch):
+        np.testing.assert_allclose(row, StatisticalModel('croston', alpha=.5).predict(history, 2)[0])
+    np.testing.assert_allclose(forecast[2], 0.)
+
+
+@pytest.mark.parametrize('method, expected', [
+    ('naive', [3., 3., 3.]),
+    ('seasonal_naive', [2., 3., 2.]),
+    ('moving_average', [2.5, 2.5, 2.5]),
+    ('ses', [2.25, 2.25, 2.25]),
+    ('holt', [4., 5., 6.]),
+])
+def test_smoothing_methods(method, expected):
+    model = StatisticalModel(method, season_length=2, window=2, alpha=.5, beta=.5)
+    np.testing.assert_allclose(model.predict([1., 2., 3.], 3)[0], expected)
+
+
+@pytest.mark.parametrize('method', StatisticalModel.methods)
+def test_empty_history_has_no_forecast(method):
+    forecast, _ = StatisticalModel(method).predict([], 4)
+    assert forecast.shape == (4,) and np.isnan(forecast).all()
+
+    forecast, _ = StatisticalModel(method).predict(np.zeros((2, 0)), 4)
+    assert forecast.shape == (2, 4) and np.isnan(forecast).all()
+
+
+def test_unknown_method():
+    with pytest.raises(ValueError):
+        StatisticalModel('arima')
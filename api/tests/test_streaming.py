@@ -0,0 +1,102 @@
+# test_streaming.py
+# Description: Tests of decoding streamed completions and closing their streams early.
+# Author: Joshua Stiller
+# Date: 18.10.26
+
+import asyncio
+
+import numpy as np
+
+from src.model.gpt3_model import GPT3Model
+from src.model.streaming import StreamDecoder, astream_completion, max_tokens_for, stream_completion
+from tests.fake_openai import FakeAsyncOpenAI, FakeOpenAI
+
+MESSAGES = [{'role': 'user', 'content': '1 , 2'}]
+
+
+def _keep_streams(client):
+    """ Records the streams the client returns. """
+
+    streams = []
+    create = client.chat.completions.create
+
+    def record(*args, **kwargs):
+        stream = create(*args, **kwargs)
+        streams.append(stream)
+        return stream
+
+    async def arecord(*args, **kwargs):
+        stream = await create(*args, **kwargs)
+        streams.append(stream)
+        return stream
+
+    client.chat.completions.create = arecord if asyncio.iscoroutinefunction(create) else record
+    return streams
+
+
+def test_values_split_across_chunks_are_decoded_once_complete():
+    decoder = StreamDecoder(3)
+    assert not decoder.feed('1 ')
+    assert not decoder.feed('2 . 5 ')
+    assert decoder.values == []
+
+    assert not decoder.feed(', 1')
+    assert decoder.values == [12.5]
+    assert decoder.feed('3 , 7 , 9 ,')
+    assert decoder.values == [12.5, 13., 7.]
+    np.testing.assert_array_equal(decoder.close(), [12.5, 13., 7.])
+
+
+def test_the_trailing_value_is_decoded_when_the_stream_ends():
+    decoder = StreamDecoder(3)
+    decoder.feed('4 , 5 ')
+    decoder.feed('6')
+    assert decoder.values == [4.]
+    np.testing.assert_array_equal(decoder.close(), [4., 56.])
+
+    # Nothing but whitespace after the last separator adds no value
+    decoder = StreamDecoder(2)
+    decoder.feed('1 , ')
+    np.testing.assert_array_equal(decoder.close(), [1.])
+
+
+def test_the_stream_is_closed_once_the_values_are_decoded():
+    client = FakeOpenAI()
+    streams = _keep_streams(client)
+    completion = stream_completion(client, 'fake', MESSAGES, 3)
+
+    assert completion.closed_early and completion.finish_reason == 'horizon'
+    assert streams[0].closed
+    assert completion.content == '1 2 , 1 3 , 1 4 , '
+    assert client.streamed_chunks == completion.chunks == 9
+    assert completion.time_to_first_value is not None
+
+
+def test_the_async_stream_is_closed_once_the_values_are_decoded():
+    client = FakeAsyncOpenAI()
+    streams = _keep_streams(client)
+    completion = asyncio.run(astream_completion(client, 'fake', MESSAGES, 2))
+
+    assert completion.closed_early and streams[0].closed
+    assert client.streamed_chunks == completion.chunks == 6
+
+
+def test_streams_that_end_on_their_own_keep_their_finish_reason():
+    client = FakeOpenAI(content='1 2 , 1 3')
+    streams = _keep_streams(client)
+    completion = stream_completion(client, 'fake', MESSAGES, 3)
+
+    assert not completion.closed_early and completion.finish_reason == 'stop'
+    assert streams[0].closed
+    assert completion.content == '1 2 , 1 3'
+
+
+def test_streamed_forecasts_match_regular_ones():
+    history = np.arange(30.)
+    expected, _ = GPT3Model(client=FakeOpenAI()).predict(history, 4)
+
+    client = FakeOpenAI()
+    forecast, completion = GPT3Model(client=client, stream=True).predict(history, 4)
+    np.testing.assert_array_equal(np.ravel(forecast), np.ravel(expected))
+    assert completion.closed_early
+    assert client.streamed_chunks < len(client._tokens(max_tokens_for(history, 4)))
@@ -0,0 +1,115 @@
+# test_utils.py
+# Description: Tests of the prompt rendering and parsing helpers against their former versions.
+# Author: Joshua Stiller
+# Date: 18.10.26
+
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.model.utils import deserialize_volume, get_forecast_from_completion, historic_data_as_text, \
+    serialize_volume
+
+
+def legacy_historic_data_as_text(data, product_ids=None):
+    """ The former historic_data_as_text. """
+
+    if product_ids is None:
+        product_ids = data.columns
+
+    str = ''
+    for index, row in data.iterrows():
+        str += f"day {index.strftime('%Y-%m-%d')}: "
+        for product_id in product_ids:
+            str += f"Product {product_id} was sold {row[product_id]} times. "
+        str += '\n'
+    return str
+
+
+def legacy_get_forecast_from_completion(completion):
+    """ The former get_forecast_from_completion, which only parses a single Product 0. """
+
+    forecast = completion.choices[0].message.content
+    forecast = forecast.split('\n')
+    forecast = [x.split(':') for x in forecast]
+    forecast = pd.DataFrame(forecast, columns=['day', 'sales'])
+    forecast['day'] = forecast['day'].str.replace('day ', '')
+    forecast['sales'] = forecast['sales'].str.replace('Product 0 was sold ', '')
+    forecast['sales'] = forecast['sales'].str.replace(' times.', '')
+    forecast['day'] = pd.to_datetime(forecast['day'])
+    forecast['sales'] = forecast['sales'].astype(int)
+    return forecast
+
+
+def _completion(content):
+    message = SimpleNamespace(role='assistant', content=content)
+    return SimpleNamespace(choices=[SimpleNamespace(index=0, message=message)])
+
+
+DAYS = pd.date_range('2023-01-02', periods=5)
+RNG = np.random.default_rng(0)
+FRAMES = {
+    'integers': pd.DataFrame(RNG.poisson(20, (5, 3)), index=DAYS, columns=[3, 17, 250]),
+    'text ids': pd.DataFrame(RNG.poisson(2, (5, 2)), index=DAYS, columns=['A-1', 'B{2}']),
+    'floats': pd.DataFrame(RNG.gamma(2., 3., (5, 2)).astype('float32'), index=DAYS, columns=['x', 'y']),
+    'mixed': pd.DataFrame({'int': RNG.poisson(3, 5), 'float': RNG.gamma(2., 3., 5), 'missing': np.nan},
+                          index=DAYS),
+    'customers': pd.DataFrame(RNG.poisson(4, (5, 4)), index=DAYS,
+                              columns=pd.MultiIndex.from_product([['p1', 'p2'], ['c1', 'c2']]).to_flat_index()),
+}
+
+
+@pytest.mark.parametrize('name', FRAMES)
+def test_prompts_match_the_former_rendering(name):
+    data = FRAMES[name]
+    assert historic_data_as_text(data) == legacy_historic_data_as_text(data)
+    assert historic_data_as_text(data, data.columns[::-1]) == legacy_historic_data_as_text(data, data.columns[::-1])
+    assert historic_data_as_text(data.iloc[:0]) == legacy_historic_data_as_text(data.iloc[:0]) == ''
+
+
+def test_single_product_forecasts_match_the_former_parser():
+    content = historic_data_as_text(FRAMES['integers'].set_axis([0, 1, 2], axis=1)[[0]]).strip()
+    completion = _completion(content.replace('times. ', 'times.'))
+    pd.testing.assert_frame_equal(get_forecast_from_completion(completion).drop(columns='product_id'),
+                                  legacy_get_forecast_from_completion(completion))
+
+
+def test_forecasts_of_several_products_are_parsed():
+    data = FRAMES['integers']
+    forecast = get_forecast_from_completion(_completion(historic_data_as_text(data)))
+
+    assert forecast['day'].tolist() == list(np.repeat(DAYS, 3))
+    assert forecast['product_id'].tolist() == [3, 17, 250] * 5
+    np.testing.assert_array_equal(forecast['sales'], data.to_numpy().ravel())
+    assert forecast['product_id'].dtype == forecast['sales'].dtype == np.int64
+
+    forecast = get_forecast_from_completion(_completion(historic_data_as_text(FRAMES['text ids'])))
+    assert forecast['product_id'].tolist()[:2] == ['A-1', 'B{2}']
+
+
+def test_malformed_and_empty_lines_are_skipped():
+    content = ('Sure, here is the forecast:\n\n'
+               'day 2024-01-01: Product 7 was sold 3 times. Product 8 was sold 2.5 times.\n'
+               'Product 9 was sold 4 times.\n'
+               'day 2024-13-01: Product 7 was sold 1 times.\n'
+               'day 2024-01-02: Product 7 was sold many times. Product 8 was sold 1 time.\n'
+               'day 2024-01-03:')
+    forecast = get_forecast_from_completion(_completion(content))
+
+    assert forecast['day'].dt.strftime('%Y-%m-%d').tolist() == ['2024-01-01', '2024-01-01', '2024-01-02']
+    assert forecast['product_id'].tolist() == [7, 8, 8]
+    assert forecast['sales'].tolist() == [3., 2.5, 1.]
+
+    for content in ['', None, 'no forecast\n\n']:
+        forecast = get_forecast_from_completion(_completion(content))
+        assert forecast.shape == (0, 3)
+        assert forecast.columns.tolist() == ['day', 'product_id', 'sales']
+
+
+def test_volumes_are_deserialized_with_any_separator():
+    volumes = np.array([12., 0.5, 130.])
+    np.testing.assert_array_equal(deserialize_volume(serialize_volume(volumes)), volumes)
+    np.testing.assert_array_equal(deserialize_volume(serialize_volume(volumes, num_sep=';')), volumes)
+    np.testing.assert_array_equal(deserialize_volume('1 2 , 5', n=1), [12.])